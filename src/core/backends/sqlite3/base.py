@@ -0,0 +1,188 @@
+"""
+SQLite с профилями PRAGMA для проекта RnD Simple DB.
+
+Профиль задается в DATABASES[...]['OPTIONS']:
+    'profile': 'read_heavy' | 'write_heavy' | 'default'
+    'pragmas': {...}             - переопределение отдельных PRAGMA профиля
+    'transaction_mode': 'IMMEDIATE' - все транзакции сразу берут блокировку записи
+    'maintenance_interval': 300  - период PRAGMA optimize и wal_checkpoint, с;
+                                   0 - без обслуживания (база не меняется
+                                   сама по себе)
+
+PRAGMA выполняются при каждом подключении. С CONN_MAX_AGE соединение
+переиспользуется между запросами, CONN_HEALTH_CHECKS проверяет его
+запросом SELECT 1. Обслуживание выполняется между запросами (вне
+транзакции) и перед закрытием соединения.
+
+Ошибки "database is locked" возникают, когда транзакция начата на чтение
+(BEGIN DEFERRED) и затем пытается писать, пока пишет другой процесс:
+SQLite отвечает SQLITE_BUSY сразу, не дожидаясь busy_timeout.
+BEGIN IMMEDIATE убирает такие ошибки ценой ожидания. Чтобы чтение не
+ждало пишущих, IMMEDIATE включается только для записи: внутри
+write_transactions() и для изменяющих HTTP-запросов
+(WriteTransactionMiddleware); transaction_mode в OPTIONS включает его
+для всех транзакций соединения.
+"""
+import re
+import time
+from contextlib import ExitStack, contextmanager
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.backends.sqlite3.base import Database, DatabaseWrapper as SQLiteDatabaseWrapper
+
+
+PRAGMA_PROFILES = {
+    # Только внешние ключи, как у стандартного backend
+    'default': {
+        'foreign_keys': 'ON',
+    },
+    # Админка и API: большой кэш страниц и отображение файла в память
+    'read_heavy': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'foreign_keys': 'ON',
+        'busy_timeout': 5000,
+        'cache_size': -64000,
+        'mmap_size': 268435456,
+        'temp_store': 'MEMORY',
+    },
+    # Загрузки и пересчеты: долгое ожидание блокировки, редкие контрольные точки WAL
+    'write_heavy': {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'foreign_keys': 'ON',
+        'busy_timeout': 30000,
+        'cache_size': -128000,
+        'mmap_size': 67108864,
+        'temp_store': 'MEMORY',
+        'wal_autocheckpoint': 10000,
+    },
+}
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+BACKEND_OPTIONS = ('profile', 'pragmas', 'transaction_mode', 'maintenance_interval')
+
+_PRAGMA_NAME = re.compile(r'^[a-z_]+$')
+_PRAGMA_VALUE = re.compile(r'^-?[0-9]+$|^[A-Za-z_]+$')
+
+
+def profile_pragmas(options):
+    """PRAGMA профиля с переопределениями из OPTIONS['pragmas']."""
+    name = options.get('profile', 'default')
+    if name not in PRAGMA_PROFILES:
+        raise ImproperlyConfigured(
+            f'Неизвестный профиль SQLite {name!r}, допустимы: {", ".join(PRAGMA_PROFILES)}'
+        )
+    pragmas = {**PRAGMA_PROFILES[name], **options.get('pragmas', {})}
+    for key, value in pragmas.items():
+        if not _PRAGMA_NAME.match(key) or not _PRAGMA_VALUE.match(str(value)):
+            raise ImproperlyConfigured(f'Некорректная PRAGMA {key} = {value!r}')
+    return pragmas
+
+
+@contextmanager
+def write_transactions(using=None):
+    """Транзакции базы using, начатые внутри блока, сразу берут блокировку записи."""
+    connection = connections[using or DEFAULT_DB_ALIAS]
+    if not isinstance(connection, DatabaseWrapper) or connection.pragmas.get('query_only') == 'ON':
+        yield
+        return
+    previous = connection.transaction_mode
+    if previous == 'DEFERRED':
+        connection.transaction_mode = 'IMMEDIATE'
+    try:
+        yield
+    finally:
+        connection.transaction_mode = previous
+
+
+class WriteTransactionMiddleware:
+    """BEGIN IMMEDIATE для транзакций изменяющих запросов (POST и т.д.)."""
+
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if request.method in self.SAFE_METHODS:
+            return self.get_response(request)
+        with ExitStack() as stack:
+            for alias in connections:
+                stack.enter_context(write_transactions(alias))
+            return self.get_response(request)
+
+
+class DatabaseWrapper(SQLiteDatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = profile_pragmas(options)
+        self.transaction_mode = options.get('transaction_mode', 'DEFERRED').upper()
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(f'Некорректный transaction_mode SQLite: {self.transaction_mode}')
+        self.maintenance_interval = options.get('maintenance_interval', 300)
+        self.maintenance_due = None
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        for name in BACKEND_OPTIONS:
+            kwargs.pop(name, None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        self.maintenance_due = self._next_maintenance()
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode == 'DEFERRED':
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
+
+    def is_usable(self):
+        try:
+            self.connection.execute('SELECT 1')
+        except Database.Error:
+            return False
+        return True
+
+    def close_if_unusable_or_obsolete(self):
+        super().close_if_unusable_or_obsolete()
+        if (
+            self.connection is not None
+            and not self.in_atomic_block
+            and self.maintenance_due is not None
+            and time.monotonic() >= self.maintenance_due
+        ):
+            self.run_maintenance()
+
+    def run_maintenance(self):
+        """PRAGMA optimize и контрольная точка WAL без ожидания читателей."""
+        try:
+            self.connection.execute('PRAGMA optimize')
+            if self.pragmas.get('journal_mode', '').upper() == 'WAL':
+                self.connection.execute('PRAGMA wal_checkpoint(PASSIVE)')
+        except Database.Error:
+            # Обслуживание не должно ломать запрос: повторится в следующий период
+            pass
+        self.maintenance_due = self._next_maintenance()
+
+    def _next_maintenance(self):
+        if not self.maintenance_interval:
+            return None
+        return time.monotonic() + self.maintenance_interval
+
+    def _close(self):
+        if self.connection is not None and not self.in_atomic_block and self.maintenance_interval:
+            try:
+                self.connection.execute('PRAGMA optimize')
+            except Database.Error:
+                pass
+        return super()._close()
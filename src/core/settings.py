@@ -42,6 +42,9 @@ INSTALLED_APPS = DJANGO_APPS + LOCAL_APPS
 
 # Промежуточные слои (обработчики запросов)
 MIDDLEWARE = [
+    'rnd.querycheck.QueryInspectionMiddleware',
+    'core.backends.sqlite3.base.WriteTransactionMiddleware',
+    'rnd.routing.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,14 +79,56 @@ TEMPLATES = [
 
 # =============================== БАЗА ДАННЫХ =================================
 
+# Профиль PRAGMA SQLite (core/backends/sqlite3): read_heavy - работа через
+# админку и API, write_heavy - массовые загрузки и пересчеты (оба переводят
+# базу в режим WAL), default - без изменений файла базы: база в
+# репозитории остается в прежнем режиме журнала и без статистики optimize
+RND_DB_PROFILE = os.environ.get('RND_DB_PROFILE', 'default')
+
 # Конфигурация базы данных
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'core.backends.sqlite3',
         'NAME': BASE_DIR / 'rnd_simple_db.sqlite3',
+        # Соединение переиспользуется между запросами и проверяется перед ними
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'profile': RND_DB_PROFILE,
+            # Транзакции изменяющих запросов и загрузок сразу берут блокировку
+            # записи (WriteTransactionMiddleware, write_transactions), чтение
+            # идет в обычных транзакциях
+            # Период PRAGMA optimize и контрольной точки WAL, секунд
+            'maintenance_interval': 0 if RND_DB_PROFILE == 'default' else 300,
+        },
     }
 }
 
+# Реплика для чтения: копия основной базы в файле RND_REPLICA_DB,
+# обновляется командой sync_replica. Вместо нее можно объявить второй
+# экземпляр PostgreSQL и указать его алиас в RND_READ_REPLICAS
+RND_REPLICA_DB = os.environ.get('RND_REPLICA_DB')
+if RND_REPLICA_DB:
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'NAME': RND_REPLICA_DB,
+        'OPTIONS': {
+            'profile': 'read_heavy',
+            'pragmas': {'query_only': 'ON'},
+            'maintenance_interval': 0,
+        },
+        # В тестах реплика - та же база, что default
+        'TEST': {'MIRROR': 'default'},
+    }
+
+# Алиасы реплик: списки и сводка админки, API и выгрузки читают с них
+RND_READ_REPLICAS = ['replica'] if RND_REPLICA_DB else []
+
+# Сколько секунд после изменяющего запроса чтение идет в основную базу
+RND_REPLICA_STICKY_SECONDS = 5
+
+DATABASE_ROUTERS = ['rnd.routing.ReplicaRouter']
+
 
 # ============================= АУТЕНТИФИКАЦИЯ ================================
 
@@ -122,9 +167,57 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'          # Финалная сборка
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
-# Лимиты загрузки файлов
-DATA_UPLOAD_MAX_MEMORY_SIZE = 100 * 1024 * 1024  # 100MB
-FILE_UPLOAD_MAX_MEMORY_SIZE = 50 * 1024 * 1024   # 50MB
+# Хранилища файлов: сканы договоров и файлы ТЗ хранятся под именами по
+# SHA-256 содержимого, одинаковые файлы - один раз (rnd.storage)
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'documents': {'BACKEND': 'rnd.storage.ContentAddressedStorage'},
+}
+
+# Загружаемые файлы пишутся на диск частями с подсчетом SHA-256 и в памяти
+# не держатся (rnd.uploads); лимит памяти - только для полей форм без файлов
+FILE_UPLOAD_HANDLERS = ['rnd.uploads.HashingFileUploadHandler']
+DATA_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
+
+# Загрузка по частям с возобновлением: каталог незавершенных загрузок
+# (на одном диске с MEDIA_ROOT файл переносится без копирования),
+# наибольший размер файла и срок хранения незавершенной загрузки
+RND_UPLOAD_DIR = BASE_DIR / 'upload_tmp'
+RND_UPLOAD_MAX_SIZE = 2 * 1024 * 1024 * 1024  # 2GB
+RND_UPLOAD_EXPIRY = 24 * 60 * 60
+
+# Отдача файлов документов с проверкой прав (rnd.serving): без настройки файл
+# отдает Django; 'x-accel-redirect' - nginx по внутреннему адресу
+#     location /protected-media/ { internal; alias <MEDIA_ROOT>/; }
+# 'x-sendfile' - Apache mod_xsendfile или lighttpd по полному пути файла
+RND_MEDIA_SENDFILE = os.environ.get('RND_MEDIA_SENDFILE') or None
+RND_MEDIA_ACCEL_PREFIX = '/protected-media/'
+
+# Кэши: default - в памяти процесса (счетчики строк списков); версии
+# справочников (rnd.lookups) должны быть общими для всех процессов -
+# файловый кэш на одном сервере, memcached или redis на нескольких
+CACHES = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+    'lookups': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('RND_LOOKUP_CACHE_DIR', BASE_DIR / 'cache' / 'lookups'),
+    },
+}
+RND_LOOKUP_CACHE = 'lookups'
+
+# ================================= HTTP API ==================================
+
+# Токены внешних систем для API (заголовок "Authorization: Token <токен>"),
+# через запятую в переменной окружения RND_API_TOKENS
+RND_API_TOKENS = [token for token in os.environ.get('RND_API_TOKENS', '').split(',') if token]
+
+# ============================ ДИАГНОСТИКА ЗАПРОСОВ ============================
+
+# Отчет о повторяющихся запросах (N+1) в журнал rnd.queries и заголовок
+# X-Query-Count (только для разработки)
+RND_QUERY_INSPECTION = DEBUG
+RND_QUERY_REPEAT_THRESHOLD = 5
 
 # ============================= ПРОЧИЕ НАСТРОЙКИ ==============================
 
@@ -1,23 +1,307 @@
 """
 Админка для моделей.
 """
+from functools import reduce
+from operator import or_
+
 from django.contrib import admin
-from django.utils.html import format_html
+from django.utils.html import format_html, format_html_join
 from django.urls import reverse, path
 from django.http import HttpResponseRedirect
+from django.template.response import TemplateResponse
 from django.contrib import messages
+from django.contrib.admin.options import IncorrectLookupParameters
+from django.contrib.admin.views.main import ORDER_VAR, ChangeList
+from django.core.exceptions import PermissionDenied
+from django.utils.text import smart_split, unescape_string_literal
 from django.utils.translation import gettext_lazy as _
 from django import forms
-from django.db.models import Count
+from django.forms.models import BaseInlineFormSet
+from django.db import router, transaction
+from django.db.models import Q, Value
+from django.db.models.functions import Coalesce
 
 from .models import (
     Contract, ContractType, RnD, RnDTask, RnDType, TechnicalSpecification,
-    update_all_rnd_statuses_for_contract
+    propagate_contract_statuses
 )
-from .forms import ContractForm
+from . import identifiers, search, summaries
+from .routing import replica_reads
+from .serving import document_url
+from .dossier import load_contract_dossier
+from .export import ExportError, export_response
+from .forms import ContractForm, TechnicalSpecificationForm
+from .lookups import CachedModelChoiceField
+from .pagination import ApproximateCountPaginator, InvalidCursor, KeysetPaginator
+
+
+CURSOR_VAR = 'cursor'
+
+# Аннотации порядка по релевантности (FullTextSearchMixin)
+SEARCH_RANK_FIELDS = ('search_rank', 'search_text_rank')
+
+
+class RankedChangeList(ChangeList):
+    """При поиске без явной сортировки выводит результаты по релевантности."""
+    
+    def get_ordering(self, request, queryset):
+        if ORDER_VAR not in self.params and 'search_rank' in queryset.query.annotations:
+            return self._get_deterministic_ordering(
+                [name for name in SEARCH_RANK_FIELDS if name in queryset.query.annotations]
+            )
+        return super().get_ordering(request, queryset)
+
+
+class KeysetChangeList(RankedChangeList):
+    """
+    Список с постраничным выводом по курсору (параметр cursor) вместо
+    номера страницы. При сортировке по столбцу, поиске по релевантности
+    и "Показать все" используется обычный вывод.
+    """
+    
+    def __init__(self, request, *args, **kwargs):
+        self.cursor = request.GET.get(CURSOR_VAR)
+        self.keyset_page = None
+        super().__init__(request, *args, **kwargs)
+    
+    def get_filters_params(self, params=None):
+        lookup_params = super().get_filters_params(params)
+        lookup_params.pop(CURSOR_VAR, None)
+        return lookup_params
+    
+    def get_query_string(self, new_params=None, remove=None):
+        # Смена фильтров и сортировки начинает список с первой страницы
+        return super().get_query_string(new_params, [CURSOR_VAR, *(remove or [])])
+    
+    def use_keyset(self):
+        return (
+            ORDER_VAR not in self.params
+            and 'search_rank' not in self.queryset.query.annotations
+            and not self.show_all
+        )
+    
+    def get_results(self, request):
+        if not self.use_keyset():
+            return super().get_results(request)
+        
+        paginator = KeysetPaginator(
+            self.queryset, self.list_per_page, self.model_admin.get_keyset_ordering(request)
+        )
+        try:
+            page = paginator.page(self.cursor)
+        except InvalidCursor:
+            raise IncorrectLookupParameters
+        counter = self.model_admin.get_paginator(request, self.queryset, self.list_per_page)
+        
+        self.result_count = counter.count
+        self.show_full_result_count = False
+        self.full_result_count = None
+        self.show_admin_actions = True
+        self.result_list = page.object_list
+        self.can_show_all = False
+        self.multi_page = page.has_next or page.has_previous
+        self.paginator = counter
+        self.keyset_page = page
+    
+    @property
+    def keyset_first_url(self):
+        return self.get_query_string()
+    
+    @property
+    def keyset_next_url(self):
+        return self.get_query_string({CURSOR_VAR: self.keyset_page.next_cursor})
+    
+    @property
+    def keyset_previous_url(self):
+        return self.get_query_string({CURSOR_VAR: self.keyset_page.previous_cursor})
+
+
+class LoadingProfileMixin:
+    """
+    Загрузка записей по профилям менеджера (rnd.managers): список
+    и автодополнение - list_profile, карточка и встроенные формы -
+    detail_profile, варианты выбора внешних ключей - validation.
+    """
+    
+    list_profile = 'list'
+    detail_profile = 'detail'
+    
+    def get_loading_profile(self, request):
+        match = getattr(request, 'resolver_match', None)
+        opts = self.model._meta
+        if match and match.url_name in (f'{opts.app_label}_{opts.model_name}_changelist', 'autocomplete'):
+            return self.list_profile
+        return self.detail_profile
+    
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if hasattr(queryset, 'profile'):
+            queryset = queryset.profile(self.get_loading_profile(request))
+        return queryset
+    
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        formfield = super().formfield_for_foreignkey(db_field, request, **kwargs)
+        # Справочники выбираются из процессного кэша, профиль им не нужен
+        if (
+            formfield is not None
+            and not isinstance(formfield, CachedModelChoiceField)
+            and hasattr(formfield.queryset, 'profile')
+        ):
+            formfield.queryset = formfield.queryset.profile('validation')
+        return formfield
+
 
+class SharedChoicesInlineFormSet(BaseInlineFormSet):
+    """
+    Варианты выбора внешних ключей читаются один раз на набор форм,
+    а не отдельным запросом в каждой строке встроенной формы.
+    """
+    
+    def add_fields(self, form, index):
+        super().add_fields(form, index)
+        shared = self.__dict__.setdefault('_shared_choices', {})
+        for name, field in form.fields.items():
+            if (
+                isinstance(field, forms.ModelChoiceField)
+                and not isinstance(field, CachedModelChoiceField)
+                and not field.widget.is_hidden
+            ):
+                if name not in shared:
+                    shared[name] = list(field.choices)
+                field.choices = shared[name]
 
-class SupplementaryAgreementInline(admin.TabularInline):
+
+class TechnicalSpecificationInlineFormSet(SharedChoicesInlineFormSet):
+    """
+    Не больше одной актуальной версии ТЗ в наборе форм. Проверка не
+    обращается к базе: прежняя актуальная версия снимается при сохранении.
+    """
+    
+    def clean(self):
+        super().clean()
+        active = [
+            form for form in self.forms
+            if form.cleaned_data.get('is_active') and not self._should_delete_form(form)
+        ]
+        if len(active) > 1:
+            raise forms.ValidationError(_('Актуальной может быть только одна версия ТЗ'))
+
+
+class ProfiledRelatedFieldListFilter(admin.RelatedFieldListFilter):
+    """Фильтр по внешнему ключу: варианты загружаются профилем validation."""
+    
+    def field_choices(self, field, request, model_admin):
+        queryset = field.remote_field.model._default_manager.complex_filter(field.get_limit_choices_to())
+        if not hasattr(queryset, 'profile'):
+            return super().field_choices(field, request, model_admin)
+        ordering = self.field_admin_ordering(field, request, model_admin)
+        if ordering:
+            queryset = queryset.order_by(*ordering)
+        attname = field.remote_field.get_related_field().attname
+        return [(getattr(obj, attname), str(obj)) for obj in queryset.profile('validation')]
+
+
+class FastPaginationMixin:
+    """
+    Подсчет строк в списке с ограниченной стоимостью; при
+    pagination_mode = 'keyset' - постраничный вывод по курсору,
+    ключи сортировки - keyset_ordering или Meta.ordering модели.
+    """
+    
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+    pagination_mode = 'offset'
+    keyset_ordering = None
+    
+    def get_keyset_ordering(self, request):
+        return self.keyset_ordering
+    
+    def get_changelist(self, request, **kwargs):
+        if self.pagination_mode == 'keyset':
+            return KeysetChangeList
+        return super().get_changelist(request, **kwargs)
+
+
+class FullTextSearchMixin:
+    """
+    Поиск в админке через FTS5-индекс модели и триграммный индекс
+    идентификаторов. Текстовые поля ищутся по FTS5, поля из
+    search_fuzzy_fields - по фрагменту без учета регистра и разделителей,
+    поля из search_exact_fields - точным совпадением, остальные поля
+    search_fields (связанные модели и т.п.) - стандартным поиском.
+    Без FTS5 текст ищется стандартным поиском. По FTS5 берется не больше
+    search_limit лучших записей, о чем выводится предупреждение.
+    """
+    
+    search_exact_fields = ()
+    search_fuzzy_fields = ()
+    search_limit = 1000
+    fuzzy_search_limit = 50
+    
+    def get_search_results(self, request, queryset, search_term):
+        search_term = search_term.strip()
+        if not search_term:
+            return super().get_search_results(request, queryset, search_term)
+        
+        using = queryset.db
+        ids = []
+        if self.search_fuzzy_fields:
+            ids = [pk for pk, _ in identifiers.fuzzy_rank(
+                self.model._base_manager.using(using), self.search_fuzzy_fields,
+                search_term, self.fuzzy_search_limit
+            )]
+        
+        ranking = {}
+        if search.is_available(self.model, using):
+            if search.count_matches(self.model, search_term, self.search_limit, using=using) >= self.search_limit:
+                messages.warning(request, _('Показаны {} наиболее подходящих записей, уточните запрос').format(
+                    self.search_limit
+                ))
+            condition = Q(pk__in=ids)
+            matches = search.match_subquery(self.model, search_term, self.search_limit, using=using)
+            if matches is not None:
+                condition |= Q(pk__in=matches)
+                ranking['search_text_rank'] = Coalesce(search.MatchRank(self.model, search_term), Value(0.0))
+            for field in self.search_exact_fields:
+                condition |= Q(**{field: search_term})
+            other = self.get_unindexed_search_condition(request, search_term)
+            if other is not None:
+                condition |= Q(pk__in=self.model._base_manager.using(using).filter(other).values('pk'))
+            queryset = queryset.filter(condition)
+        elif ids:
+            found = super().get_search_results(request, queryset, search_term)[0]
+            queryset = queryset.filter(Q(pk__in=found.values('pk')) | Q(pk__in=ids))
+        else:
+            return super().get_search_results(request, queryset, search_term)
+        
+        # Порядок по релевантности: сначала найденные по идентификатору, затем
+        # по bm25 (без совпадения в тексте - 0, после любого совпадения);
+        # в списке его задает RankedChangeList
+        queryset = queryset.annotate(search_rank=search.rank_ordering(ids), **ranking)
+        return queryset.order_by('search_rank', *ranking, '-pk'), False
+    
+    def get_unindexed_search_condition(self, request, search_term):
+        """Условие по полям search_fields, не покрытым FTS5, нечетким и точным поиском."""
+        covered = {
+            *search.SEARCH_FIELDS.get(self.model._meta.label, ()),
+            *self.search_fuzzy_fields, *self.search_exact_fields,
+        }
+        fields = [field for field in self.get_search_fields(request) if field not in covered]
+        if not fields:
+            return None
+        condition = Q()
+        for bit in smart_split(search_term):
+            if bit[:1] in ('"', "'") and bit[-1:] == bit[:1]:
+                bit = unescape_string_literal(bit)
+            condition &= reduce(or_, (Q(**{f'{field}__icontains': bit}) for field in fields))
+        return condition
+    
+    def get_changelist(self, request, **kwargs):
+        return RankedChangeList
+
+
+class SupplementaryAgreementInline(LoadingProfileMixin, admin.TabularInline):
+    formset = SharedChoicesInlineFormSet
     model = Contract
     fk_name = 'main_contract'
     extra = 0
@@ -34,12 +318,11 @@ class SupplementaryAgreementInline(admin.TabularInline):
     def get_formset(self, request, obj=None, **kwargs):
         formset = super().get_formset(request, obj, **kwargs)
         if obj and obj.pk:
-            supplementary_types = ContractType.objects.filter(
-                is_supplementary=True,
-                parent_type=obj.type
-            )
             if 'type' in formset.form.base_fields:
-                formset.form.base_fields['type'].queryset = supplementary_types
+                formset.form.base_fields['type'].limit_choices(
+                    is_supplementary=True,
+                    parent_type_id=obj.type_id
+                )
             if 'main_contract' in formset.form.base_fields:
                 formset.form.base_fields['main_contract'].initial = obj
                 formset.form.base_fields['main_contract'].widget = forms.HiddenInput()
@@ -51,7 +334,8 @@ class SupplementaryAgreementInline(admin.TabularInline):
         return False
 
 
-class TechnicalSpecificationInline(admin.TabularInline):
+class TechnicalSpecificationInline(LoadingProfileMixin, admin.TabularInline):
+    formset = TechnicalSpecificationInlineFormSet
     model = TechnicalSpecification
     extra = 0
     max_num = 10
@@ -64,16 +348,14 @@ class TechnicalSpecificationInline(admin.TabularInline):
         formset = super().get_formset(request, obj, **kwargs)
         if obj:
             allowed_contracts = Contract.objects.filter(
-                id=obj.contract.id
-            ) | Contract.objects.filter(
-                main_contract=obj.contract,
-                type__is_supplementary=True
-            )
+                Q(id=obj.contract_id) | Q(main_contract=obj.contract_id, type__is_supplementary=True)
+            ).profile('validation')
             formset.form.base_fields['contract_document'].queryset = allowed_contracts
         return formset
 
 
-class RnDTaskInline(admin.TabularInline):
+class RnDTaskInline(LoadingProfileMixin, admin.TabularInline):
+    formset = SharedChoicesInlineFormSet
     model = RnDTask
     extra = 0
     max_num = 20
@@ -85,7 +367,7 @@ class RnDTaskInline(admin.TabularInline):
         formset = super().get_formset(request, obj, **kwargs)
         if obj:
             formset.form.base_fields['source_specification'].queryset = \
-                TechnicalSpecification.objects.filter(rnd=obj)
+                TechnicalSpecification.objects.filter(rnd=obj).profile('validation')
         return formset
 
 
@@ -100,9 +382,6 @@ class ContractTypeAdmin(admin.ModelAdmin):
         (_('Классификация'), {'fields': ('is_supplementary', 'parent_type')}),
     )
     
-    def get_queryset(self, request):
-        return super().get_queryset(request).annotate(contracts_count=Count('contracts'))
-    
     def is_supplementary_display(self, obj):
         if obj.is_supplementary:
             return format_html(
@@ -119,14 +398,10 @@ class ContractTypeAdmin(admin.ModelAdmin):
         return obj.parent_type.short_name if obj.parent_type else "-"
     parent_type_display.short_description = _('Родительский тип')
     
-    def contracts_count(self, obj):
-        return obj.contracts_count
-    contracts_count.short_description = _('Документов')
-    contracts_count.admin_order_field = 'contracts_count'
 
 
 @admin.register(Contract)
-class ContractAdmin(admin.ModelAdmin):
+class ContractAdmin(LoadingProfileMixin, FastPaginationMixin, FullTextSearchMixin, admin.ModelAdmin):
     form = ContractForm
     list_display = (
         'number', 'name', 'type_display', 'signed_date', 'effective_date',
@@ -134,24 +409,24 @@ class ContractAdmin(admin.ModelAdmin):
     )
     list_filter = ('type', 'status', ('type__is_supplementary', admin.BooleanFieldListFilter), 'signed_date')
     search_fields = ('number', 'name', 'description')
-    list_select_related = ('type', 'main_contract')
-    readonly_fields = ('created_at', 'updated_at', 'contract_status_display')
+    search_exact_fields = ('number',)
+    search_fuzzy_fields = ('number',)
+    pagination_mode = 'keyset'
+    readonly_fields = (
+        'created_at', 'updated_at', 'contract_status_display', 'version_chain_display', 'dossier_display'
+    )
     inlines = [SupplementaryAgreementInline]
     
     fieldsets = (
         (_('Классификация'), {'fields': ('type', 'main_contract')}),
         (_('Основная информация'), {'fields': ('number', 'name', 'description')}),
         (_('Даты и статус'), {'fields': ('signed_date', 'effective_date', 'status')}),
-        (_('Документ'), {'fields': ('document',), 'classes': ('collapse',)}),
-        (_('Версии'), {'fields': ('previous_version',), 'classes': ('collapse',)}),
+        (_('Документ'), {'fields': ('document', 'document_upload'), 'classes': ('collapse',)}),
+        (_('Версии'), {'fields': ('previous_version', 'version_chain_display'), 'classes': ('collapse',)}),
+        (_('Состав работ'), {'fields': ('dossier_display',), 'classes': ('collapse',)}),
         (_('Системная информация'), {'fields': ('contract_status_display', 'created_at', 'updated_at'), 'classes': ('collapse',)}),
     )
     
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        qs = qs.select_related('type', 'main_contract').prefetch_related('related_documents')
-        return qs.annotate(related_docs_count=Count('related_documents'))
-    
     def type_display(self, obj):
         return obj.type.short_name
     type_display.short_description = _('Тип')
@@ -201,13 +476,66 @@ class ContractAdmin(admin.ModelAdmin):
             )
     contract_status_display.short_description = _('Статусы')
     
+    def version_chain_display(self, obj):
+        if not obj or not obj.pk:
+            return "-"
+        chain = list(Contract.objects.version_chain(obj))
+        if len(chain) < 2:
+            return _('Других версий нет')
+        items = []
+        for version in chain:
+            if version.pk == obj.pk:
+                items.append(format_html(
+                    '<li><strong>{}</strong> ({}, {})</li>',
+                    version.number, version.signed_date.strftime('%d.%m.%Y'), version.get_status_display()
+                ))
+            else:
+                url = reverse('admin:rnd_contract_change', args=[version.pk])
+                items.append(format_html(
+                    '<li><a href="{}">{}</a> ({}, {})</li>',
+                    url, version.number, version.signed_date.strftime('%d.%m.%Y'), version.get_status_display()
+                ))
+        return format_html('<ol style="margin: 0; padding-left: 20px;">{}</ol>', format_html_join('', '{}', ((i,) for i in items)))
+    version_chain_display.short_description = _('История версий')
+    
+    def dossier_display(self, obj):
+        if not obj or not obj.pk or obj.type.is_supplementary:
+            return "-"
+        dossier = load_contract_dossier(obj)
+        if dossier is None or not dossier.rnd_works:
+            return _('НИОКР по договору нет')
+        rows = []
+        for work in dossier.rnd_works:
+            specification = work.active_specification
+            rows.append((
+                reverse('admin:rnd_rnd_change', args=[work.id]),
+                work.code,
+                work.title,
+                work.status_display,
+                f'{specification.version} ({specification.contract_document})' if specification else '-',
+                work.tasks_done,
+                len(work.tasks),
+            ))
+        return format_html(
+            '<table><thead><tr><th>{}</th><th>{}</th><th>{}</th><th>{}</th><th>{}</th></tr></thead>'
+            '<tbody>{}</tbody></table>',
+            _('Шифр'), _('Тема'), _('Статус'), _('Актуальное ТЗ'), _('Задачи'),
+            format_html_join(
+                '',
+                '<tr><td><a href="{}">{}</a></td><td>{}</td><td>{}</td><td>{}</td><td>{} / {}</td></tr>',
+                rows
+            )
+        )
+    dossier_display.short_description = _('НИОКР по договору')
+    
     def related_documents_count(self, obj):
-        count = obj.related_docs_count if hasattr(obj, 'related_docs_count') else obj.related_documents.count()
+        count = obj.supplementary_count
         if count > 0 and obj.is_main_contract:
             url = reverse('admin:rnd_contract_changelist') + f'?main_contract__id__exact={obj.id}'
             return format_html('<a href="{}">{}</a>', url, count)
         return count
     related_documents_count.short_description = _('Доп. соглашений')
+    related_documents_count.admin_order_field = 'supplementary_count'
     
     def get_inlines(self, request, obj=None):
         if obj and obj.pk and not obj.type.is_supplementary:
@@ -216,8 +544,9 @@ class ContractAdmin(admin.ModelAdmin):
     
     def get_form(self, request, obj=None, **kwargs):
         form = super().get_form(request, obj, **kwargs)
+        form.user = request.user
         if obj and obj.type.is_supplementary:
-            form.base_fields['main_contract'].queryset = Contract.objects.filter(type__is_supplementary=False)
+            form.base_fields['main_contract'].queryset = Contract.objects.main_contracts().profile('validation')
         else:
             form.base_fields['main_contract'].widget = forms.HiddenInput()
             form.base_fields['main_contract'].required = False
@@ -233,17 +562,25 @@ class ContractAdmin(admin.ModelAdmin):
     
     def document_quick_view(self, obj):
         """Минимальная версия - просто ссылка."""
-        if obj.document and obj.document.url:
+        if obj.document:
             return format_html(
                 '<a href="{}" target="_blank" style="color: #2196F3; font-weight: bold;">📄</a>',
-                obj.document.url
+                document_url(obj)
             )
         return "-"
     document_quick_view.short_description = _('Договор')
     document_quick_view.allow_tags = True
     
     def sync_rnd_status(self, request, object_id):
-        updated_count = update_all_rnd_statuses_for_contract(object_id)
+        contract = self.get_object(request, object_id)
+        if contract is None:
+            return self._get_obj_does_not_exist_redirect(request, self.opts, object_id)
+        if not self.has_change_permission(request, contract):
+            raise PermissionDenied
+        using = router.db_for_write(RnD)
+        # UPDATE статусов и изменения сводок фиксируются вместе, как в сигнале
+        with transaction.atomic(using=using):
+            updated_count = sum(propagate_contract_statuses(contract, using=using).values())
         if updated_count > 0:
             self.message_user(request, _('Статусы {} НИОКР успешно синхронизированы с договором').format(updated_count),
                              messages.SUCCESS)
@@ -270,62 +607,49 @@ class ContractAdmin(admin.ModelAdmin):
             )
         return super().change_view(request, object_id, form_url, extra_context=extra_context)
     
-    def save_model(self, request, obj, form, change):
-        if not change:
-            main_contract = obj.main_contract
-            obj.main_contract = None
-            super().save_model(request, obj, form, change)
-            if not obj.type.is_supplementary:
-                obj.main_contract = obj
-                obj.save(update_fields=['main_contract'])
-            else:
-                obj.main_contract = main_contract
-                obj.save(update_fields=['main_contract'])
-        else:
-            super().save_model(request, obj, form, change)
-    
     class Media:
         css = {'all': ('css/admin_contract.css',)}
 
 
 @admin.register(RnDType)
 class RnDTypeAdmin(admin.ModelAdmin):
-    list_display = ('short_name', 'name', 'description_short', 'rnd_count')
+    list_display = ('short_name', 'name', 'description_short', 'rnd_count_display')
     search_fields = ('name', 'short_name', 'description')
     list_display_links = ('short_name', 'name')
     fieldsets = ((None, {'fields': ('name', 'short_name', 'description')}),)
     
-    def get_queryset(self, request):
-        return super().get_queryset(request).annotate(rnd_count=Count('rnd'))
-    
     def description_short(self, obj):
         if obj.description and len(obj.description) > 100:
             return f"{obj.description[:100]}..."
         return obj.description or "-"
     description_short.short_description = _('Описание')
     
-    def rnd_count(self, obj):
-        count = obj.rnd_count if hasattr(obj, 'rnd_count') else obj.rnd_set.count()
+    def rnd_count_display(self, obj):
         url = reverse('admin:rnd_rnd_changelist') + f'?type__id__exact={obj.id}'
-        return format_html('<a href="{}">{}</a>', url, count)
-    rnd_count.short_description = _('НИОКР')
+        return format_html('<a href="{}">{}</a>', url, obj.rnd_count)
+    rnd_count_display.short_description = _('НИОКР')
+    rnd_count_display.admin_order_field = 'rnd_count'
 
 
 @admin.register(RnD)
-class RnDAdmin(admin.ModelAdmin):
-    list_display = ('uuid_display', 'code', 'title_short', 'contract_link', 'type_display', 'status_display', 'created_at')
+class RnDAdmin(LoadingProfileMixin, FastPaginationMixin, FullTextSearchMixin, admin.ModelAdmin):
+    list_display = ('uuid_display', 'code', 'title_short', 'contract_link', 'type_display', 'status_display',
+                    'tasks_progress', 'created_at')
     list_filter = ('status', 'type', 'contract__type')
     search_fields = ('uuid', 'code', 'title', 'purpose', 'contract__number')
-    list_select_related = ('contract', 'type', 'contract__type')
-    readonly_fields = ('created_at', 'updated_at', 'contract_info', 'last_contract_status')
+    search_exact_fields = ('uuid', 'code', 'contract__number')
+    search_fuzzy_fields = ('code', 'uuid')
+    autocomplete_fields = ('contract',)
+    readonly_fields = ('created_at', 'updated_at', 'contract_info', 'last_contract_status', 'tasks_progress')
     inlines = [TechnicalSpecificationInline, RnDTaskInline]
+    actions = ['export_csv', 'export_xlsx']
     
     fieldsets = (
         (_('Идентификация'), {'fields': ('uuid', 'code', 'title', 'type')}),
         (_('Договорная информация'), {'fields': ('contract', 'contract_info')}),
         (_('Содержание'), {'fields': ('purpose',)}),
         (_('Статус'), {
-            'fields': ('status', 'last_contract_status'),
+            'fields': ('status', 'last_contract_status', 'tasks_progress'),
             'description': _(
                 '<strong>В работе</strong> - НИОКР выполняется<br>'
                 '<strong>Приостановлена</strong> - работа временно остановлена<br>'
@@ -336,11 +660,6 @@ class RnDAdmin(admin.ModelAdmin):
         (_('Системная информация'), {'fields': ('created_at', 'updated_at'), 'classes': ('collapse',)}),
     )
     
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related(
-            'contract', 'type', 'contract__type'
-        ).prefetch_related('tasks', 'technical_specifications')
-    
     def uuid_display(self, obj):
         return format_html(
             '<code style="font-size: 0.9em; background: #f5f5f5; padding: 2px 4px; border-radius: 3px;">{}</code>',
@@ -384,6 +703,13 @@ class RnDAdmin(admin.ModelAdmin):
         )
     status_display.short_description = _('Статус')
     
+    def tasks_progress(self, obj):
+        if not obj.tasks_total:
+            return '-'
+        return f"{obj.tasks_done} / {obj.tasks_total}"
+    tasks_progress.short_description = _('Задачи')
+    tasks_progress.admin_order_field = 'tasks_done'
+    
     def contract_info(self, obj):
         contract = obj.contract
         url = reverse('admin:rnd_contract_change', args=[contract.id])
@@ -404,28 +730,72 @@ class RnDAdmin(admin.ModelAdmin):
             url, _('Перейти к договору')
         )
     contract_info.short_description = _('Информация о договоре')
+    
+    def get_urls(self):
+        urls = super().get_urls()
+        custom_urls = [
+            path('dashboard/', self.admin_site.admin_view(self.dashboard_view), name='rnd_dashboard'),
+        ]
+        return custom_urls + urls
+    
+    def dashboard_view(self, request):
+        """Сводка по статусам: читает только таблицы сводок."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        show_contracts = self.admin_site.get_model_admin(Contract).has_view_permission(request)
+        context = {
+            **self.admin_site.each_context(request),
+            'title': _('Сводка по статусам'),
+            'opts': self.opts,
+            'rnd_table': summaries.rnd_dashboard(),
+            'contract_table': summaries.contract_dashboard() if show_contracts else None,
+        }
+        return TemplateResponse(request, 'admin/rnd/dashboard.html', context)
+    
+    def export(self, request, queryset, export_format):
+        # Выгрузка читает реплику; файл пишется после ответа, алиас - сейчас
+        with replica_reads():
+            queryset = queryset.using(router.db_for_read(self.model))
+        try:
+            return export_response(queryset, export_format)
+        except ExportError as exc:
+            self.message_user(request, str(exc), messages.ERROR)
+    
+    def export_csv(self, request, queryset):
+        return self.export(request, queryset, 'csv')
+    export_csv.short_description = _('Выгрузить в CSV')
+    export_csv.allowed_permissions = ('view',)
+    
+    def export_xlsx(self, request, queryset):
+        return self.export(request, queryset, 'xlsx')
+    export_xlsx.short_description = _('Выгрузить в XLSX')
+    export_xlsx.allowed_permissions = ('view',)
 
 
 @admin.register(TechnicalSpecification)
-class TechnicalSpecificationAdmin(admin.ModelAdmin):
+class TechnicalSpecificationAdmin(LoadingProfileMixin, FastPaginationMixin, FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('rnd_uuid_display', 'version_display', 'contract_document_link', 'is_active_display', 
                    'ts_file_quick_view', 'uploaded_at')
     list_filter = ('is_active', ('contract_document__type__is_supplementary', admin.BooleanFieldListFilter), 
-                  'contract_document__main_contract')
+                  ('contract_document__main_contract', ProfiledRelatedFieldListFilter))
     search_fields = ('rnd__uuid', 'rnd__code', 'rnd__title', 'contract_document__number', 'description')
-    list_select_related = ('rnd', 'contract_document', 'contract_document__type')
+    search_exact_fields = ('rnd__uuid', 'rnd__code', 'contract_document__number')
+    autocomplete_fields = ('rnd',)
+    pagination_mode = 'keyset'
     readonly_fields = ('uploaded_at', 'file_path_info')
+    actions = ['make_active']
+    form = TechnicalSpecificationForm
     
     fieldsets = (
         (_('Привязка'), {'fields': ('rnd', 'contract_document')}),
-        (_('Техническое задание'), {'fields': ('version', 'document', 'description', 'is_active')}),
+        (_('Техническое задание'), {'fields': ('version', 'document', 'document_upload', 'description', 'is_active')}),
         (_('Информация о файле'), {'fields': ('file_path_info', 'uploaded_at'), 'classes': ('collapse',)}),
     )
     
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related(
-            'rnd', 'rnd__contract', 'contract_document', 'contract_document__type', 'contract_document__main_contract'
-        )
+    def get_form(self, request, obj=None, **kwargs):
+        form = super().get_form(request, obj, **kwargs)
+        form.user = request.user
+        return form
     
     def rnd_uuid_display(self, obj):
         url = reverse('admin:rnd_rnd_change', args=[obj.rnd.id])
@@ -531,23 +901,41 @@ class TechnicalSpecificationAdmin(admin.ModelAdmin):
     
     def ts_file_quick_view(self, obj):
         """Быстрый просмотр файла ТЗ в списке."""
-        if obj.document and obj.document.url:
+        if obj.document:
             return format_html(
                 '<a href="{}" target="_blank" style="color: #2196F3; font-weight: bold;">📋</a>',
-                obj.document.url
+                document_url(obj)
             )
         return "-"
     ts_file_quick_view.short_description = _('Техническое задание')
     ts_file_quick_view.allow_tags = True
+    
+    def make_active(self, request, queryset):
+        specifications = list(queryset.only('pk', 'rnd_id', 'is_active'))
+        if len({specification.rnd_id for specification in specifications}) != len(specifications):
+            self.message_user(request, _('Выберите не больше одной версии ТЗ для каждой НИОКР'), messages.ERROR)
+            return
+        with transaction.atomic(using=router.db_for_write(self.model)):
+            for specification in specifications:
+                specification.activate()
+        self.message_user(request, _('Актуальными отмечены версий ТЗ: {}').format(len(specifications)))
+    make_active.short_description = _('Сделать актуальной версией')
+    make_active.allowed_permissions = ('change',)
 
 
 @admin.register(RnDTask)
-class RnDTaskAdmin(admin.ModelAdmin):
+class RnDTaskAdmin(LoadingProfileMixin, FastPaginationMixin, FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('rnd_info', 'order_display', 'description_short', 'source_specification_display', 
                    'is_completed_display', 'created_at')
-    list_filter = ('is_completed', 'rnd__contract', 'source_specification')
+    list_filter = (
+        'is_completed',
+        ('rnd__contract', ProfiledRelatedFieldListFilter),
+        ('source_specification', ProfiledRelatedFieldListFilter),
+    )
     search_fields = ('description', 'rnd__uuid', 'rnd__code', 'rnd__title', 'source_specification__version')
-    list_select_related = ('rnd', 'source_specification', 'rnd__contract')
+    search_exact_fields = ('rnd__uuid', 'rnd__code')
+    autocomplete_fields = ('rnd',)
+    pagination_mode = 'keyset'
     readonly_fields = ('created_at', 'updated_at')
     
     fieldsets = (
@@ -556,11 +944,6 @@ class RnDTaskAdmin(admin.ModelAdmin):
         (_('Системная информация'), {'fields': ('created_at', 'updated_at'), 'classes': ('collapse',)}),
     )
     
-    def get_queryset(self, request):
-        return super().get_queryset(request).select_related(
-            'rnd', 'rnd__contract', 'source_specification', 'source_specification__contract_document'
-        )
-    
     def rnd_info(self, obj):
         url = reverse('admin:rnd_rnd_change', args=[obj.rnd.id])
         return format_html(
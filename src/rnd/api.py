@@ -0,0 +1,362 @@
+"""
+HTTP API реестра (только чтение).
+
+Ответ строится из values() и отдается потоково пачками по CHUNK_SIZE строк,
+поэтому память не зависит от размера страницы. Параметры запроса:
+    fields=a,b        - только указанные поля;
+    expand=x,y        - вложить связанные записи: один запрос на связь
+                        на пачку строк, типы договоров и НИОКР - из
+                        процессного кэша справочников;
+    limit=N           - размер страницы (не больше MAX_LIMIT);
+    cursor=...        - следующая страница (ссылка next из ответа);
+    updated_since=... - записи, измененные начиная с указанного момента;
+    фильтры ресурса   - точное совпадение, например ?status=active.
+
+Ответ: {"results": [...], "next": "<ссылка на следующую страницу>" | null}.
+"""
+import datetime
+import hmac
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from . import lookups, serving
+from .models import Contract, ContractType, RnD, RnDTask, RnDType, TechnicalSpecification
+from .pagination import InvalidCursor, KeysetPaginator
+
+
+DEFAULT_LIMIT = 500
+MAX_LIMIT = 5000
+
+# Строк в пачке: столько читается из курсора и раскрывается за раз
+CHUNK_SIZE = 1000
+
+BOOLEAN_VALUES = {
+    'true': True, '1': True, 'yes': True, 'да': True,
+    'false': False, '0': False, 'no': False, 'нет': False,
+}
+
+RESERVED_PARAMS = ('fields', 'expand', 'limit', 'cursor', 'updated_since')
+
+
+class ApiError(Exception):
+    """Ошибка в параметрах запроса."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def is_authorized(request, model):
+    """Токен из RND_API_TOKENS или пользователь с правом просмотра модели."""
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Token '):
+        token = header[len('Token '):].strip()
+        return any(
+            hmac.compare_digest(token, allowed)
+            for allowed in getattr(settings, 'RND_API_TOKENS', ())
+        )
+    opts = model._meta
+    return request.user.is_authenticated and request.user.has_perm(
+        f'{opts.app_label}.view_{opts.model_name}'
+    )
+
+
+class Query:
+    """Разобранные параметры запроса к ресурсу."""
+
+    def __init__(self, fields, expand, limit, cursor, filters):
+        self.fields = fields
+        self.expand = expand
+        self.limit = limit
+        self.cursor = cursor
+        self.filters = filters
+
+
+class Resource:
+    """
+    Ресурс API: модель, поля ответа, фильтры и вложения.
+    Внешние ключи в ответе - значения ключей под именем поля (type: 5).
+    """
+
+    model = None
+    fields = ()
+    filters = {}
+    # Вложение -> (внешний ключ, ресурс связанной модели)
+    expand = {}
+    updated_field = None
+    # Порядок выдачи и ключи курсора: по первичному ключу новые
+    # записи попадают в конец, страницы читаются по индексу
+    ordering = ('id',)
+
+    @classmethod
+    def attname(cls, name):
+        return cls.model._meta.get_field(name).attname
+
+    @classmethod
+    def parse(cls, params):
+        fields = cls._names(params.get('fields'), cls.fields, 'поле')
+        expand = cls._names(params.get('expand'), (), 'вложение', cls.expand)
+
+        try:
+            limit = int(params.get('limit', DEFAULT_LIMIT))
+        except ValueError:
+            raise ApiError('limit должен быть целым числом')
+        if not 1 <= limit <= MAX_LIMIT:
+            raise ApiError(f'limit должен быть от 1 до {MAX_LIMIT}')
+
+        filters = {}
+        for key in params:
+            if key in RESERVED_PARAMS:
+                continue
+            if key not in cls.filters:
+                raise ApiError(f'Неизвестный параметр: {key}')
+            filters[cls.filters[key]] = cls._filter_value(cls.filters[key], params[key])
+
+        updated_since = params.get('updated_since')
+        if updated_since:
+            if cls.updated_field is None:
+                raise ApiError('Ресурс не поддерживает updated_since')
+            filters[f'{cls.updated_field}__gte'] = cls._moment(updated_since)
+
+        return Query(fields, expand, limit, params.get('cursor'), filters)
+
+    @classmethod
+    def _names(cls, value, default, label, allowed=None):
+        if not value:
+            return list(default)
+        allowed = cls.fields if allowed is None else allowed
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in allowed]
+        if unknown:
+            raise ApiError(f'Неизвестное {label}: {", ".join(unknown)}')
+        return names
+
+    @classmethod
+    def _filter_value(cls, lookup, value):
+        field = cls.model._meta.get_field(lookup.split('__')[0])
+        if isinstance(field, models.BooleanField):
+            if value.lower() not in BOOLEAN_VALUES:
+                raise ApiError(f'Некорректное значение фильтра {lookup}: {value}')
+            return BOOLEAN_VALUES[value.lower()]
+        try:
+            return field.to_python(value)
+        except ValidationError:
+            raise ApiError(f'Некорректное значение фильтра {lookup}: {value}')
+
+    @staticmethod
+    def _moment(value):
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                raise ApiError('updated_since: ожидается дата или дата и время ISO 8601')
+            moment = datetime.datetime.combine(day, datetime.time.min)
+        if timezone.is_naive(moment):
+            moment = timezone.make_aware(moment)
+        return moment
+
+    @classmethod
+    def columns(cls, fields, expand=()):
+        names = set(fields) | {cls.expand[name][0] for name in expand}
+        if names & cls.file_fields().keys():
+            # Адрес файла строится по первичному ключу записи
+            names.add('id')
+        keys = {name.lstrip('-') for name in cls.ordering}
+        return sorted({cls.attname(name) for name in names | keys})
+
+    @classmethod
+    def serialize(cls, row, fields, related=None):
+        data = {}
+        file_fields = cls.file_fields()
+        for name in fields:
+            value = row[cls.attname(name)]
+            if value and name in file_fields:
+                value = serving.document_url_for(cls.model, row['id'])
+            data[name] = value
+        for name, objects in (related or {}).items():
+            fk = cls.expand[name][0]
+            data[name] = objects.get(row[cls.attname(fk)])
+        return data
+
+    @classmethod
+    def file_fields(cls):
+        return {f.name: f for f in cls.model._meta.concrete_fields if isinstance(f, models.FileField)}
+
+    @classmethod
+    def fetch(cls, ids, using):
+        """Связанные записи {pk: данные} одним запросом (справочники - из кэша)."""
+        lookup = lookups.for_model(cls.model)
+        if lookup is not None:
+            rows = []
+            for pk in ids:
+                obj = lookup.get(pk, using)
+                if obj is not None:
+                    rows.append({cls.attname(name): getattr(obj, cls.attname(name)) for name in cls.fields})
+        else:
+            rows = cls.model._base_manager.using(using).filter(pk__in=ids).order_by().values(*cls.columns(cls.fields))
+        return {row['id']: cls.serialize(row, cls.fields) for row in rows}
+
+    @classmethod
+    def related(cls, rows, expand, using):
+        related = {}
+        for name in expand:
+            fk, resource = cls.expand[name]
+            attname = cls.attname(fk)
+            ids = {row[attname] for row in rows if row[attname] is not None}
+            related[name] = resource.fetch(ids, using) if ids else {}
+        return related
+
+    @classmethod
+    def stream(cls, queryset, query, next_url):
+        """
+        Генератор частей JSON-ответа. Ошибки курсора проверяются
+        до начала вывода (ApiError), дальше ответ только пишется.
+        """
+        paginator = KeysetPaginator(
+            queryset.filter(**query.filters).values(*cls.columns(query.fields, query.expand)),
+            query.limit, cls.ordering,
+        )
+        try:
+            rows, backwards, _ = paginator.window(query.cursor)
+        except InvalidCursor as exc:
+            raise ApiError(str(exc))
+        if backwards:
+            raise ApiError('API поддерживает только переход вперед по курсору')
+        return cls._generate(rows, paginator, query, queryset.db, next_url)
+
+    @classmethod
+    def _generate(cls, rows, paginator, query, using, next_url):
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        rows = rows[:query.limit + 1].iterator(chunk_size=CHUNK_SIZE)
+        yield '{"results": ['
+        emitted = 0
+        last = None
+        has_more = False
+        while True:
+            chunk = list(islice(rows, CHUNK_SIZE))
+            if not chunk:
+                break
+            if emitted + len(chunk) > query.limit:
+                chunk = chunk[:query.limit - emitted]
+                has_more = True
+            if not chunk:
+                break
+            related = cls.related(chunk, query.expand, using)
+            yield (',' if emitted else '') + ','.join(
+                encoder.encode(cls.serialize(row, query.fields, related)) for row in chunk
+            )
+            emitted += len(chunk)
+            last = chunk[-1]
+        next_link = next_url(paginator.encode(last)) if has_more else None
+        yield '], "next": ' + encoder.encode(next_link) + '}'
+
+
+class ContractTypeResource(Resource):
+    model = ContractType
+    fields = ('id', 'name', 'short_name', 'is_supplementary', 'parent_type')
+
+
+class RnDTypeResource(Resource):
+    model = RnDType
+    fields = ('id', 'name', 'short_name')
+
+
+class ContractRefResource(Resource):
+    """Краткие данные договора для вложений."""
+    model = Contract
+    fields = ('id', 'number', 'type', 'status', 'signed_date', 'main_contract')
+
+
+class RnDRefResource(Resource):
+    """Краткие данные НИОКР для вложений."""
+    model = RnD
+    fields = ('id', 'uuid', 'code', 'title', 'status', 'contract')
+
+
+class TechnicalSpecificationRefResource(Resource):
+    """Краткие данные ТЗ для вложений."""
+    model = TechnicalSpecification
+    fields = ('id', 'rnd', 'version', 'is_active', 'contract_document')
+
+
+class ContractResource(Resource):
+    model = Contract
+    fields = (
+        'id', 'number', 'name', 'type', 'signed_date', 'effective_date', 'status',
+        'main_contract', 'previous_version', 'document', 'description',
+        'supplementary_count', 'created_at', 'updated_at',
+    )
+    filters = {
+        'status': 'status',
+        'type': 'type',
+        'number': 'number',
+        'main_contract': 'main_contract',
+    }
+    expand = {
+        'type': ('type', ContractTypeResource),
+        'main_contract': ('main_contract', ContractRefResource),
+        'previous_version': ('previous_version', ContractRefResource),
+    }
+    updated_field = 'updated_at'
+
+
+class RnDResource(Resource):
+    model = RnD
+    fields = (
+        'id', 'uuid', 'code', 'title', 'purpose', 'status', 'last_contract_status',
+        'contract', 'type', 'tasks_total', 'tasks_done', 'created_at', 'updated_at',
+    )
+    filters = {
+        'status': 'status',
+        'contract': 'contract',
+        'type': 'type',
+        'uuid': 'uuid',
+        'code': 'code',
+    }
+    expand = {
+        'contract': ('contract', ContractRefResource),
+        'type': ('type', RnDTypeResource),
+    }
+    updated_field = 'updated_at'
+
+
+class TechnicalSpecificationResource(Resource):
+    model = TechnicalSpecification
+    fields = (
+        'id', 'rnd', 'contract_document', 'version', 'is_active', 'document',
+        'description', 'uploaded_at',
+    )
+    filters = {
+        'rnd': 'rnd',
+        'contract_document': 'contract_document',
+        'is_active': 'is_active',
+    }
+    expand = {
+        'rnd': ('rnd', RnDRefResource),
+        'contract_document': ('contract_document', ContractRefResource),
+    }
+    updated_field = 'uploaded_at'
+
+
+class RnDTaskResource(Resource):
+    model = RnDTask
+    fields = (
+        'id', 'rnd', 'source_specification', 'order', 'description', 'is_completed',
+        'created_at', 'updated_at',
+    )
+    filters = {
+        'rnd': 'rnd',
+        'is_completed': 'is_completed',
+        'source_specification': 'source_specification',
+    }
+    expand = {
+        'rnd': ('rnd', RnDRefResource),
+        'source_specification': ('source_specification', TechnicalSpecificationRefResource),
+    }
+    updated_field = 'updated_at'
@@ -7,5 +7,9 @@ class RndConfig(AppConfig):
     verbose_name = "База-НТИ"
     
     def ready(self):
+        from django.core import checks
+        from .lookups import check_lookup_cache
+        
         # Импортируем сигналы при старте приложения
         import rnd.signals
+        checks.register(check_lookup_cache, checks.Tags.caches)
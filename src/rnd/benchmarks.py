@@ -0,0 +1,223 @@
+"""
+Замеры основных операций реестра: время и число запросов.
+
+Набор данных создается генератором rnd.seeding внутри транзакции, которая
+в конце откатывается, поэтому замеры можно выполнять на рабочей копии
+базы. Каждый замер - функция, которая готовит операцию (не замеряется)
+и возвращает вызываемый объект, выполняющий ее один раз. Операция
+выполняется один раз для прогрева и repeat раз с замером; в результат
+попадают медиана и разброс времени и наибольшее число запросов.
+
+Результаты сохраняются в JSON; compare() сравнивает их с базовым файлом:
+регрессия - рост числа запросов или медианы времени больше допуска.
+"""
+import datetime
+import platform
+import statistics
+import time
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connections, router, transaction
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from . import lookups
+from .models import Contract, RnD, RnDTask, TechnicalSpecification
+from .querycheck import QueryRecorder
+from .seeding import RegistrySeeder
+
+
+BENCHMARKS = {}
+
+ADMIN_MODELS = ('contract', 'contracttype', 'rnd', 'rndtype', 'technicalspecification', 'rndtask')
+
+# Допуск роста медианы времени относительно базового файла
+DEFAULT_TOLERANCE = 0.25
+
+# Изменения времени меньше этого порога (мс) не считаются регрессией
+MIN_DELTA_MS = 1.0
+
+
+def benchmark(name):
+    """Регистрирует функцию подготовки замера под именем name."""
+    def register(prepare):
+        BENCHMARKS[name] = prepare
+        return prepare
+    return register
+
+
+class BenchmarkContext:
+    """Записи набора данных и клиент админки, общие для всех замеров."""
+
+    def __init__(self, using, prefix):
+        self.using = using
+        self.prefix = prefix
+        self.sequence = 0
+        contracts = Contract._base_manager.using(using).filter(number__contains=f' {prefix}')
+        self.main = contracts.filter(type__is_supplementary=False).order_by('pk').first()
+        self.supplementary = contracts.filter(main_contract=self.main, type__is_supplementary=True).first()
+        self.rnd = RnD._base_manager.using(using).filter(contract=self.main).order_by('pk').first()
+        self.objects = {
+            'contract': self.main,
+            'contracttype': self.main.type,
+            'rnd': self.rnd,
+            'rndtype': self.rnd.type,
+            'technicalspecification': TechnicalSpecification._base_manager.using(using)
+            .filter(rnd=self.rnd, is_active=True).first(),
+            'rndtask': RnDTask._base_manager.using(using).filter(rnd=self.rnd).order_by('order').first(),
+        }
+        user = get_user_model()._default_manager.db_manager(using).create_superuser(
+            f'benchmark-{prefix}', f'benchmark-{prefix}@example.com', None
+        )
+        self.client = Client()
+        self.client.force_login(user)
+
+    def number(self):
+        self.sequence += 1
+        return f'{self.prefix}{self.sequence:06d}'
+
+
+@benchmark('contract.save.main')
+def contract_save_main(context):
+    contract = Contract(
+        type=context.main.type, number=f'БЕНЧ {context.number()}', name='Замер',
+        signed_date=datetime.date(2026, 1, 15), effective_date=datetime.date(2026, 1, 15),
+    )
+    return lambda: contract.save(using=context.using)
+
+
+@benchmark('contract.save.supplementary')
+def contract_save_supplementary(context):
+    contract = Contract(
+        type=context.supplementary.type, main_contract=context.main, number=f'БЕНЧ {context.number()}',
+        signed_date=datetime.date(2026, 2, 1), effective_date=datetime.date(2026, 2, 1),
+    )
+    return lambda: contract.save(using=context.using)
+
+
+@benchmark('contract.save.update')
+def contract_save_update(context):
+    contract = Contract.objects.using(context.using).get(pk=context.main.pk)
+    contract.name = f'Замер {context.number()}'
+    return lambda: contract.save(using=context.using)
+
+
+@benchmark('contract.status.propagation')
+def contract_status_propagation(context):
+    contract = Contract.objects.using(context.using).get(pk=context.main.pk)
+    contract.status = 'suspended' if contract.status == 'active' else 'active'
+    return lambda: contract.save(using=context.using)
+
+
+@benchmark('rnd.save.sync_status')
+def rnd_save_sync_status(context):
+    rnd = RnD.objects.using(context.using).get(pk=context.rnd.pk)
+    rnd.last_contract_status = None
+
+    def run():
+        rnd.sync_status_with_contract()
+        rnd.save(using=context.using)
+    return run
+
+
+@benchmark('specification.save.activate')
+def specification_save_activate(context):
+    specification = TechnicalSpecification(
+        rnd=context.rnd, contract_document=context.main, version=context.number()[-10:],
+        document='benchmark/ts.pdf', is_active=True,
+    )
+    return lambda: specification.save(using=context.using)
+
+
+def _page(url):
+    def prepare(context):
+        def run():
+            response = context.client.get(url(context))
+            if response.status_code != 200:
+                raise AssertionError(f'{response.status_code} при запросе {url(context)}')
+        return run
+    return prepare
+
+
+for _name in ADMIN_MODELS:
+    benchmark(f'admin.{_name}.changelist')(_page(
+        lambda context, name=_name: reverse(f'admin:rnd_{name}_changelist')
+    ))
+    benchmark(f'admin.{_name}.change')(_page(
+        lambda context, name=_name: reverse(f'admin:rnd_{name}_change', args=[context.objects[name].pk])
+    ))
+
+
+def measure(prepare, context, repeat):
+    """Прогрев и repeat замеров одной операции."""
+    prepare(context)()
+    timings = []
+    queries = 0
+    for _ in range(repeat):
+        operation = prepare(context)
+        with QueryRecorder(using=context.using) as recorder:
+            started = time.perf_counter()
+            operation()
+            timings.append((time.perf_counter() - started) * 1000)
+        queries = max(queries, recorder.total)
+    return {
+        'median_ms': round(statistics.median(timings), 3),
+        'min_ms': round(min(timings), 3),
+        'max_ms': round(max(timings), 3),
+        'queries': queries,
+    }
+
+
+def run_benchmarks(contracts=200, repeat=5, seed=0, names=None, using=None):
+    """
+    Создает набор данных из contracts договоров, выполняет замеры
+    (все или с именами из names) и откатывает изменения.
+    """
+    using = using or router.db_for_write(Contract)
+    prefix = f'BENCH{seed}-'
+    selected = [name for name in BENCHMARKS if not names or name in names]
+    results = {}
+    hosts = [*settings.ALLOWED_HOSTS, 'testserver']
+    with override_settings(DEBUG=False, ALLOWED_HOSTS=hosts, RND_QUERY_INSPECTION=False):
+        with transaction.atomic(using=using):
+            RegistrySeeder(using=using, seed=seed, prefix=prefix).run(contracts)
+            lookups.contract_types.all(using)
+            lookups.rnd_types.all(using)
+            context = BenchmarkContext(using, prefix)
+            for name in selected:
+                results[name] = measure(BENCHMARKS[name], context, repeat)
+            transaction.set_rollback(True, using=using)
+    for lookup in lookups.LOOKUP_CACHES.values():
+        lookup.invalidate()
+    return {
+        'meta': {
+            'contracts': contracts,
+            'repeat': repeat,
+            'seed': seed,
+            'vendor': connections[using].vendor,
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'created_at': timezone.now().isoformat(timespec='seconds'),
+        },
+        'results': results,
+    }
+
+
+def compare(current, baseline, tolerance=DEFAULT_TOLERANCE, min_delta_ms=MIN_DELTA_MS):
+    """Регрессии current относительно baseline - список сообщений."""
+    regressions = []
+    for name, result in current['results'].items():
+        base = baseline.get('results', {}).get(name)
+        if base is None:
+            continue
+        if result['queries'] > base['queries']:
+            regressions.append(f'{name}: запросов {result["queries"]}, в базовом замере {base["queries"]}')
+        limit = base['median_ms'] * (1 + tolerance)
+        if result['median_ms'] > limit and result['median_ms'] - base['median_ms'] >= min_delta_ms:
+            regressions.append(
+                f'{name}: медиана {result["median_ms"]:.1f} мс, в базовом замере {base["median_ms"]:.1f} мс'
+            )
+    return regressions
@@ -0,0 +1,182 @@
+"""
+Денормализованные счетчики для списков админки.
+
+ContractType.contracts_count - договоров данного типа,
+RnDType.rnd_count - НИОКР данного типа,
+Contract.supplementary_count - доп. соглашений к основному договору,
+RnD.tasks_total и RnD.tasks_done - задач НИОКР всего и выполненных.
+
+Счетчики изменяются приращениями в сигналах при создании, удалении и
+переназначении записей (для задач - и при смене отметки о выполнении);
+rebuild_counters() пересчитывает их целиком. QuerySet.update() и
+bulk_create() сигналов не вызывают - после них нужен пересчет.
+"""
+from django.db import router
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Contract, ContractType, RnD, RnDTask, RnDType
+
+
+def _apply(model, pk, field, delta, using):
+    _apply_fields(model, pk, {field: delta}, using)
+
+
+def _apply_fields(model, pk, deltas, using):
+    """Приращения нескольких счетчиков записи одним UPDATE."""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if pk is None or not deltas:
+        return
+    model._base_manager.using(using).filter(pk=pk).update(**{
+        field: Greatest(F(field) + delta, Value(0)) for field, delta in deltas.items()
+    })
+
+
+def original_values(instance, attnames, using):
+    """
+    Значения полей до сохранения: из снимка FieldTrackerMixin,
+    а для неотслеживаемых экземпляров - из базы.
+    """
+    original = instance.__dict__.get('_original_values', {})
+    if all(name in original for name in attnames):
+        return tuple(original[name] for name in attnames)
+    row = (
+        type(instance)._base_manager.using(using)
+        .filter(pk=instance.pk).values_list(*attnames).first()
+    )
+    return row or (None,) * len(attnames)
+
+
+def _is_supplementary_type(type_id, using):
+    return ContractType._base_manager.using(using).filter(
+        pk=type_id, is_supplementary=True
+    ).exists()
+
+
+def _supplementary_parent(contract):
+    """Основной договор, в счетчике которого учитывается данный договор."""
+    if contract.type.is_supplementary:
+        return contract.main_contract_id
+    return None
+
+
+def remember_contract_origin(contract, using):
+    """Запоминает вклад договора в счетчики перед сохранением."""
+    if contract._state.adding or contract.pk is None:
+        contract._counter_origin = None
+        return
+    type_id, main_contract_id = original_values(contract, ('type_id', 'main_contract_id'), using)
+    if type_id == contract.type_id:
+        is_supplementary = contract.type.is_supplementary
+    else:
+        is_supplementary = _is_supplementary_type(type_id, using)
+    contract._counter_origin = (type_id, main_contract_id if is_supplementary else None)
+
+
+def contract_saved(contract, using):
+    """Применяет изменения вклада договора в счетчики после сохранения."""
+    origin = contract.__dict__.pop('_counter_origin', None)
+    old_type, old_parent = origin or (None, None)
+    new_type, new_parent = contract.type_id, _supplementary_parent(contract)
+
+    if old_type != new_type:
+        _apply(ContractType, old_type, 'contracts_count', -1, using)
+        _apply(ContractType, new_type, 'contracts_count', 1, using)
+    if old_parent != new_parent:
+        _apply(Contract, old_parent, 'supplementary_count', -1, using)
+        _apply(Contract, new_parent, 'supplementary_count', 1, using)
+
+
+def contract_deleted(contract, using):
+    _apply(ContractType, contract.type_id, 'contracts_count', -1, using)
+    _apply(Contract, _supplementary_parent(contract), 'supplementary_count', -1, using)
+
+
+def remember_rnd_origin(rnd, using):
+    if rnd._state.adding or rnd.pk is None:
+        rnd._counter_origin = None
+        return
+    rnd._counter_origin = original_values(rnd, ('type_id',), using)[0]
+
+
+def rnd_saved(rnd, using):
+    old_type = rnd.__dict__.pop('_counter_origin', None)
+    if old_type != rnd.type_id:
+        _apply(RnDType, old_type, 'rnd_count', -1, using)
+        _apply(RnDType, rnd.type_id, 'rnd_count', 1, using)
+
+
+def rnd_deleted(rnd, using):
+    _apply(RnDType, rnd.type_id, 'rnd_count', -1, using)
+
+
+def remember_task_origin(task, using):
+    if task._state.adding or task.pk is None:
+        task._counter_origin = None
+        return
+    task._counter_origin = original_values(task, ('rnd_id', 'is_completed'), using)
+
+
+def task_saved(task, using):
+    """Переносит вклад задачи в счетчики НИОКР (новая, другая НИОКР, смена отметки)."""
+    old_rnd, old_completed = task.__dict__.pop('_counter_origin', None) or (None, False)
+    new_rnd, new_completed = task.rnd_id, bool(task.is_completed)
+    if old_rnd == new_rnd:
+        _apply(RnD, new_rnd, 'tasks_done', int(new_completed) - int(bool(old_completed)), using)
+        return
+    _apply_fields(RnD, old_rnd, {'tasks_total': -1, 'tasks_done': -int(bool(old_completed))}, using)
+    _apply_fields(RnD, new_rnd, {'tasks_total': 1, 'tasks_done': int(new_completed)}, using)
+
+
+def task_deleted(task, using):
+    _apply_fields(RnD, task.rnd_id, {'tasks_total': -1, 'tasks_done': -int(bool(task.is_completed))}, using)
+
+
+def _count_subquery(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by().values(field).annotate(total=Count('pk')).values('total')
+        ),
+        0,
+    )
+
+
+def rebuild_counters(using=None):
+    """
+    Полный пересчет счетчиков набором UPDATE с подзапросами.
+    Возвращает количество исправленных записей по каждому счетчику.
+    """
+    using = using or router.db_for_write(Contract)
+    contracts = Contract._base_manager.using(using)
+    result = {}
+
+    counts = _count_subquery(contracts, 'type')
+    result['contracts_count'] = (
+        ContractType._base_manager.using(using)
+        .annotate(actual=counts).exclude(contracts_count=F('actual'))
+        .update(contracts_count=counts)
+    )
+
+    counts = _count_subquery(RnD._base_manager.using(using), 'type')
+    result['rnd_count'] = (
+        RnDType._base_manager.using(using)
+        .annotate(actual=counts).exclude(rnd_count=F('actual'))
+        .update(rnd_count=counts)
+    )
+
+    counts = _count_subquery(contracts.filter(type__is_supplementary=True), 'main_contract')
+    result['supplementary_count'] = (
+        contracts.annotate(actual=counts).exclude(supplementary_count=F('actual'))
+        .update(supplementary_count=counts)
+    )
+
+    tasks = RnDTask._base_manager.using(using)
+    total, done = _count_subquery(tasks, 'rnd'), _count_subquery(tasks.filter(is_completed=True), 'rnd')
+    result['tasks'] = (
+        RnD._base_manager.using(using)
+        .annotate(actual_total=total, actual_done=done)
+        .exclude(tasks_total=F('actual_total'), tasks_done=F('actual_done'))
+        .update(tasks_total=total, tasks_done=done)
+    )
+    return result
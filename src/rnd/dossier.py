@@ -0,0 +1,256 @@
+"""
+Досье договора: основной договор со всеми доп. соглашениями, НИОКР,
+техническими заданиями и задачами.
+
+Загрузка выполняется фиксированным числом запросов (пять на любое
+количество договоров) через values(), результат - неизменяемый граф
+объектов со __slots__.
+
+Досье нужно там, где выводится дерево договора (карточка договора в
+админке). Выгрузка (rnd.export) и API (rnd.api) отдают плоские строки
+одной модели через values(): связанные поля читаются JOIN, подзапросом
+или одним запросом на пачку вложений, и число запросов уже не зависит
+от числа строк. Загрузка целых деревьев там добавила бы запросы и память.
+"""
+from collections import defaultdict
+
+from django.db.models.functions import Coalesce
+
+from .models import Contract, RnD, RnDTask, TechnicalSpecification
+
+
+class _Node:
+    """Неизменяемый узел досье."""
+
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name in self.__slots__:
+            object.__setattr__(self, name, values.get(name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f'{type(self).__name__} доступен только для чтения')
+
+    def __delattr__(self, name):
+        raise AttributeError(f'{type(self).__name__} доступен только для чтения')
+
+    def __repr__(self):
+        return f'<{type(self).__name__} id={getattr(self, "id", None)}>'
+
+
+class ContractTypeInfo(_Node):
+    __slots__ = ('id', 'name', 'short_name', 'is_supplementary')
+
+    def __str__(self):
+        return self.name
+
+
+class ContractInfo(_Node):
+    __slots__ = (
+        'id', 'number', 'name', 'type', 'signed_date', 'effective_date', 'status',
+        'document', 'description', 'main_contract_id', 'main_contract_number',
+        'previous_version_id',
+    )
+
+    def __str__(self):
+        if self.type.is_supplementary:
+            return f"ДС {self.number} к {self.main_contract_number}"
+        return f"{self.number} ({self.type.short_name})"
+
+    @property
+    def is_supplementary(self):
+        return self.type.is_supplementary
+
+    @property
+    def status_display(self):
+        return CONTRACT_STATUS_LABELS.get(self.status, self.status)
+
+
+class RnDTypeInfo(_Node):
+    __slots__ = ('id', 'name', 'short_name')
+
+    def __str__(self):
+        return self.short_name
+
+
+class SpecificationInfo(_Node):
+    __slots__ = (
+        'id', 'version', 'is_active', 'document', 'description', 'uploaded_at',
+        'contract_document',
+    )
+
+    @property
+    def document_type(self):
+        """Тип договора-основания."""
+        return self.contract_document.type.short_name
+
+
+class TaskInfo(_Node):
+    __slots__ = ('id', 'order', 'description', 'is_completed', 'source_specification_id')
+
+
+class RnDInfo(_Node):
+    __slots__ = (
+        'id', 'uuid', 'code', 'title', 'purpose', 'status', 'last_contract_status',
+        'type', 'specifications', 'tasks',
+    )
+
+    def __str__(self):
+        return f"{self.code}: {self.title}"
+
+    @property
+    def status_display(self):
+        return RND_STATUS_LABELS.get(self.status, self.status)
+
+    @property
+    def active_specification(self):
+        for specification in self.specifications:
+            if specification.is_active:
+                return specification
+        return None
+
+    @property
+    def tasks_done(self):
+        return sum(1 for task in self.tasks if task.is_completed)
+
+
+class ContractDossier(_Node):
+    __slots__ = ('contract', 'supplementary', 'rnd_works')
+
+    @property
+    def documents(self):
+        """Основной договор и все доп. соглашения."""
+        return (self.contract,) + self.supplementary
+
+
+CONTRACT_STATUS_LABELS = dict(Contract.CONTRACT_STATUS_CHOICES)
+RND_STATUS_LABELS = dict(RnD.STATUS_CHOICES)
+
+CONTRACT_FIELDS = (
+    'id', 'number', 'name', 'signed_date', 'effective_date', 'status', 'document',
+    'description', 'main_contract_id', 'previous_version_id',
+    'type_id', 'type__name', 'type__short_name', 'type__is_supplementary',
+)
+
+
+def _contract_info(row, types, main_numbers):
+    type_id = row['type_id']
+    if type_id not in types:
+        types[type_id] = ContractTypeInfo(
+            id=type_id,
+            name=row['type__name'],
+            short_name=row['type__short_name'],
+            is_supplementary=row['type__is_supplementary'],
+        )
+    return ContractInfo(
+        id=row['id'],
+        number=row['number'],
+        name=row['name'],
+        type=types[type_id],
+        signed_date=row['signed_date'],
+        effective_date=row['effective_date'],
+        status=row['status'],
+        document=row['document'],
+        description=row['description'],
+        main_contract_id=row['main_contract_id'],
+        main_contract_number=main_numbers.get(row['main_contract_id']),
+        previous_version_id=row['previous_version_id'],
+    )
+
+
+def load_contract_dossiers(contracts, using=None):
+    """
+    Досье для нескольких договоров, ключ - pk основного договора.
+    Для доп. соглашения загружается досье его основного договора.
+    """
+    pks = {getattr(c, 'pk', c) for c in contracts}
+    if not pks:
+        return {}
+    manager = Contract._base_manager.db_manager(using)
+
+    roots = manager.filter(pk__in=pks).values(root=Coalesce('main_contract_id', 'pk'))
+    main_rows = list(manager.filter(pk__in=roots).values(*CONTRACT_FIELDS))
+    main_pks = [row['id'] for row in main_rows]
+    main_numbers = {row['id']: row['number'] for row in main_rows}
+    types = {}
+    contracts_by_pk = {row['id']: _contract_info(row, types, main_numbers) for row in main_rows}
+
+    supplementary = defaultdict(list)
+    for row in (
+        manager.filter(main_contract_id__in=main_pks).exclude(pk__in=main_pks)
+        .order_by('signed_date', 'number').values(*CONTRACT_FIELDS)
+    ):
+        info = _contract_info(row, types, main_numbers)
+        contracts_by_pk[info.id] = info
+        supplementary[info.main_contract_id].append(info)
+
+    rnd_rows = list(
+        RnD._base_manager.db_manager(using).filter(contract_id__in=main_pks)
+        .order_by('-created_at')
+        .values(
+            'id', 'contract_id', 'uuid', 'code', 'title', 'purpose', 'status',
+            'last_contract_status', 'type_id', 'type__name', 'type__short_name',
+        )
+    )
+    rnd_pks = RnD._base_manager.db_manager(using).filter(contract_id__in=main_pks).values('pk')
+
+    specifications = defaultdict(list)
+    for row in (
+        TechnicalSpecification._base_manager.db_manager(using).filter(rnd_id__in=rnd_pks)
+        .order_by('-is_active', '-version')
+        .values('id', 'rnd_id', 'version', 'is_active', 'document', 'description',
+                'uploaded_at', 'contract_document_id')
+    ):
+        specifications[row['rnd_id']].append(SpecificationInfo(
+            id=row['id'],
+            version=row['version'],
+            is_active=row['is_active'],
+            document=row['document'],
+            description=row['description'],
+            uploaded_at=row['uploaded_at'],
+            contract_document=contracts_by_pk.get(row['contract_document_id']),
+        ))
+
+    tasks = defaultdict(list)
+    for row in (
+        RnDTask._base_manager.db_manager(using).filter(rnd_id__in=rnd_pks)
+        .order_by('order')
+        .values('id', 'rnd_id', 'order', 'description', 'is_completed', 'source_specification_id')
+    ):
+        tasks[row.pop('rnd_id')].append(TaskInfo(**row))
+
+    rnd_types = {}
+    rnd_works = defaultdict(list)
+    for row in rnd_rows:
+        type_id = row['type_id']
+        if type_id not in rnd_types:
+            rnd_types[type_id] = RnDTypeInfo(
+                id=type_id, name=row['type__name'], short_name=row['type__short_name']
+            )
+        rnd_works[row['contract_id']].append(RnDInfo(
+            id=row['id'],
+            uuid=row['uuid'],
+            code=row['code'],
+            title=row['title'],
+            purpose=row['purpose'],
+            status=row['status'],
+            last_contract_status=row['last_contract_status'],
+            type=rnd_types[type_id],
+            specifications=tuple(specifications.get(row['id'], ())),
+            tasks=tuple(tasks.get(row['id'], ())),
+        ))
+
+    return {
+        pk: ContractDossier(
+            contract=contracts_by_pk[pk],
+            supplementary=tuple(supplementary.get(pk, ())),
+            rnd_works=tuple(rnd_works.get(pk, ())),
+        )
+        for pk in main_pks
+    }
+
+
+def load_contract_dossier(contract, using=None):
+    """Досье одного договора или None, если договор не найден."""
+    dossiers = load_contract_dossiers([contract], using=using)
+    return next(iter(dossiers.values()), None)
@@ -0,0 +1,149 @@
+"""
+Выгрузка реестра НИОКР в CSV/XLSX.
+
+Все столбцы выбираются одним запросом профиля загрузки export: договор
+и типы - через JOIN, актуальная версия ТЗ - коррелированным подзапросом
+по индексу (rnd, is_active, version), счетчики задач хранятся в НИОКР. Строки
+читаются iterator() пачками и сразу отдаются потребителю, поэтому память
+не зависит от размера выгрузки. XLSX пишется openpyxl в режиме write_only
+во временный файл, который затем отдается частями.
+"""
+import csv
+import datetime
+import tempfile
+
+from django.db.models import OuterRef, Subquery
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models import Contract, RnD, TechnicalSpecification
+
+
+class ExportError(Exception):
+    """Выгрузка в запрошенном формате невозможна."""
+
+
+# Заголовок столбца -> поле или аннотация; заголовки совпадают с загрузкой
+EXPORT_COLUMNS = (
+    ('UUID (идентификатор)', 'uuid'),
+    ('Шифр работы', 'code'),
+    ('Тема работы', 'title'),
+    ('Тип работ', 'type__short_name'),
+    ('Основной договор', 'contract__number'),
+    ('Тип договора', 'contract__type__short_name'),
+    ('Дата подписания договора', 'contract__signed_date'),
+    ('Статус договора', 'contract__status'),
+    ('Статус НИОКР', 'status'),
+    ('Актуальная версия ТЗ', 'active_specification_version'),
+    ('Задач всего', 'tasks_total'),
+    ('Задач выполнено', 'tasks_done'),
+)
+
+# Строк, читаемых из курсора за раз
+CHUNK_SIZE = 2000
+
+# Размер части файла XLSX в ответе
+FILE_CHUNK_SIZE = 64 * 1024
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def export_queryset(queryset):
+    """Кортежи значений EXPORT_COLUMNS по НИОКР из queryset, в порядке pk."""
+    active_version = (
+        TechnicalSpecification.objects.filter(rnd=OuterRef('pk'), is_active=True)
+        .order_by('-version').values('version')[:1]
+    )
+    return (
+        queryset.profile('export')
+        .annotate(active_specification_version=Subquery(active_version))
+        .order_by('pk')
+        .values_list(*[name for _, name in EXPORT_COLUMNS])
+    )
+
+
+def export_rows(queryset):
+    """Строки выгрузки с подписями статусов вместо кодов."""
+    labels = {
+        'contract__status': {key: str(label) for key, label in Contract.CONTRACT_STATUS_CHOICES},
+        'status': {key: str(label) for key, label in RnD.STATUS_CHOICES},
+    }
+    positions = {
+        index: labels[name] for index, (_, name) in enumerate(EXPORT_COLUMNS) if name in labels
+    }
+    for row in export_queryset(queryset).iterator(chunk_size=CHUNK_SIZE):
+        row = list(row)
+        for index, choices in positions.items():
+            row[index] = choices.get(row[index], row[index])
+        yield row
+
+
+def render_csv(rows):
+    """CSV для Excel: UTF-8 с BOM, разделитель ';', даты ДД.ММ.ГГГГ."""
+    writer = csv.writer(_Echo(), delimiter=';')
+    yield '\ufeff'.encode() + writer.writerow([header for header, _ in EXPORT_COLUMNS]).encode()
+    lines = []
+    for row in rows:
+        lines.append(writer.writerow([
+            value.strftime('%d.%m.%Y') if isinstance(value, datetime.date) else value
+            for value in row
+        ]))
+        if len(lines) == CHUNK_SIZE:
+            yield ''.join(lines).encode()
+            lines = []
+    if lines:
+        yield ''.join(lines).encode()
+
+
+def render_xlsx(rows):
+    """
+    XLSX-файл частями. openpyxl импортируется сразу, чтобы отсутствие
+    пакета обнаружилось до начала ответа.
+    """
+    try:
+        from openpyxl import Workbook
+    except ImportError:
+        raise ExportError('Для выгрузки XLSX необходим пакет openpyxl')
+    return _xlsx_chunks(Workbook, rows)
+
+
+def _xlsx_chunks(workbook_class, rows):
+    workbook = workbook_class(write_only=True)
+    sheet = workbook.create_sheet('НИОКР')
+    sheet.append([header for header, _ in EXPORT_COLUMNS])
+    for row in rows:
+        sheet.append(row)
+    with tempfile.TemporaryFile() as fh:
+        workbook.save(fh)
+        fh.seek(0)
+        while chunk := fh.read(FILE_CHUNK_SIZE):
+            yield chunk
+
+
+RENDERERS = {'csv': render_csv, 'xlsx': render_xlsx}
+
+
+def render(rows, export_format):
+    """Части файла выгрузки (bytes) в формате csv или xlsx."""
+    if export_format not in RENDERERS:
+        raise ExportError(f'Неподдерживаемый формат выгрузки: {export_format}')
+    return RENDERERS[export_format](rows)
+
+
+def export_response(queryset, export_format):
+    """Потоковый ответ с файлом выгрузки."""
+    content = render(export_rows(queryset), export_format)
+    response = StreamingHttpResponse(content, content_type=FORMATS[export_format])
+    filename = f'rnd-{timezone.localdate():%Y-%m-%d}.{export_format}'
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+class _Echo:
+    """Файлоподобный объект для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
@@ -1,9 +1,53 @@
 from django import forms
 from django.utils.translation import gettext_lazy as _
-from .models import Contract, ContractType
+from .models import Contract, TechnicalSpecification
+from .uploads import ChunkedUpload, HashedUploadedFile, UploadError, check_content_type
 
 
-class ContractForm(forms.ModelForm):
+class DocumentUploadMixin(forms.Form):
+    """
+    Файл документа из завершенной загрузки по частям (rnd.uploads).
+    
+    Загрузку можно прикрепить только от имени ее владельца: user передается
+    в конструктор или задается на классе формы (см. ModelAdmin.get_form).
+    """
+    
+    user = None
+    
+    document_upload = forms.CharField(
+        required=False,
+        label=_('Загрузка по частям'),
+        help_text=_('Идентификатор завершенной загрузки большого файла - вместо выбора файла')
+    )
+    
+    def __init__(self, *args, user=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if user is not None:
+            self.user = user
+        if self.data.get(self.add_prefix('document_upload')) and 'document' in self.fields:
+            self.fields['document'].required = False
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        document = cleaned_data.get('document')
+        if isinstance(document, HashedUploadedFile):
+            try:
+                check_content_type(document.name, document.detected_content_type)
+            except UploadError as exc:
+                self.add_error('document', str(exc))
+        upload_id = cleaned_data.get('document_upload')
+        if upload_id:
+            try:
+                upload = ChunkedUpload(upload_id)
+                upload.check_owner(getattr(self.user, 'pk', None))
+                # Файл уже в хранилище документов: в запись попадает его имя
+                cleaned_data['document'] = upload.stored_name()
+            except UploadError as exc:
+                self.add_error('document_upload', str(exc))
+        return cleaned_data
+
+
+class ContractForm(DocumentUploadMixin, forms.ModelForm):
     """Форма для контракта."""
     
     class Meta:
@@ -17,6 +61,10 @@ class ContractForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         
+        for name in ('main_contract', 'previous_version'):
+            if name in self.fields:
+                self.fields[name].queryset = self.fields[name].queryset.profile('validation')
+        
         if self.instance and self.instance.pk:
             if self.instance.type and not self.instance.type.is_supplementary:
                 self.initial['main_contract'] = self.instance
@@ -26,6 +74,14 @@ class ContractForm(forms.ModelForm):
             
         if self.instance and self.instance.pk:
             if self.instance.type and self.instance.type.is_supplementary:
-                self.fields['type'].queryset = ContractType.objects.filter(is_supplementary=True)
+                self.fields['type'].limit_choices(is_supplementary=True)
             else:
-                self.fields['type'].queryset = ContractType.objects.filter(is_supplementary=False)
\ No newline at end of file
+                self.fields['type'].limit_choices(is_supplementary=False)
+
+
+class TechnicalSpecificationForm(DocumentUploadMixin, forms.ModelForm):
+    """Форма технического задания."""
+    
+    class Meta:
+        model = TechnicalSpecification
+        fields = '__all__'
@@ -0,0 +1,188 @@
+"""
+Нечеткий поиск по идентификаторам: номерам договоров, шифрам и UUID НИОКР.
+
+Рядом с исходным полем хранится нормализованная копия
+(utils.normalize_identifier), а в таблице IdentifierTrigram - ее триграммы.
+Кандидаты по фрагменту выбираются по индексу (kind, trigram) без просмотра
+всей таблицы, затем ранжируются по сходству.
+"""
+import math
+
+from django.apps import apps as global_apps
+from django.db import router
+from django.db.models import Count, Q
+
+from .utils import normalize_identifier
+
+
+# Модель -> {поле: нормализованное теневое поле}
+IDENTIFIER_FIELDS = {
+    'rnd.Contract': {'number': 'number_normalized'},
+    'rnd.RnD': {'code': 'code_normalized', 'uuid': 'uuid_normalized'},
+}
+
+# Доля триграмм запроса, которая должна совпасть у кандидата
+MIN_TRIGRAM_SHARE = 0.5
+
+# Кандидатов из индекса на одно место в выдаче
+CANDIDATE_FACTOR = 5
+
+INDEX_BATCH_SIZE = 2000
+
+
+def trigrams(normalized):
+    return {normalized[i:i + 3] for i in range(len(normalized) - 2)}
+
+
+def kind_for(model, field):
+    return f'{model._meta.model_name}.{field}'
+
+
+def normalize_fields(obj):
+    """Заполняет теневые поля объекта (для bulk_create, минующего save())."""
+    for field, shadow in IDENTIFIER_FIELDS[obj._meta.label].items():
+        setattr(obj, shadow, normalize_identifier(getattr(obj, field)))
+
+
+def _trigram_model(apps):
+    return apps.get_model('rnd', 'IdentifierTrigram')
+
+
+def _index(trigram_model, model, objs, fields, using):
+    shadows = IDENTIFIER_FIELDS[model._meta.label]
+    kinds = [kind_for(model, field) for field in fields]
+    trigram_model._base_manager.using(using).filter(
+        kind__in=kinds, object_id__in=[obj.pk for obj in objs]
+    ).delete()
+    trigram_model._base_manager.using(using).bulk_create([
+        trigram_model(kind=kind_for(model, field), object_id=obj.pk, trigram=trigram)
+        for obj in objs
+        for field in fields
+        for trigram in trigrams(getattr(obj, shadows[field]))
+    ], batch_size=INDEX_BATCH_SIZE)
+
+
+def index_objects(objs, fields=None, using=None):
+    """Пересоздает триграммы объектов одной модели."""
+    objs = list(objs)
+    if not objs:
+        return
+    model = type(objs[0])
+    using = using or router.db_for_write(model)
+    fields = fields or list(IDENTIFIER_FIELDS[model._meta.label])
+    _index(_trigram_model(global_apps), model, objs, fields, using)
+
+
+def unindex_object(obj, using=None):
+    model = type(obj)
+    _trigram_model(global_apps)._base_manager.using(using or router.db_for_write(model)).filter(
+        kind__in=[kind_for(model, field) for field in IDENTIFIER_FIELDS[model._meta.label]],
+        object_id=obj.pk,
+    ).delete()
+
+
+def rebuild_identifier_index(using=None, apps=global_apps):
+    """
+    Полный пересчет теневых полей и триграмм.
+    apps - реестр моделей (в миграциях - исторический).
+    Возвращает количество проиндексированных записей по моделям.
+    """
+    trigram_model = _trigram_model(apps)
+    using = using or router.db_for_write(trigram_model)
+    trigram_model._base_manager.using(using).all().delete()
+    result = {}
+    for label, shadows in IDENTIFIER_FIELDS.items():
+        model = apps.get_model(label)
+        fields = list(shadows)
+        queryset = model._base_manager.using(using).only('pk', *fields, *shadows.values())
+        total = 0
+        batch = []
+        for obj in queryset.order_by('pk').iterator(chunk_size=INDEX_BATCH_SIZE):
+            batch.append(obj)
+            if len(batch) == INDEX_BATCH_SIZE:
+                total += _rebuild_batch(trigram_model, model, batch, fields, using)
+                batch = []
+        if batch:
+            total += _rebuild_batch(trigram_model, model, batch, fields, using)
+        result[label] = total
+    return result
+
+
+def _rebuild_batch(trigram_model, model, objs, fields, using):
+    shadows = IDENTIFIER_FIELDS[model._meta.label]
+    changed = []
+    for obj in objs:
+        values = {shadow: normalize_identifier(getattr(obj, field)) for field, shadow in shadows.items()}
+        if any(getattr(obj, shadow) != value for shadow, value in values.items()):
+            for shadow, value in values.items():
+                setattr(obj, shadow, value)
+            changed.append(obj)
+    if changed:
+        model._base_manager.using(using).bulk_update(changed, list(shadows.values()))
+    _index(trigram_model, model, objs, fields, using)
+    return len(objs)
+
+
+def _score(value, term, term_trigrams):
+    if not value:
+        return 0.0
+    if value == term:
+        return 1.0
+    if value.startswith(term):
+        return 0.9
+    if term in value:
+        return 0.8
+    if not term_trigrams:
+        return 0.0
+    return 0.7 * len(term_trigrams & trigrams(value)) / len(term_trigrams)
+
+
+def fuzzy_rank(queryset, fields, term, limit=20):
+    """
+    Ранжированные кандидаты по фрагменту идентификатора.
+    Возвращает список пар (pk, сходство от 0 до 1), лучшие первыми.
+    """
+    model = queryset.model
+    shadows = [IDENTIFIER_FIELDS[model._meta.label][field] for field in fields]
+    term = normalize_identifier(term)
+    if not term:
+        return []
+
+    term_trigrams = trigrams(term)
+    if term_trigrams:
+        required = max(1, math.ceil(len(term_trigrams) * MIN_TRIGRAM_SHARE))
+        candidates = list(
+            _trigram_model(global_apps)._base_manager.using(queryset.db)
+            .filter(kind__in=[kind_for(model, field) for field in fields], trigram__in=term_trigrams)
+            .values('object_id')
+            .annotate(hits=Count('trigram', distinct=True))
+            .filter(hits__gte=required)
+            .order_by('-hits', 'object_id')
+            .values_list('object_id', flat=True)[:limit * CANDIDATE_FACTOR]
+        )
+        condition = Q(pk__in=candidates)
+    else:
+        # Фрагмент короче триграммы: префикс по индексу теневого поля
+        condition = Q()
+        for shadow in shadows:
+            condition |= Q(**{f'{shadow}__gte': term, f'{shadow}__lt': term + '\uffff'})
+
+    scored = []
+    for pk, *values in queryset.filter(condition).order_by().values_list('pk', *shadows)[:limit * CANDIDATE_FACTOR]:
+        score = max(_score(value, term, term_trigrams) for value in values)
+        if score:
+            scored.append((pk, round(score, 3)))
+    scored.sort(key=lambda item: (-item[1], item[0]))
+    return scored[:limit]
+
+
+def fuzzy_search(queryset, fields, term, limit=20):
+    """Объекты кандидатов в порядке сходства; сходство - в атрибуте fuzzy_score."""
+    ranked = fuzzy_rank(queryset, fields, term, limit)
+    objs = queryset.in_bulk([pk for pk, _ in ranked])
+    result = []
+    for pk, score in ranked:
+        obj = objs[pk]
+        obj.fuzzy_score = score
+        result.append(obj)
+    return result
@@ -0,0 +1,761 @@
+"""
+Массовая загрузка реестра договоров и НИОКР из CSV/XLSX.
+
+Строки читаются потоково, объекты создаются через bulk_create пачками,
+каждая пачка записывается в отдельной транзакции. Сигналы и full_clean()
+не вызываются: проверки выполняются по строке без обращения к базе.
+"""
+import csv
+import datetime
+import os
+from itertools import islice
+
+from django.db import router, transaction
+from django.db.models import F
+
+from .counters import rebuild_counters
+from .identifiers import index_objects, normalize_fields
+from .models import (
+    Contract, ContractType, RnD, RnDTask, RnDType, TechnicalSpecification,
+    RND_STATUS_BY_CONTRACT_STATUS,
+)
+from .summaries import rebuild_summaries
+
+
+class RowError(ValueError):
+    """Ошибка в строке исходного файла."""
+
+
+def normalize_header(value):
+    """Приводит заголовок столбца к сравнимому виду."""
+    return ' '.join(str(value or '').split()).casefold()
+
+
+def normalize_key(value):
+    """Приводит ключевое значение (номер, шифр, UUID) к сравнимому виду."""
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return ' '.join(str(value).split())
+
+
+def iter_csv_rows(path):
+    """Потоковое чтение CSV с автоопределением разделителя."""
+    with open(path, newline='', encoding='utf-8-sig') as fh:
+        sample = fh.read(64 * 1024)
+        fh.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=';,\t')
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(fh, dialect)
+        header = next(reader, None)
+        if header is None:
+            return
+        for line_no, values in enumerate(reader, start=2):
+            if any(v.strip() for v in values):
+                yield line_no, header, values
+
+
+def iter_xlsx_rows(path):
+    """Потоковое чтение первого листа XLSX (openpyxl в режиме read_only)."""
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise RowError('Для загрузки XLSX необходим пакет openpyxl')
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.worksheets[0].iter_rows(values_only=True)
+        header = None
+        for line_no, values in enumerate(rows, start=1):
+            if not any(v not in (None, '') for v in values):
+                continue
+            if header is None:
+                header = values
+                continue
+            yield line_no, header, values
+    finally:
+        workbook.close()
+
+
+def iter_rows(path):
+    """Возвращает строки файла как пары (номер строки, словарь)."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.xlsx', '.xlsm'):
+        source = iter_xlsx_rows(path)
+    elif ext in ('.csv', '.txt'):
+        source = iter_csv_rows(path)
+    else:
+        raise RowError(f'Неподдерживаемый формат файла: {path}')
+
+    for line_no, header, values in source:
+        yield line_no, {
+            normalize_header(name): value
+            for name, value in zip(header, values)
+            if name not in (None, '')
+        }
+
+
+def parse_date(value):
+    if value in (None, ''):
+        return None
+    if isinstance(value, datetime.datetime):
+        return value.date()
+    if isinstance(value, datetime.date):
+        return value
+    value = str(value).strip()
+    for fmt in ('%d.%m.%Y', '%Y-%m-%d', '%d.%m.%y', '%d/%m/%Y'):
+        try:
+            return datetime.datetime.strptime(value, fmt).date()
+        except ValueError:
+            continue
+    raise RowError(f'Некорректная дата: {value}')
+
+
+TRUE_VALUES = {'1', 'да', 'true', 'yes', '+', 'истина', 'y', 'д'}
+FALSE_VALUES = {'0', 'нет', 'false', 'no', '-', 'ложь', 'n', 'н', ''}
+
+
+def parse_bool(value, default=False):
+    if value is None:
+        return default
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().casefold()
+    if text in TRUE_VALUES:
+        return True
+    if text in FALSE_VALUES:
+        return default if text == '' else False
+    raise RowError(f'Некорректное логическое значение: {value}')
+
+
+def parse_int(value, default=None):
+    if value in (None, ''):
+        return default
+    try:
+        return int(float(str(value).replace(',', '.').strip()))
+    except ValueError:
+        raise RowError(f'Некорректное число: {value}')
+
+
+def choice_parser(choices, aliases=None):
+    """Разбор значения из choices по коду, подписи или синониму."""
+    lookup = {}
+    for code, label in choices:
+        lookup[code.casefold()] = code
+        lookup[str(label).casefold()] = code
+    for alias, code in (aliases or {}).items():
+        lookup[alias.casefold()] = code
+
+    def parse(value, default):
+        if value in (None, ''):
+            return default
+        try:
+            return lookup[str(value).strip().casefold()]
+        except KeyError:
+            raise RowError(f'Неизвестное значение: {value}')
+    return parse
+
+
+# Синонимы состояний контракта из «Состава полей»
+parse_contract_status = choice_parser(Contract.CONTRACT_STATUS_CHOICES, {
+    'Заключен': 'active',
+    'Пересмотрен': 'active',
+    'Исполнен': 'completed',
+    'Расторгнут': 'terminated',
+})
+
+
+class BaseLoader:
+    """
+    Загрузчик одной модели.
+    columns: поле -> допустимые заголовки столбцов (первым идет имя поля).
+    """
+
+    model = None
+    label = ''
+    columns = {}
+
+    def __init__(self, importer):
+        self.importer = importer
+        self.using = importer.using
+        self.created = 0
+        self.skipped = 0
+        self._headers = {
+            field: tuple(normalize_header(h) for h in (field,) + headers)
+            for field, headers in self.columns.items()
+        }
+
+    @property
+    def manager(self):
+        return self.model._base_manager.using(self.using)
+
+    def value(self, row, field):
+        for header in self._headers[field]:
+            value = row.get(header)
+            if isinstance(value, str):
+                value = value.strip()
+            if value not in (None, ''):
+                return value
+        return None
+
+    def required(self, row, field):
+        value = self.value(row, field)
+        if value is None:
+            raise RowError(f'Не заполнено поле «{self.columns[field][0]}»')
+        return value
+
+    def load(self, path):
+        rows = iter_rows(path)
+        while True:
+            chunk = list(islice(rows, self.importer.batch_size))
+            if not chunk:
+                break
+            with transaction.atomic(using=self.using):
+                self.load_chunk(chunk)
+        self.finish()
+
+    def load_chunk(self, chunk):
+        """Разбирает пачку строк и сохраняет новые объекты."""
+        keys = [self.row_key(row) for _, row in chunk]
+        existing = self.existing_keys({k for k in keys if k})
+        objs = []
+        for (line_no, row), key in zip(chunk, keys):
+            if not key:
+                self.importer.error(self.label, line_no, 'Не заполнен ключ записи')
+                continue
+            if key in existing:
+                self.skipped += 1
+                continue
+            try:
+                obj = self.build(row)
+            except RowError as exc:
+                self.importer.error(self.label, line_no, exc)
+                continue
+            existing.add(key)
+            objs.append(obj)
+        if objs:
+            self.before_create(objs)
+            objs = self.manager.bulk_create(objs, batch_size=self.importer.batch_size)
+            self.created += len(objs)
+            self.after_create(objs)
+
+    def row_key(self, row):
+        raise NotImplementedError
+
+    def existing_keys(self, keys):
+        raise NotImplementedError
+
+    def build(self, row):
+        raise NotImplementedError
+
+    def before_create(self, objs):
+        pass
+
+    def after_create(self, objs):
+        pass
+
+    def finish(self):
+        pass
+
+
+class ContractTypeLoader(BaseLoader):
+    model = ContractType
+    label = 'Типы договоров'
+    columns = {
+        'short_name': ('Тип договора (кратко)',),
+        'name': ('Тип договора (полностью)',),
+        'is_supplementary': ('Является дополнительным соглашением',),
+        'parent_type': ('Родительский тип договора',),
+        'description': ('Описание',),
+    }
+
+    def row_key(self, row):
+        return normalize_key(self.value(row, 'short_name')).casefold()
+
+    def existing_keys(self, keys):
+        return {
+            normalize_key(name).casefold()
+            for name in self.manager.values_list('short_name', flat=True)
+        }
+
+    def build(self, row):
+        short_name = normalize_key(self.required(row, 'short_name'))
+        obj = ContractType(
+            short_name=short_name,
+            name=self.value(row, 'name') or short_name,
+            is_supplementary=parse_bool(self.value(row, 'is_supplementary')),
+            description=self.value(row, 'description'),
+        )
+        parent = self.value(row, 'parent_type')
+        if obj.is_supplementary and not parent:
+            raise RowError('Для дополнительного соглашения необходимо указать родительский тип договора')
+        obj._parent_key = parent
+        return obj
+
+    def after_create(self, objs):
+        self.importer.reset_lookups()
+        pending = []
+        for obj in objs:
+            if not obj._parent_key:
+                continue
+            try:
+                obj.parent_type_id = self.importer.contract_type(obj._parent_key).pk
+            except RowError as exc:
+                self.importer.error(self.label, None, f'{obj.short_name}: {exc}')
+                continue
+            pending.append(obj)
+        if pending:
+            self.manager.bulk_update(pending, ['parent_type'], batch_size=self.importer.batch_size)
+
+
+class RnDTypeLoader(BaseLoader):
+    model = RnDType
+    label = 'Типы НИОКР'
+    columns = {
+        'name': ('Название типа работ', 'Вид работы'),
+        'short_name': ('Краткое название',),
+        'description': ('Описание',),
+    }
+
+    def row_key(self, row):
+        return normalize_key(self.value(row, 'name')).casefold()
+
+    def existing_keys(self, keys):
+        return {
+            normalize_key(name).casefold()
+            for name in self.manager.values_list('name', flat=True)
+        }
+
+    def build(self, row):
+        name = normalize_key(self.required(row, 'name'))
+        return RnDType(
+            name=name,
+            short_name=self.value(row, 'short_name') or name,
+            description=self.value(row, 'description'),
+        )
+
+    def after_create(self, objs):
+        self.importer.reset_lookups()
+
+
+class ContractLoader(BaseLoader):
+    """
+    Договоры и дополнительные соглашения.
+    Если заполнен номер доп. соглашения, строка описывает ДС к договору
+    из столбца «Номер государственного контракта».
+    """
+
+    model = Contract
+    label = 'Договоры'
+    columns = {
+        'number': ('Номер договора', 'Номер государственного контракта'),
+        'supplementary_number': ('Номер дополнительного соглашения к государственному контракту',),
+        'type': ('Тип договора',),
+        'main_contract': ('Основной договор',),
+        'previous_version': ('Предыдущая версия',),
+        'name': ('Наименование договора',),
+        'signed_date': ('Дата подписания', 'Дата государственного контракта'),
+        'supplementary_date': ('Дата дополнительного соглашения к государственному контракту',),
+        'effective_date': ('Дата вступления в силу',),
+        'status': ('Статус договора', 'Состояние государственного контракта'),
+        'document': ('Скан договора', 'Файл ГК/договора'),
+        'description': ('Описание/комментарий',),
+    }
+
+    def __init__(self, importer):
+        super().__init__(importer)
+        # Ссылки на договоры, которых еще нет в базе: (pk, поле, номер)
+        self.pending = []
+
+    def row_key(self, row):
+        return normalize_key(self.value(row, 'supplementary_number') or self.value(row, 'number'))
+
+    def existing_keys(self, keys):
+        return set(self.manager.filter(number__in=keys).values_list('number', flat=True))
+
+    def build(self, row):
+        supplementary_number = normalize_key(self.value(row, 'supplementary_number'))
+        if supplementary_number:
+            number = supplementary_number
+            main_number = normalize_key(self.required(row, 'number'))
+            signed_date = parse_date(self.required(row, 'supplementary_date'))
+        else:
+            number = normalize_key(self.required(row, 'number'))
+            main_number = normalize_key(self.value(row, 'main_contract'))
+            signed_date = parse_date(self.required(row, 'signed_date'))
+
+        contract_type = self.importer.contract_type(self.required(row, 'type'))
+        if contract_type.is_supplementary:
+            if not main_number or main_number == number:
+                raise RowError('Для дополнительного соглашения необходимо указать основной договор')
+        else:
+            main_number = None
+
+        obj = Contract(
+            type_id=contract_type.pk,
+            number=number,
+            name=self.value(row, 'name'),
+            signed_date=signed_date,
+            effective_date=parse_date(self.value(row, 'effective_date')) or signed_date,
+            status=parse_contract_status(self.value(row, 'status'), 'active'),
+            document=self.value(row, 'document') or None,
+            description=self.value(row, 'description'),
+        )
+        normalize_fields(obj)
+        obj._references = {
+            'main_contract': main_number,
+            'previous_version': normalize_key(self.value(row, 'previous_version')) or None,
+        }
+        return obj
+
+    def after_create(self, objs):
+        index_objects(objs, using=self.using)
+        importer = self.importer
+        main_pks = []
+        for obj in objs:
+            importer.contracts[obj.number] = (obj.pk, obj.status, obj.type_id, None)
+            if not importer.contract_type_by_id(obj.type_id).is_supplementary:
+                main_pks.append(obj.pk)
+            for field, number in obj._references.items():
+                if number:
+                    self.pending.append((obj.pk, field, number))
+
+        # Основные договоры ссылаются сами на себя: один UPDATE на пачку
+        if main_pks:
+            self.manager.filter(pk__in=main_pks).update(main_contract=F('pk'))
+        self.resolve_pending()
+
+    def resolve_pending(self, final=False):
+        """Проставляет ссылки на договоры, номера которых уже известны."""
+        if not self.pending:
+            return
+        known = self.importer.contract_refs({number for _, _, number in self.pending})
+        updates = {'main_contract': [], 'previous_version': []}
+        unresolved = []
+        for pk, field, number in self.pending:
+            ref = known.get(number)
+            if ref is None:
+                unresolved.append((pk, field, number))
+                continue
+            obj = Contract(pk=pk)
+            setattr(obj, f'{field}_id', ref[0])
+            updates[field].append(obj)
+        for field, objs in updates.items():
+            if objs:
+                self.manager.bulk_update(objs, [field], batch_size=self.importer.batch_size)
+        self.pending = unresolved
+        if final:
+            for pk, field, number in unresolved:
+                self.importer.error(self.label, None, f'Договор {number} не найден ({field}, id={pk})')
+            self.pending = []
+
+    def finish(self):
+        with transaction.atomic(using=self.using):
+            self.resolve_pending(final=True)
+        # Следующим загрузчикам нужны актуальные ссылки на основной договор
+        self.importer.contracts.clear()
+
+
+class RnDLoader(BaseLoader):
+    model = RnD
+    label = 'НИОКР'
+    columns = {
+        'uuid': ('UUID (идентификатор)', 'UUID', 'Идентификатор НИОКР'),
+        'code': ('Шифр работы',),
+        'title': ('Тема работы',),
+        'purpose': ('Цель работы',),
+        'type': ('Тип работ', 'Вид работы'),
+        'contract': ('Основной договор', 'Номер государственного контракта', 'Номер договора'),
+    }
+
+    def row_key(self, row):
+        return normalize_key(self.value(row, 'uuid'))
+
+    def existing_keys(self, keys):
+        return set(self.manager.filter(uuid__in=keys).values_list('uuid', flat=True))
+
+    def load_chunk(self, chunk):
+        # Шифры договоров пачки для проверки уникальности (договор, шифр)
+        numbers = {normalize_key(self.value(row, 'contract')) for _, row in chunk}
+        contract_ids = [ref[0] for ref in self.importer.contract_refs(numbers).values()]
+        self.codes = set(
+            self.manager.filter(contract_id__in=contract_ids).values_list('contract_id', 'code')
+        )
+        super().load_chunk(chunk)
+
+    def build(self, row):
+        number = normalize_key(self.required(row, 'contract'))
+        ref = self.importer.contract_refs({number}).get(number)
+        if ref is None:
+            raise RowError(f'Договор {number} не найден')
+        contract_pk, contract_status, type_id, _ = ref
+        if self.importer.contract_type_by_id(type_id).is_supplementary:
+            raise RowError('НИОКР можно привязать только к основному договору')
+        code = normalize_key(self.required(row, 'code'))
+        if (contract_pk, code) in self.codes:
+            raise RowError(f'Шифр {code} уже используется в договоре {number}')
+        self.codes.add((contract_pk, code))
+        obj = RnD(
+            contract_id=contract_pk,
+            type_id=self.importer.rnd_type(self.required(row, 'type')).pk,
+            uuid=normalize_key(self.required(row, 'uuid')),
+            code=code,
+            title=self.required(row, 'title'),
+            purpose=self.value(row, 'purpose'),
+            status=RND_STATUS_BY_CONTRACT_STATUS.get(contract_status, 'in_progress'),
+            last_contract_status=contract_status,
+        )
+        normalize_fields(obj)
+        return obj
+
+    def after_create(self, objs):
+        index_objects(objs, using=self.using)
+        # Запомненные промахи по созданным НИОКР больше не верны
+        for obj in objs:
+            self.importer.rnds.pop(obj.uuid, None)
+
+
+class TechnicalSpecificationLoader(BaseLoader):
+    model = TechnicalSpecification
+    label = 'Технические задания'
+    columns = {
+        'rnd': ('UUID (идентификатор)', 'UUID', 'НИОКР'),
+        'contract_document': ('Договор-основание',),
+        'document': ('Файл ТЗ', 'Файл технического задания', 'Фаул технического задания'),
+        'version': ('Версия ТЗ',),
+        'is_active': ('Актуальная версия',),
+        'description': ('Описание изменений',),
+    }
+
+    def row_key(self, row):
+        uuid = normalize_key(self.value(row, 'rnd'))
+        if not uuid:
+            return None
+        return uuid, normalize_key(self.value(row, 'version') or '1.0')
+
+    def existing_keys(self, keys):
+        rnd_ids = self.importer.rnd_refs({uuid for uuid, _ in keys})
+        uuid_by_id = {pk: uuid for uuid, (pk, _) in rnd_ids.items()}
+        return {
+            (uuid_by_id[rnd_id], version) for rnd_id, version in
+            self.manager.filter(rnd_id__in=uuid_by_id).values_list('rnd_id', 'version')
+            if (uuid_by_id[rnd_id], version) in keys
+        }
+
+    def build(self, row):
+        uuid, version = self.row_key(row)
+        rnd = self.importer.rnd_refs({uuid}).get(uuid)
+        if rnd is None:
+            raise RowError(f'НИОКР {uuid} не найдена')
+        rnd_pk, rnd_contract_pk = rnd
+
+        number = normalize_key(self.required(row, 'contract_document'))
+        ref = self.importer.contract_refs({number}).get(number)
+        if ref is None:
+            raise RowError(f'Договор {number} не найден')
+        if rnd_contract_pk not in (ref[0], ref[3]):
+            raise RowError('Договор-основание должен относиться к договору НИОКР')
+
+        return TechnicalSpecification(
+            rnd_id=rnd_pk,
+            contract_document_id=ref[0],
+            document=self.required(row, 'document'),
+            version=version,
+            is_active=parse_bool(self.value(row, 'is_active'), default=True),
+            description=self.value(row, 'description'),
+        )
+
+    def before_create(self, objs):
+        # Актуальной остается последняя активная версия в файле; прежние
+        # актуальные версии снимаются до вставки (ограничение rnd_ts_single_active)
+        active = {}
+        for obj in objs:
+            if obj.is_active:
+                active[obj.rnd_id] = obj
+        for obj in objs:
+            if obj.is_active and active[obj.rnd_id] is not obj:
+                obj.is_active = False
+        if active:
+            self.manager.filter(rnd_id__in=active, is_active=True).update(is_active=False)
+
+
+class RnDTaskLoader(BaseLoader):
+    model = RnDTask
+    label = 'Задачи НИОКР'
+    columns = {
+        'rnd': ('UUID (идентификатор)', 'UUID', 'НИОКР'),
+        'order': ('Порядковый номер', '№ этапа'),
+        'description': ('Описание задачи', 'Содержание этапа работы'),
+        'is_completed': ('Выполнена',),
+        'source_specification': ('Источник (ТЗ)', 'Версия ТЗ'),
+    }
+
+    def row_key(self, row):
+        uuid = normalize_key(self.value(row, 'rnd'))
+        try:
+            order = parse_int(self.value(row, 'order'))
+        except RowError:
+            order = None
+        if not uuid or order is None:
+            return None
+        return uuid, order
+
+    def existing_keys(self, keys):
+        rnd_ids = self.importer.rnd_refs({uuid for uuid, _ in keys})
+        uuid_by_id = {pk: uuid for uuid, (pk, _) in rnd_ids.items()}
+        return {
+            (uuid_by_id[rnd_id], order) for rnd_id, order in
+            self.manager.filter(rnd_id__in=uuid_by_id).values_list('rnd_id', 'order')
+            if (uuid_by_id[rnd_id], order) in keys
+        }
+
+    def load_chunk(self, chunk):
+        # Версии ТЗ пачки загружаются одним запросом
+        uuids = {normalize_key(self.value(row, 'rnd')) for _, row in chunk}
+        rnd_ids = [pk for pk, _ in self.importer.rnd_refs(uuids).values()]
+        self.specifications = {
+            (rnd_id, version): pk for pk, rnd_id, version in
+            TechnicalSpecification._base_manager.using(self.using)
+            .filter(rnd_id__in=rnd_ids).values_list('pk', 'rnd_id', 'version')
+        }
+        super().load_chunk(chunk)
+
+    def build(self, row):
+        uuid, order = self.row_key(row)
+        rnd = self.importer.rnd_refs({uuid}).get(uuid)
+        if rnd is None:
+            raise RowError(f'НИОКР {uuid} не найдена')
+
+        specification_id = None
+        version = self.value(row, 'source_specification')
+        if version:
+            specification_id = self.specifications.get((rnd[0], normalize_key(version)))
+            if specification_id is None:
+                raise RowError(f'ТЗ версии {version} для НИОКР {uuid} не найдено')
+
+        return RnDTask(
+            rnd_id=rnd[0],
+            source_specification_id=specification_id,
+            order=order,
+            description=self.required(row, 'description'),
+            is_completed=parse_bool(self.value(row, 'is_completed')),
+        )
+
+
+class RegistryImporter:
+    """
+    Загрузка реестра в порядке зависимостей моделей.
+    Кэши ключей (номер договора, UUID НИОКР) хранят только первичные ключи.
+    """
+
+    loaders = (
+        ('contract_types', ContractTypeLoader),
+        ('rnd_types', RnDTypeLoader),
+        ('contracts', ContractLoader),
+        ('rnd', RnDLoader),
+        ('specifications', TechnicalSpecificationLoader),
+        ('tasks', RnDTaskLoader),
+    )
+
+    max_errors = 1000
+
+    def __init__(self, using=None, batch_size=1000):
+        self.using = using or router.db_for_write(Contract)
+        self.batch_size = batch_size
+        self.errors = []
+        self.error_count = 0
+        self.contract_types = {}
+        self.rnd_types = {}
+        self.contracts = {}
+        self.rnds = {}
+        self._contract_types_by_id = None
+
+    def run(self, files):
+        """
+        files: имя загрузчика -> путь к файлу.
+        Возвращает словарь {название: (создано, пропущено)}.
+        """
+        result = {}
+        for name, loader_class in self.loaders:
+            path = files.get(name)
+            if not path:
+                continue
+            loader = loader_class(self)
+            loader.load(path)
+            result[loader.label] = (loader.created, loader.skipped)
+        # bulk_create не вызывает сигналы, счетчики и сводки пересчитываются целиком
+        if files.keys() & {'contracts', 'rnd', 'tasks'}:
+            with transaction.atomic(using=self.using):
+                rebuild_counters(using=self.using)
+                rebuild_summaries(using=self.using)
+        return result
+
+    def error(self, label, line_no, message):
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            where = f'{label}, строка {line_no}' if line_no else label
+            self.errors.append(f'{where}: {message}')
+
+    # --- справочники ---
+
+    def reset_lookups(self):
+        self.contract_types.clear()
+        self.rnd_types.clear()
+        self._contract_types_by_id = None
+
+    def _load_lookup(self, cache, model):
+        if not cache:
+            for obj in model._base_manager.using(self.using).all():
+                for key in (obj.name, obj.short_name):
+                    cache.setdefault(normalize_key(key).casefold(), obj)
+        return cache
+
+    def contract_type(self, key):
+        obj = self._load_lookup(self.contract_types, ContractType).get(normalize_key(key).casefold())
+        if obj is None:
+            raise RowError(f'Тип договора «{key}» не найден')
+        return obj
+
+    def contract_type_by_id(self, pk):
+        if self._contract_types_by_id is None:
+            self._contract_types_by_id = {
+                obj.pk: obj for obj in self._load_lookup(self.contract_types, ContractType).values()
+            }
+        return self._contract_types_by_id[pk]
+
+    def rnd_type(self, key):
+        obj = self._load_lookup(self.rnd_types, RnDType).get(normalize_key(key).casefold())
+        if obj is None:
+            raise RowError(f'Тип НИОКР «{key}» не найден')
+        return obj
+
+    # --- ссылки по ключам ---
+
+    def contract_refs(self, numbers):
+        """Номер договора -> (pk, статус, pk типа, pk основного договора)."""
+        missing = [n for n in numbers if n and n not in self.contracts]
+        if missing:
+            # Ненайденные номера тоже запоминаются (None), чтобы не искать их
+            # на каждой строке; созданный позже договор заменяет None
+            self.contracts.update(dict.fromkeys(missing))
+            for number, *ref in (
+                Contract._base_manager.using(self.using).filter(number__in=missing)
+                .values_list('number', 'pk', 'status', 'type_id', 'main_contract_id')
+            ):
+                self.contracts[number] = tuple(ref)
+        return {n: self.contracts[n] for n in numbers if self.contracts.get(n) is not None}
+
+    def rnd_refs(self, uuids):
+        """UUID НИОКР -> (pk, pk договора)."""
+        missing = [u for u in uuids if u and u not in self.rnds]
+        if missing:
+            self.rnds.update(dict.fromkeys(missing))
+            for uuid, pk, contract_id in (
+                RnD._base_manager.using(self.using)
+                .filter(uuid__in=missing).values_list('uuid', 'pk', 'contract_id')
+            ):
+                self.rnds[uuid] = (pk, contract_id)
+        return {u: self.rnds[u] for u in uuids if self.rnds.get(u) is not None}
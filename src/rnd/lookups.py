@@ -0,0 +1,274 @@
+"""
+Процессный кэш справочников ContractType и RnDType.
+
+Справочники маленькие и почти не меняются, но читаются в __str__, clean()
+и формах. Строки справочника хранятся в памяти процесса; при сохранении
+или удалении записи в кэш RND_LOOKUP_CACHE записывается новая общая
+версия, и процессы перечитывают справочник при следующей проверке версии
+(не чаще VERSION_CHECK_INTERVAL секунд). Версия - уникальная метка, а не
+счетчик: incr файлового кэша не атомарен, и два одновременных сброса
+могли бы записать одно и то же значение. Кэш версий должен быть общим
+для процессов (файловый на одном сервере, memcached или redis на
+нескольких): с LocMemCache версия видна только своему процессу, и
+проверка check_lookup_cache не дает запустить проект с таким кэшем.
+
+Обращение к внешнему ключу CachedForeignKey (contract.type, rnd.type)
+и списки выбора CachedModelChoiceField после прогрева не обращаются к базе.
+"""
+import threading
+import time
+import uuid
+
+from django import forms
+from django.apps import apps
+from django.conf import settings
+from django.core import checks
+from django.core.cache import DEFAULT_CACHE_ALIAS, caches
+from django.core.exceptions import ValidationError
+from django.db import DEFAULT_DB_ALIAS, models, router, transaction
+from django.db.models.fields.related_descriptors import ForwardManyToOneDescriptor
+from django.forms.models import ModelChoiceIterator
+
+
+# Проверка общей версии не чаще раза в указанное число секунд
+VERSION_CHECK_INTERVAL = 1.0
+
+# Предельный возраст копии: ограничивает устаревание, если изменение
+# было отменено откатом транзакции или версия в кэше потерялась
+TABLE_MAX_AGE = 300
+
+# Кэши, не видимые другим процессам
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+
+def version_cache():
+    """Кэш общих версий справочников."""
+    return caches[getattr(settings, 'RND_LOOKUP_CACHE', DEFAULT_CACHE_ALIAS)]
+
+
+def check_lookup_cache(app_configs=None, **kwargs):
+    alias = getattr(settings, 'RND_LOOKUP_CACHE', DEFAULT_CACHE_ALIAS)
+    backend = settings.CACHES.get(alias, {}).get('BACKEND')
+    if backend in LOCAL_CACHE_BACKENDS:
+        return [checks.Error(
+            f'Кэш версий справочников {alias!r} ({backend}) не общий для процессов: '
+            f'изменения справочников не дойдут до других процессов',
+            hint='Укажите в RND_LOOKUP_CACHE файловый кэш, memcached или redis',
+            id='rnd.E001',
+        )]
+    return []
+
+
+class LookupCache:
+    """Копия справочника в памяти процесса с общей версией в кэше Django."""
+
+    def __init__(self, model_label, exclude=()):
+        self.model_label = model_label
+        # Поля, которые меняются без save() (счетчики), не кэшируются
+        self.exclude = tuple(exclude)
+        self.version_key = f'rnd:lookup-version:{model_label}'
+        self._lock = threading.Lock()
+        self._tables = {}
+        self._checked_at = {}
+
+    @property
+    def model(self):
+        return apps.get_model(self.model_label)
+
+    def _attnames(self):
+        return [f.attname for f in self.model._meta.concrete_fields if f.name not in self.exclude]
+
+    def _shared_version(self):
+        cache = version_cache()
+        version = cache.get(self.version_key)
+        if version is None:
+            version = uuid.uuid4().hex
+            cache.add(self.version_key, version, None)
+            version = cache.get(self.version_key, version)
+        return version
+
+    def _table(self, using, force=False):
+        now = time.monotonic()
+        table = self._tables.get(using)
+        if table is not None and not force and now - self._checked_at.get(using, 0) < VERSION_CHECK_INTERVAL:
+            return table
+        with self._lock:
+            version = self._shared_version()
+            table = self._tables.get(using)
+            if table is None or table[0] != version or now - table[1] > TABLE_MAX_AGE:
+                # Версия читается до загрузки: изменение во время загрузки
+                # сменит версию, и справочник перечитается при следующей проверке
+                attnames = self._attnames()
+                rows = self.model._base_manager.using(using).order_by(
+                    *self.model._meta.ordering
+                ).values_list(*attnames)
+                table = (version, now, attnames, {row[0]: row for row in rows})
+                self._tables[using] = table
+            self._checked_at[using] = now
+        return table
+
+    def _instance(self, using, attnames, row):
+        return self.model.from_db(using, attnames, row)
+
+    def get(self, pk, using=DEFAULT_DB_ALIAS):
+        """Новый экземпляр записи справочника или None."""
+        if pk is None:
+            return None
+        _, _, attnames, rows = self._table(using)
+        row = rows.get(pk)
+        if row is None:
+            # Запись могла появиться в другом процессе до истечения интервала
+            _, _, attnames, rows = self._table(using, force=True)
+            row = rows.get(pk)
+        return None if row is None else self._instance(using, attnames, row)
+
+    def all(self, using=DEFAULT_DB_ALIAS):
+        """Все записи в порядке Meta.ordering модели."""
+        _, _, attnames, rows = self._table(using)
+        return [self._instance(using, attnames, row) for row in rows.values()]
+
+    def filter(self, using=DEFAULT_DB_ALIAS, **filters):
+        """Записи с равными значениями указанных полей (только точное совпадение)."""
+        return [obj for obj in self.all(using) if matches(obj, filters)]
+
+    def invalidate(self):
+        """Сбрасывает копии справочника во всех процессах."""
+        self._tables.clear()
+        version_cache().set(self.version_key, uuid.uuid4().hex, None)
+
+
+def matches(obj, filters):
+    return all(getattr(obj, name) == value for name, value in filters.items())
+
+
+contract_types = LookupCache('rnd.ContractType', exclude=('contracts_count',))
+rnd_types = LookupCache('rnd.RnDType', exclude=('rnd_count',))
+
+LOOKUP_CACHES = {lookup.model_label: lookup for lookup in (contract_types, rnd_types)}
+
+
+def for_model(model):
+    return LOOKUP_CACHES.get(model._meta.label)
+
+
+def invalidate(model, using=None):
+    """
+    Сброс кэша справочника: сразу и после фиксации транзакции, чтобы
+    процессы, успевшие прочитать старые данные, перечитали справочник.
+    """
+    lookup = for_model(model)
+    if lookup is None:
+        return
+    lookup.invalidate()
+    transaction.on_commit(lookup.invalidate, using=using)
+
+
+class CachedForwardDescriptor(ForwardManyToOneDescriptor):
+
+    def get_object(self, instance):
+        lookup = for_model(self.field.remote_field.model)
+        if lookup is not None and self.field.target_field.primary_key:
+            using = instance._state.db or router.db_for_read(
+                self.field.remote_field.model, instance=instance
+            )
+            obj = lookup.get(getattr(instance, self.field.attname), using)
+            if obj is not None:
+                return obj
+        return super().get_object(instance)
+
+
+class CachedModelChoiceIterator(ModelChoiceIterator):
+
+    def __iter__(self):
+        objs = self.field.cached_choices()
+        if objs is None:
+            yield from super().__iter__()
+            return
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for obj in objs:
+            yield self.choice(obj)
+
+    def __len__(self):
+        objs = self.field.cached_choices()
+        if objs is None:
+            return super().__len__()
+        return len(objs) + (1 if self.field.empty_label is not None else 0)
+
+    def __bool__(self):
+        objs = self.field.cached_choices()
+        if objs is None:
+            return super().__bool__()
+        return self.field.empty_label is not None or bool(objs)
+
+
+class CachedModelChoiceField(forms.ModelChoiceField):
+    """
+    Выбор записи справочника из процессного кэша.
+    Ограничивать выбор нужно через limit_choices(); если queryset
+    заменен напрямую, поле работает как обычный ModelChoiceField.
+    """
+
+    iterator = CachedModelChoiceIterator
+
+    def __init__(self, queryset, **kwargs):
+        super().__init__(queryset, **kwargs)
+        self._cache_filters = {}
+        self._cache_source = self._queryset if not queryset.query.where else None
+
+    def __deepcopy__(self, memo):
+        result = super().__deepcopy__(memo)
+        if self._cache_source is not None and self._cache_source is self._queryset:
+            result._cache_source = result._queryset
+        return result
+
+    def limit_choices(self, **filters):
+        """Ограничение выбора равенством полей, например is_supplementary=True."""
+        self._cache_filters = {**self._cache_filters, **filters}
+        usable = self._cache_source is not None and self._cache_source is self._queryset
+        self.queryset = self.queryset.filter(**filters)
+        self._cache_source = self._queryset if usable else None
+
+    def _lookup(self):
+        if self._cache_source is None or self._cache_source is not self._queryset:
+            return None
+        if self.to_field_name not in (None, self.queryset.model._meta.pk.name):
+            return None
+        return for_model(self.queryset.model)
+
+    def cached_choices(self):
+        lookup = self._lookup()
+        if lookup is None:
+            return None
+        return lookup.filter(self.queryset.db, **self._cache_filters)
+
+    def to_python(self, value):
+        lookup = self._lookup()
+        if lookup is None or value in self.empty_values:
+            return super().to_python(value)
+        if isinstance(value, self.queryset.model):
+            value = value.pk
+        try:
+            obj = lookup.get(self.queryset.model._meta.pk.to_python(value), self.queryset.db)
+        except ValidationError:
+            obj = None
+        if obj is None or not matches(obj, self._cache_filters):
+            raise ValidationError(
+                self.error_messages['invalid_choice'],
+                code='invalid_choice',
+                params={'value': value},
+            )
+        return obj
+
+
+class CachedForeignKey(models.ForeignKey):
+    """Внешний ключ на справочник, читаемый из процессного кэша."""
+
+    forward_related_accessor_class = CachedForwardDescriptor
+
+    def formfield(self, **kwargs):
+        kwargs.setdefault('form_class', CachedModelChoiceField)
+        return super().formfield(**kwargs)
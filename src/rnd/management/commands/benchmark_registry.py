@@ -0,0 +1,67 @@
+"""
+Замеры времени и числа запросов основных операций реестра.
+
+Набор данных создается и удаляется (откат транзакции) при каждом запуске.
+
+Пример:
+    python manage.py benchmark_registry --contracts 1000 --output bench.json
+    python manage.py benchmark_registry --baseline bench.json --output current.json
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rnd.benchmarks import BENCHMARKS, DEFAULT_TOLERANCE, compare, run_benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Замеры сохранения моделей, переноса статусов и страниц админки на сгенерированных данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--contracts', type=int, default=200,
+                            help='Основных договоров в наборе данных, по умолчанию 200')
+        parser.add_argument('--repeat', type=int, default=5, help='Замеров каждой операции, по умолчанию 5')
+        parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора данных')
+        parser.add_argument('--only', nargs='+', metavar='NAME', help='Только указанные замеры')
+        parser.add_argument('--output', help='Файл JSON для результатов')
+        parser.add_argument('--baseline', help='Файл JSON базового замера для поиска регрессий')
+        parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                            help=f'Допустимый рост медианы времени, по умолчанию {DEFAULT_TOLERANCE}')
+        parser.add_argument('--database', default=None, help='Алиас базы данных')
+
+    def handle(self, *args, **options):
+        if options['contracts'] < 1 or options['repeat'] < 1:
+            raise CommandError('--contracts и --repeat должны быть положительными')
+        unknown = set(options['only'] or ()) - set(BENCHMARKS)
+        if unknown:
+            raise CommandError(f'Неизвестные замеры: {", ".join(sorted(unknown))}')
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as fh:
+                    baseline = json.load(fh)
+            except (OSError, ValueError) as exc:
+                raise CommandError(f'Не удалось прочитать базовый замер: {exc}')
+
+        report = run_benchmarks(
+            contracts=options['contracts'], repeat=options['repeat'], seed=options['seed'],
+            names=options['only'], using=options['database'],
+        )
+        width = max(len(name) for name in report['results'])
+        for name, result in report['results'].items():
+            self.stdout.write(
+                f'{name:<{width}}  {result["median_ms"]:9.2f} мс  '
+                f'({result["min_ms"]:.2f}-{result["max_ms"]:.2f})  запросов: {result["queries"]}'
+            )
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as fh:
+                json.dump(report, fh, ensure_ascii=False, indent=2)
+            self.stdout.write(f'Результаты сохранены в {options["output"]}')
+
+        if baseline is not None:
+            regressions = compare(report, baseline, options['tolerance'])
+            for message in regressions:
+                self.stderr.write(message)
+            if regressions:
+                raise CommandError(f'Регрессий относительно {options["baseline"]}: {len(regressions)}')
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
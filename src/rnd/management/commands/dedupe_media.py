@@ -0,0 +1,52 @@
+"""
+Перенос сканов договоров и файлов ТЗ в хранилище по содержимому.
+
+Файлы со старыми именами (случайное имя в папке по дате) переносятся в
+хранилище под именем по SHA-256, записи получают новые имена, одинаковые
+файлы сводятся к одному. Затем пересчитываются ссылки на файлы.
+
+Пример:
+    python manage.py dedupe_media --dry-run
+    python manage.py dedupe_media --prune
+"""
+from django.core.management.base import BaseCommand
+
+from rnd.media import deduplicate, prune_unreferenced, rebuild_file_references
+
+
+def megabytes(size):
+    return f'{size / (1024 * 1024):.1f} МБ'
+
+
+class Command(BaseCommand):
+    help = 'Перенос документов в хранилище по содержимому с удалением дублей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Только посчитать, сколько места освободится')
+        parser.add_argument('--keep-originals', action='store_true',
+                            help='Не удалять файлы со старыми именами')
+        parser.add_argument('--prune', action='store_true',
+                            help='Удалить файлы хранилища, на которые нет ссылок')
+        parser.add_argument('--database', default=None, help='Алиас базы данных')
+
+    def handle(self, *args, **options):
+        stats = deduplicate(
+            using=options['database'], keep_originals=options['keep_originals'], dry_run=options['dry_run'],
+        )
+        self.stdout.write(
+            f'Файлов со старыми именами: {stats["files"]}, уникальных: {stats["stored"]}, '
+            f'не найдено на диске: {stats["missing"]}'
+        )
+        self.stdout.write(
+            f'Объем: {megabytes(stats["before"])} -> {megabytes(stats["after"])}'
+        )
+        if options['dry_run']:
+            return
+        if not stats['files']:
+            # Переносить нечего, но ссылки могли разойтись после update()
+            rebuild_file_references(options['database'])
+        if options['prune']:
+            removed, size = prune_unreferenced(options['database'])
+            self.stdout.write(f'Удалено файлов без ссылок: {removed} ({megabytes(size)})')
+        self.stdout.write(self.style.SUCCESS('Готово'))
@@ -0,0 +1,60 @@
+"""
+Выгрузка реестра НИОКР в CSV/XLSX.
+
+Пример:
+    python manage.py export_rnd rnd.xlsx --status in_progress --contract ГК-1
+"""
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rnd.export import RENDERERS, ExportError, export_rows, render
+from rnd.models import RnD
+
+
+class Command(BaseCommand):
+    help = 'Выгрузка НИОКР с договорами, актуальной версией ТЗ и счетчиками задач'
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', help='Файл выгрузки (.csv или .xlsx)')
+        parser.add_argument('--format', choices=sorted(RENDERERS), dest='export_format',
+                            help='Формат файла; по умолчанию - по расширению')
+        parser.add_argument('--status', action='append', default=[],
+                            help='Статус НИОКР (можно указать несколько раз)')
+        parser.add_argument('--contract', action='append', dest='numbers', default=[],
+                            help='Номер основного договора (можно указать несколько раз)')
+        parser.add_argument('--database', default=None, help='Алиас базы данных')
+
+    def handle(self, *args, **options):
+        export_format = options['export_format'] or os.path.splitext(options['output'])[1].lstrip('.').lower()
+        if export_format not in RENDERERS:
+            raise CommandError('Укажите формат: --format csv или --format xlsx')
+
+        queryset = RnD.objects.using(options['database']).all()
+        if options['status']:
+            queryset = queryset.filter(status__in=options['status'])
+        if options['numbers']:
+            queryset = queryset.filter(contract__number__in=options['numbers'])
+
+        written = 0
+
+        def counted(rows):
+            nonlocal written
+            for row in rows:
+                written += 1
+                yield row
+
+        started = time.monotonic()
+        try:
+            chunks = render(counted(export_rows(queryset)), export_format)
+            with open(options['output'], 'wb') as fh:
+                for chunk in chunks:
+                    fh.write(chunk)
+        except ExportError as exc:
+            raise CommandError(str(exc))
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Выгружено НИОКР: {written} в {options["output"]} за {elapsed:.1f} с'
+        ))
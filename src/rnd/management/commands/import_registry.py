@@ -0,0 +1,61 @@
+"""
+Массовая загрузка реестра из CSV/XLSX.
+
+Пример:
+    python manage.py import_registry --contracts contracts.xlsx --rnd rnd.csv --tasks tasks.csv
+"""
+import os
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.backends.sqlite3.base import write_transactions
+from rnd.importers import RegistryImporter, RowError
+
+
+class Command(BaseCommand):
+    help = 'Загрузка договоров, доп. соглашений, НИОКР, ТЗ и задач из CSV/XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--contract-types', help='Файл типов договоров')
+        parser.add_argument('--rnd-types', help='Файл типов НИОКР')
+        parser.add_argument('--contracts', help='Файл договоров и доп. соглашений')
+        parser.add_argument('--rnd', help='Файл НИОКР')
+        parser.add_argument('--specifications', help='Файл технических заданий')
+        parser.add_argument('--tasks', help='Файл задач НИОКР')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Размер пачки (строк на транзакцию), по умолчанию 1000')
+        parser.add_argument('--database', default=None, help='Алиас базы данных')
+
+    def handle(self, *args, **options):
+        files = {
+            name: options[name]
+            for name, _ in RegistryImporter.loaders
+            if options.get(name)
+        }
+        if not files:
+            raise CommandError('Не указан ни один файл для загрузки')
+        for path in files.values():
+            if not os.path.isfile(path):
+                raise CommandError(f'Файл не найден: {path}')
+        if options['batch_size'] < 1:
+            raise CommandError('Размер пачки должен быть положительным')
+
+        importer = RegistryImporter(using=options['database'], batch_size=options['batch_size'])
+        started = time.monotonic()
+        try:
+            with write_transactions(options['database']):
+                result = importer.run(files)
+        except RowError as exc:
+            raise CommandError(str(exc))
+
+        for label, (created, skipped) in result.items():
+            self.stdout.write(f'{label}: создано {created}, пропущено существующих {skipped}')
+        for message in importer.errors:
+            self.stderr.write(message)
+        if importer.error_count > len(importer.errors):
+            self.stderr.write(f'... и еще {importer.error_count - len(importer.errors)} ошибок')
+
+        elapsed = time.monotonic() - started
+        style = self.style.WARNING if importer.error_count else self.style.SUCCESS
+        self.stdout.write(style(f'Загрузка завершена за {elapsed:.1f} с, ошибок: {importer.error_count}'))
@@ -0,0 +1,24 @@
+"""
+Пересчет денормализованных счетчиков.
+
+Пример:
+    python manage.py rebuild_counters
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from rnd.counters import rebuild_counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчет счетчиков договоров, доп. соглашений, НИОКР и задач НИОКР'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=None, help='Алиас базы данных')
+
+    def handle(self, *args, **options):
+        with transaction.atomic(using=options['database']):
+            result = rebuild_counters(using=options['database'])
+        for name, fixed in result.items():
+            self.stdout.write(f'{name}: исправлено записей {fixed}')
+        self.stdout.write(self.style.SUCCESS('Счетчики пересчитаны'))
@@ -0,0 +1,34 @@
+"""
+Перестроение полнотекстовых индексов FTS5 и триграммного индекса
+идентификаторов (номера договоров, шифры и UUID НИОКР).
+
+Пример:
+    python manage.py rebuild_search_index
+"""
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from rnd.identifiers import rebuild_identifier_index
+from rnd.search import ensure_search_indexes, rebuild_search_indexes
+
+
+class Command(BaseCommand):
+    help = 'Перестроение полнотекстовых индексов (SQLite FTS5) и индекса идентификаторов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Алиас базы данных')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        with transaction.atomic(using=using):
+            indexed = rebuild_identifier_index(using=using)
+        for label, total in indexed.items():
+            self.stdout.write(f'{label}: проиндексировано идентификаторов {total}')
+        
+        ensure_search_indexes(connections[using])
+        rebuilt = rebuild_search_indexes(using)
+        if not rebuilt:
+            self.stdout.write(self.style.WARNING('FTS5 недоступен, полнотекстовые индексы не созданы'))
+        for label in rebuilt:
+            self.stdout.write(f'{label}: полнотекстовый индекс перестроен')
+        self.stdout.write(self.style.SUCCESS('Индексы перестроены'))
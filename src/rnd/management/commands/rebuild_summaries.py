@@ -0,0 +1,24 @@
+"""
+Пересчет сводок статусов для панели руководителя.
+
+Пример:
+    python manage.py rebuild_summaries
+"""
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from rnd.summaries import rebuild_summaries
+
+
+class Command(BaseCommand):
+    help = 'Пересчет сводок НИОКР и договоров по статусам'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=None, help='Алиас базы данных')
+
+    def handle(self, *args, **options):
+        with transaction.atomic(using=options['database']):
+            result = rebuild_summaries(using=options['database'])
+        self.stdout.write(f'Сводка НИОКР: строк {result["rnd"]}')
+        self.stdout.write(f'Сводка договоров: строк {result["contracts"]}')
+        self.stdout.write(self.style.SUCCESS('Сводки пересчитаны'))
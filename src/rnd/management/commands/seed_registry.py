@@ -0,0 +1,66 @@
+"""
+Генерация синтетического реестра для нагрузочных проверок.
+
+Пример:
+    python manage.py seed_registry --contracts 100000 --supp-per-contract 3 --seed 1
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rnd.seeding import DEFAULT_BATCH_SIZE, RegistrySeeder, SeedError
+
+
+class Command(BaseCommand):
+    help = 'Генерация договоров, доп. соглашений, НИОКР, ТЗ и задач (детерминированно по seed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--contracts', type=int, required=True, help='Число основных договоров')
+        parser.add_argument('--supp-per-contract', type=int, default=2,
+                            help='Доп. соглашений на договор, по умолчанию 2')
+        parser.add_argument('--rnd-per-contract', type=int, default=2,
+                            help='НИОКР на договор, по умолчанию 2')
+        parser.add_argument('--specs-per-rnd', type=int, default=3,
+                            help='Версий ТЗ на НИОКР, по умолчанию 3')
+        parser.add_argument('--tasks-per-rnd', type=int, default=5,
+                            help='Задач на НИОКР, по умолчанию 5')
+        parser.add_argument('--version-share', type=float, default=0.2,
+                            help='Доля договоров - новых редакций предыдущего договора, по умолчанию 0.2')
+        parser.add_argument('--seed', type=int, default=0, help='Начальное значение генератора')
+        parser.add_argument('--prefix', default=None,
+                            help='Префикс номеров договоров, по умолчанию S<seed>-')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE,
+                            help=f'Строк на транзакцию, по умолчанию {DEFAULT_BATCH_SIZE}')
+        parser.add_argument('--database', default=None, help='Алиас базы данных')
+
+    def handle(self, *args, **options):
+        counts = ('contracts', 'supp_per_contract', 'rnd_per_contract', 'specs_per_rnd', 'tasks_per_rnd')
+        for name in counts:
+            if options[name] < 0:
+                raise CommandError(f'--{name.replace("_", "-")} не может быть отрицательным')
+        if options['batch_size'] < 1:
+            raise CommandError('Размер пачки должен быть положительным')
+        if not 0 <= options['version_share'] <= 1:
+            raise CommandError('--version-share должен быть от 0 до 1')
+
+        seeder = RegistrySeeder(
+            using=options['database'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+            **{name: options[name] for name in counts[1:]},
+            version_share=options['version_share'],
+        )
+        started = time.monotonic()
+        try:
+            created = seeder.run(options['contracts'])
+        except SeedError as exc:
+            raise CommandError(str(exc))
+        elapsed = time.monotonic() - started
+
+        for model, total in created.items():
+            self.stdout.write(f'{model._meta.verbose_name_plural}: {total}')
+        rows = sum(created.values())
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано строк: {rows} за {elapsed:.1f} с ({rows / max(elapsed, 0.001):.0f} строк/с)'
+        ))
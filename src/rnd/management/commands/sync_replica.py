@@ -0,0 +1,54 @@
+"""
+Обновление реплики SQLite копией основной базы.
+
+Копия делается backup API SQLite: согласованный снимок без остановки
+записи в основную базу. На время копирования чтение с реплики ждет
+блокировку (busy_timeout). Реплике PostgreSQL команда не нужна.
+
+Пример:
+    RND_REPLICA_DB=/var/lib/rnd/replica.sqlite3 python manage.py sync_replica
+"""
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.connection import ConnectionDoesNotExist
+
+from rnd.routing import replica_aliases
+
+
+class Command(BaseCommand):
+    help = 'Копирование основной базы SQLite в файл реплики для чтения'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--replica', default=None,
+                            help='Алиас реплики, по умолчанию первый из RND_READ_REPLICAS')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Алиас основной базы')
+
+    def handle(self, *args, **options):
+        replicas = replica_aliases()
+        alias = options['replica'] or (replicas[0] if replicas else None)
+        if alias is None:
+            raise CommandError('Реплика не настроена: задайте RND_REPLICA_DB')
+        try:
+            source, target = connections[options['database']], connections[alias]
+        except ConnectionDoesNotExist as exc:
+            raise CommandError(str(exc))
+        if source.vendor != 'sqlite' or target.vendor != 'sqlite':
+            raise CommandError('Команда копирует только базы SQLite')
+        if source.in_atomic_block:
+            raise CommandError('Копирование невозможно внутри транзакции основной базы')
+
+        started = time.monotonic()
+        source.ensure_connection()
+        destination = sqlite3.connect(target.settings_dict['NAME'])
+        try:
+            source.connection.backup(destination)
+        finally:
+            destination.close()
+        # Соединение этого процесса с репликой могло видеть старый файл
+        target.close()
+        self.stdout.write(self.style.SUCCESS(
+            f'Реплика {alias} обновлена за {time.monotonic() - started:.1f} с'
+        ))
@@ -0,0 +1,36 @@
+"""
+Синхронизация статусов НИОКР со статусами договоров.
+
+Пример:
+    python manage.py sync_rnd_statuses --contract ГК-1 --contract ГК-2
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from rnd.models import Contract, propagate_contract_statuses
+
+
+class Command(BaseCommand):
+    help = 'Перенос статусов договоров на связанные НИОКР'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--contract', action='append', dest='numbers', default=[],
+                            help='Номер договора (можно указать несколько раз); по умолчанию вся база')
+        parser.add_argument('--database', default=None, help='Алиас базы данных')
+
+    def handle(self, *args, **options):
+        contracts = None
+        if options['numbers']:
+            contracts = Contract.objects.using(options['database']).filter(number__in=options['numbers'])
+            found = set(contracts.values_list('number', flat=True))
+            missing = sorted(set(options['numbers']) - found)
+            if missing:
+                raise CommandError(f'Договоры не найдены: {", ".join(missing)}')
+
+        with transaction.atomic(using=options['database']):
+            result = propagate_contract_statuses(contracts, using=options['database'])
+
+        labels = dict(Contract.CONTRACT_STATUS_CHOICES)
+        for contract_status, updated in result.items():
+            self.stdout.write(f'{labels.get(contract_status, contract_status)}: обновлено НИОКР {updated}')
+        self.stdout.write(self.style.SUCCESS(f'Всего обновлено НИОКР: {sum(result.values())}'))
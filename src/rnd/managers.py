@@ -1,10 +1,124 @@
-from django.db import models
-from django.db.models import Count, Q
+"""
+Менеджеры моделей и профили загрузки.
 
+Профиль загрузки - именованный набор связей и столбцов для одного сценария:
+    list       - строки списка админки и автодополнения;
+    detail     - карточка записи и формы;
+    export     - выгрузки (values() без объектов связей);
+    validation - варианты выбора в формах: объект с тем, что читают
+                 __str__() и clean() модели.
+Вызывающий код выбирает профиль (Contract.objects.profile('list')), а не
+перечисляет select_related/prefetch_related сам. Профиль заменяет связи
+и отложенные столбцы, заданные ранее.
 
-class ContractManager(models.Manager):
+Профиль detail ничего не откладывает: save() записывает только
+загруженные поля, и столбцы, вычисляемые в save() (number_normalized),
+не обновились бы. Типы договоров и НИОКР читаются из процессного кэша
+справочников (rnd.lookups) и в профилях не соединяются.
+"""
+from django.db import connections, models
+from django.db.models import Count, Exists, OuterRef, Q
+
+
+PROFILE_NAMES = ('list', 'detail', 'export', 'validation')
+
+
+class LoadingProfile:
+    """Связи для JOIN, связи для prefetch и отложенные столбцы."""
+    
+    def __init__(self, select=(), prefetch=(), defer=()):
+        self.select = tuple(select)
+        self.prefetch = tuple(prefetch)
+        self.defer = tuple(defer)
+    
+    def apply(self, queryset):
+        queryset = queryset.select_related(None).prefetch_related(None).defer(None)
+        if self.select:
+            queryset = queryset.select_related(*self.select)
+        if self.prefetch:
+            queryset = queryset.prefetch_related(*self.prefetch)
+        if self.defer:
+            queryset = queryset.defer(*self.defer)
+        return queryset
+
+
+class ProfileQuerySet(models.QuerySet):
+    """QuerySet с профилями загрузки, см. PROFILE_NAMES."""
+    
+    profiles = {}
+    
+    def profile(self, name):
+        if name not in self.profiles:
+            raise ValueError(f'Неизвестный профиль загрузки {self.model._meta.label}: {name}')
+        return self.profiles[name].apply(self)
+
+
+class ContractQuerySet(ProfileQuerySet):
+    profiles = {
+        'list': LoadingProfile(
+            select=('main_contract',),
+            defer=('description', 'number_normalized', 'main_contract__description'),
+        ),
+        'detail': LoadingProfile(select=('main_contract', 'previous_version')),
+        'export': LoadingProfile(defer=('description', 'number_normalized')),
+        # __str__ доп. соглашения выводит номер основного договора
+        'validation': LoadingProfile(
+            select=('main_contract',),
+            defer=('description', 'number_normalized', 'main_contract__description'),
+        ),
+    }
+
+
+class RnDQuerySet(ProfileQuerySet):
+    profiles = {
+        'list': LoadingProfile(
+            select=('contract',),
+            defer=('purpose', 'uuid_normalized', 'code_normalized', 'contract__description'),
+        ),
+        'detail': LoadingProfile(select=('contract',)),
+        'export': LoadingProfile(defer=('purpose', 'uuid_normalized', 'code_normalized')),
+        # clean() ТЗ и задач сравнивает договор НИОКР
+        'validation': LoadingProfile(
+            select=('contract',),
+            defer=('purpose', 'uuid_normalized', 'code_normalized', 'contract__description'),
+        ),
+    }
+
+
+class TechnicalSpecificationQuerySet(ProfileQuerySet):
+    profiles = {
+        'list': LoadingProfile(
+            select=('rnd', 'contract_document', 'contract_document__main_contract'),
+            defer=('description', 'rnd__purpose', 'contract_document__description'),
+        ),
+        'detail': LoadingProfile(select=('rnd', 'rnd__contract', 'contract_document__main_contract')),
+        'export': LoadingProfile(defer=('description',)),
+        # __str__ выводит шифр НИОКР, clean() - договоры НИОКР и документа
+        'validation': LoadingProfile(
+            select=('rnd', 'rnd__contract', 'contract_document__main_contract'),
+            defer=('description', 'rnd__purpose', 'contract_document__description'),
+        ),
+    }
+
+
+class RnDTaskQuerySet(ProfileQuerySet):
+    profiles = {
+        'list': LoadingProfile(
+            select=('rnd', 'source_specification'),
+            defer=('rnd__purpose', 'source_specification__description'),
+        ),
+        'detail': LoadingProfile(select=('rnd', 'source_specification__rnd')),
+        'export': LoadingProfile(),
+        'validation': LoadingProfile(select=('rnd', 'source_specification__rnd'), defer=('rnd__purpose',)),
+    }
+
+
+class ContractManager(models.Manager.from_queryset(ContractQuerySet)):
     """Кастомный менеджер для контрактов."""
     
+    # Ограничение глубины обхода на случай циклических ссылок
+    MAX_VERSION_DEPTH = 1000
+    
     def with_related_counts(self):
         return self.get_queryset().annotate(
             related_docs_count=Count('related_documents')
@@ -15,9 +129,63 @@ class ContractManager(models.Manager):
     
     def supplementary_agreements(self):
         return self.filter(type__is_supplementary=True)
+    
+    def version_chain(self, contract):
+        """
+        Все версии договора (предыдущие и последующие) одним запросом
+        с рекурсивным CTE. Упорядочены от самой ранней версии; у каждой
+        версии есть атрибут version_depth (0 - сам договор).
+        """
+        pk = getattr(contract, 'pk', contract)
+        opts = self.model._meta
+        quote = connections[self.db].ops.quote_name
+        table = quote(opts.db_table)
+        pk_column = quote(opts.pk.column)
+        previous = quote(opts.get_field('previous_version').column)
+        sql = f'''
+            WITH RECURSIVE
+            earlier(id, previous_id, depth) AS (
+                SELECT {pk_column}, {previous}, 0 FROM {table} WHERE {pk_column} = %s
+                UNION ALL
+                SELECT c.{pk_column}, c.{previous}, e.depth - 1
+                FROM {table} c JOIN earlier e ON c.{pk_column} = e.previous_id
+                WHERE e.depth > -%s
+            ),
+            later(id, depth) AS (
+                SELECT {pk_column}, 0 FROM {table} WHERE {pk_column} = %s
+                UNION ALL
+                SELECT c.{pk_column}, l.depth + 1
+                FROM {table} c JOIN later l ON c.{previous} = l.id
+                WHERE l.depth < %s
+            ),
+            chain(id, depth) AS (
+                SELECT id, depth FROM earlier
+                UNION
+                SELECT id, depth FROM later
+            )
+            SELECT c.*, chain.depth AS version_depth
+            FROM {table} c JOIN chain ON c.{pk_column} = chain.id
+            ORDER BY chain.depth, c.{pk_column}
+        '''
+        depth = self.MAX_VERSION_DEPTH
+        return self.raw(sql, [pk, depth, pk, depth])
+    
+    def fuzzy_number(self, term, limit=20):
+        """
+        Договоры с номером, похожим на term ("дс 12" найдет "ДС-12/2026"),
+        лучшие первыми; сходство - в атрибуте fuzzy_score.
+        """
+        from .identifiers import fuzzy_search
+        return fuzzy_search(self.get_queryset(), ('number',), term, limit)
+    
+    def latest_versions(self):
+        """Договоры, у которых нет более поздней версии."""
+        return self.filter(
+            ~Exists(self.model._base_manager.filter(previous_version=OuterRef('pk')))
+        )
 
 
-class RnDManager(models.Manager):
+class RnDManager(models.Manager.from_queryset(RnDQuerySet)):
     """Кастомный менеджер для НИОКР."""
     
     def with_optimized_relations(self):
@@ -28,4 +196,17 @@ class RnDManager(models.Manager):
     def active(self):
         return self.filter(
             Q(status='in_progress') | Q(status='suspended')
-        )
\ No newline at end of file
+        )
+    
+    def fuzzy_code(self, term, limit=20, fields=('code', 'uuid')):
+        """НИОКР с шифром или UUID, похожим на term, лучшие первыми."""
+        from .identifiers import fuzzy_search
+        return fuzzy_search(self.get_queryset(), fields, term, limit)
+
+
+class TechnicalSpecificationManager(models.Manager.from_queryset(TechnicalSpecificationQuerySet)):
+    """Менеджер технических заданий."""
+
+
+class RnDTaskManager(models.Manager.from_queryset(RnDTaskQuerySet)):
+    """Менеджер задач НИОКР."""
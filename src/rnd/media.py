@@ -0,0 +1,198 @@
+"""
+Учет ссылок на файлы хранилища документов (rnd.storage).
+
+StoredFile - файл хранилища и число документов, ссылающихся на него из
+DOCUMENT_FIELDS. Ссылки изменяются приращениями в сигналах при загрузке,
+замене и удалении документа; rebuild_file_references() пересчитывает их
+целиком. Файлы без ссылок удаляет prune_unreferenced() (команда
+dedupe_media --prune), а не сигнал: параллельная загрузка того же
+содержимого могла уже найти файл в хранилище.
+
+deduplicate() переносит файлы, загруженные до хранилища (случайные имена
+по датам), в хранилище по содержимому: одинаковые файлы сводятся к одному.
+"""
+import datetime
+from collections import Counter
+
+from django.conf import settings
+from django.db import IntegrityError, router, transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import Contract, StoredFile, TechnicalSpecification
+from .storage import CAS_PREFIX, content_digest, content_name, document_storage, is_content_name
+
+
+DOCUMENT_FIELDS = (
+    (Contract, 'document'),
+    (TechnicalSpecification, 'document'),
+)
+
+
+def _file_size(name):
+    try:
+        return document_storage().size(name)
+    except OSError:
+        return 0
+
+
+def acquire(name, using):
+    """Ссылка на файл хранилища добавлена."""
+    if not is_content_name(name):
+        return
+    manager = StoredFile._base_manager.using(using)
+    if manager.filter(name=name).update(references=F('references') + 1):
+        return
+    try:
+        with transaction.atomic(using=using):
+            manager.create(name=name, size=_file_size(name), references=1)
+    except IntegrityError:
+        manager.filter(name=name).update(references=F('references') + 1)
+
+
+def register(name, size, using=None):
+    """Файл записан в хранилище без ссылок (загрузка по частям до сохранения формы)."""
+    using = using or router.db_for_write(StoredFile)
+    StoredFile._base_manager.using(using).bulk_create(
+        [StoredFile(name=name, size=size, references=0)], ignore_conflicts=True,
+    )
+    touch(name, using)
+
+
+def touch(name, using=None):
+    """
+    Содержимое файла без ссылок загружено снова: срок до удаления
+    prune_unreferenced() отсчитывается заново, иначе старая запись
+    без ссылок считалась бы просроченной.
+    """
+    using = using or router.db_for_write(StoredFile)
+    StoredFile._base_manager.using(using).filter(name=name, references=0).update(created_at=timezone.now())
+
+
+def release(name, using):
+    """Ссылка на файл хранилища удалена."""
+    if is_content_name(name):
+        StoredFile._base_manager.using(using).filter(name=name).update(
+            references=Greatest(F('references') - 1, Value(0))
+        )
+
+
+def document_saved(instance, created, using):
+    new = instance.document.name or None
+    if created:
+        acquire(new, using)
+        return
+    if not instance.has_changed('document'):
+        return
+    old = instance.get_original_value('document')
+    if old != new:
+        release(old, using)
+        acquire(new, using)
+
+
+def document_deleted(instance, using):
+    release(instance.document.name, using)
+
+
+def rebuild_file_references(using=None):
+    """Пересчитывает ссылки на все файлы хранилища; возвращает число файлов со ссылками."""
+    using = using or router.db_for_write(StoredFile)
+    counts = Counter()
+    for model, field in DOCUMENT_FIELDS:
+        rows = (
+            model._base_manager.using(using).filter(**{f'{field}__startswith': CAS_PREFIX})
+            .order_by().values(field).annotate(total=Count('pk'))
+        )
+        for row in rows:
+            counts[row[field]] += row['total']
+
+    manager = StoredFile._base_manager.using(using)
+    with transaction.atomic(using=using):
+        changed, created = [], []
+        known = set()
+        for stored in manager.all().iterator():
+            known.add(stored.name)
+            total = counts.get(stored.name, 0)
+            if stored.references != total:
+                stored.references = total
+                changed.append(stored)
+        for name, total in counts.items():
+            if name not in known:
+                created.append(StoredFile(name=name, size=_file_size(name), references=total))
+        manager.bulk_update(changed, ['references'], batch_size=1000)
+        manager.bulk_create(created, batch_size=1000)
+    return len(counts)
+
+
+def prune_unreferenced(using=None, min_age=None):
+    """
+    Удаляет файлы хранилища без ссылок, записанные больше min_age секунд
+    назад (по умолчанию RND_UPLOAD_EXPIRY: загрузка по частям могла еще
+    не дойти до сохранения формы); возвращает (файлов, байт).
+    """
+    using = using or router.db_for_write(StoredFile)
+    min_age = settings.RND_UPLOAD_EXPIRY if min_age is None else min_age
+    storage = document_storage()
+    removed = size = 0
+    cutoff = timezone.now() - datetime.timedelta(seconds=min_age)
+    candidates = StoredFile._base_manager.using(using).filter(references=0, created_at__lte=cutoff)
+    for stored in candidates.iterator():
+        with transaction.atomic(using=using):
+            # Ссылка могла появиться или файл мог быть загружен снова после выборки
+            if not StoredFile._base_manager.using(using).filter(
+                pk=stored.pk, references=0, created_at__lte=cutoff,
+            ).delete()[0]:
+                continue
+        storage.delete(stored.name)
+        removed += 1
+        size += stored.size
+    return removed, size
+
+
+def deduplicate(using=None, keep_originals=False, dry_run=False):
+    """
+    Переносит файлы документов со старыми именами в хранилище по
+    содержимому и заменяет имена в записях. Возвращает статистику:
+    files - файлов со старыми именами, missing - не найдено на диске,
+    stored - новых файлов в хранилище, before/after - байт до и после.
+    """
+    using = using or router.db_for_write(StoredFile)
+    storage = document_storage()
+    stats = Counter()
+    moved = {}
+    targets = set()
+    for model, field in DOCUMENT_FIELDS:
+        manager = model._base_manager.using(using)
+        names = (
+            manager.exclude(**{f'{field}__startswith': CAS_PREFIX})
+            .exclude(**{f'{field}__isnull': True}).exclude(**{field: ''})
+            .order_by().values_list(field, flat=True).distinct()
+        )
+        for name in list(names):
+            if name not in moved:
+                if not storage.exists(name):
+                    stats['missing'] += 1
+                    continue
+                stats['files'] += 1
+                size = storage.size(name)
+                stats['before'] += size
+                with storage.open(name) as fh:
+                    digest = content_digest(fh)
+                    target = content_name(digest, name)
+                    if target not in targets and not storage.exists(target):
+                        stats['stored'] += 1
+                        stats['after'] += size
+                        if not dry_run:
+                            storage.store(fh, name, digest=digest)
+                moved[name] = target
+                targets.add(target)
+            if not dry_run:
+                manager.filter(**{field: name}).update(**{field: moved[name]})
+
+    if not dry_run:
+        if not keep_originals:
+            for name in moved:
+                storage.delete(name)
+        rebuild_file_references(using)
+    return stats
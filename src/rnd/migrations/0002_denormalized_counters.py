@@ -0,0 +1,60 @@
+# Generated by Django 5.0 on 2026-10-16 20:12
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by().values(field).annotate(total=Count('pk')).values('total')
+        ),
+        0,
+    )
+
+
+def fill_counters(apps, schema_editor):
+    db = schema_editor.connection.alias
+    Contract = apps.get_model('rnd', 'Contract')
+    ContractType = apps.get_model('rnd', 'ContractType')
+    RnD = apps.get_model('rnd', 'RnD')
+    RnDType = apps.get_model('rnd', 'RnDType')
+
+    contracts = Contract.objects.using(db)
+    ContractType.objects.using(db).update(contracts_count=count_subquery(contracts, 'type'))
+    RnDType.objects.using(db).update(rnd_count=count_subquery(RnD.objects.using(db), 'type'))
+    contracts.update(supplementary_count=count_subquery(
+        contracts.filter(type__is_supplementary=True), 'main_contract'
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rnd', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contract',
+            name='supplementary_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Количество дополнительных соглашений к договору (обновляется автоматически)', verbose_name='Доп. соглашений'),
+        ),
+        migrations.AddField(
+            model_name='contracttype',
+            name='contracts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Количество договоров данного типа (обновляется автоматически)', verbose_name='Документов'),
+        ),
+        migrations.AddField(
+            model_name='rndtype',
+            name='rnd_count',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Количество НИОКР данного типа (обновляется автоматически)', verbose_name='НИОКР'),
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['supplementary_count'], name='rnd_contrac_supplem_258628_idx'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
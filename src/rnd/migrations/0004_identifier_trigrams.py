@@ -0,0 +1,48 @@
+# Generated by Django 5.0 on 2026-10-16 20:17
+
+from django.db import migrations, models
+
+
+def fill_identifier_index(apps, schema_editor):
+    from rnd.identifiers import rebuild_identifier_index
+    rebuild_identifier_index(using=schema_editor.connection.alias, apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rnd', '0003_fulltext_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='contract',
+            name='number_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Номер без регистра, пробелов и знаков препинания (обновляется автоматически)', max_length=255, verbose_name='Номер для поиска'),
+        ),
+        migrations.AddField(
+            model_name='rnd',
+            name='code_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Шифр без регистра, пробелов и знаков препинания (обновляется автоматически)', max_length=100, verbose_name='Шифр для поиска'),
+        ),
+        migrations.AddField(
+            model_name='rnd',
+            name='uuid_normalized',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='UUID без регистра и разделителей (обновляется автоматически)', max_length=100, verbose_name='UUID для поиска'),
+        ),
+        migrations.CreateModel(
+            name='IdentifierTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(help_text='Модель и поле, например contract.number', max_length=30, verbose_name='Идентификатор')),
+                ('object_id', models.BigIntegerField(verbose_name='ID записи')),
+                ('trigram', models.CharField(max_length=3, verbose_name='Триграмма')),
+            ],
+            options={
+                'verbose_name': 'Триграмма идентификатора',
+                'verbose_name_plural': 'Триграммы идентификаторов',
+                'indexes': [models.Index(fields=['kind', 'trigram'], name='rnd_identif_kind_33eca9_idx'), models.Index(fields=['kind', 'object_id'], name='rnd_identif_kind_e3e02c_idx')],
+            },
+        ),
+        migrations.RunPython(fill_identifier_index, migrations.RunPython.noop),
+    ]
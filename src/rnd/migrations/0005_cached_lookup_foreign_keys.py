@@ -0,0 +1,33 @@
+# Generated by Django 5.0 on 2026-10-16 20:20
+
+import django.db.models.deletion
+import rnd.lookups
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rnd', '0004_identifier_trigrams'),
+    ]
+
+    # Столбцы не меняются, только класс поля: без пересоздания таблиц
+    operations = [
+        migrations.SeparateDatabaseAndState(state_operations=[
+            migrations.AlterField(
+                model_name='contract',
+                name='type',
+                field=rnd.lookups.CachedForeignKey(help_text='Тип договора (договор, доп. соглашение и т.д.)', on_delete=django.db.models.deletion.PROTECT, related_name='contracts', to='rnd.contracttype', verbose_name='Тип договора'),
+            ),
+            migrations.AlterField(
+                model_name='contracttype',
+                name='parent_type',
+                field=rnd.lookups.CachedForeignKey(blank=True, help_text='Для доп. соглашений укажите тип основного договора', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='child_types', to='rnd.contracttype', verbose_name='Родительский тип договора'),
+            ),
+            migrations.AlterField(
+                model_name='rnd',
+                name='type',
+                field=rnd.lookups.CachedForeignKey(help_text='Тип научно-исследовательских работ', on_delete=django.db.models.deletion.PROTECT, to='rnd.rndtype', verbose_name='Тип работ'),
+            ),
+        ]),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.0 on 2026-10-16 20:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rnd', '0005_cached_lookup_foreign_keys'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['-signed_date', 'number'], name='rnd_contrac_signed__fb6d3c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='technicalspecification',
+            index=models.Index(fields=['rnd', '-is_active', '-version'], name='rnd_technic_rnd_id_bb58ea_idx'),
+        ),
+    ]
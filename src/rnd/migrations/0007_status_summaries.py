@@ -0,0 +1,50 @@
+# Generated by Django 5.0 on 2026-10-16 20:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def fill_summaries(apps, schema_editor):
+    from rnd.summaries import rebuild_summaries
+    rebuild_summaries(using=schema_editor.connection.alias, apps=apps)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rnd', '0006_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContractStatusSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('active', 'Действующий'), ('suspended', 'Приостановлен'), ('completed', 'Завершен'), ('terminated', 'Расторгнут')], max_length=20, verbose_name='Статус договора')),
+                ('signed_month', models.DateField(help_text='Первое число месяца', verbose_name='Месяц подписания')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Договоров')),
+                ('contract_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rnd.contracttype', verbose_name='Тип договора')),
+            ],
+            options={
+                'verbose_name': 'Сводка договоров по статусам',
+                'verbose_name_plural': 'Сводки договоров по статусам',
+                'unique_together': {('status', 'contract_type', 'signed_month')},
+            },
+        ),
+        migrations.CreateModel(
+            name='RnDStatusSummary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('in_progress', 'В работе'), ('suspended', 'Приостановлена'), ('completed', 'Завершена'), ('contract_terminated', 'Контракт расторгнут')], max_length=20, verbose_name='Статус НИОКР')),
+                ('contract_status', models.CharField(choices=[('active', 'Действующий'), ('suspended', 'Приостановлен'), ('completed', 'Завершен'), ('terminated', 'Расторгнут')], max_length=20, verbose_name='Статус договора')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='НИОКР')),
+                ('rnd_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='rnd.rndtype', verbose_name='Тип работ')),
+            ],
+            options={
+                'verbose_name': 'Сводка НИОКР по статусам',
+                'verbose_name_plural': 'Сводки НИОКР по статусам',
+                'unique_together': {('status', 'rnd_type', 'contract_status')},
+            },
+        ),
+        migrations.RunPython(fill_summaries, migrations.RunPython.noop),
+    ]
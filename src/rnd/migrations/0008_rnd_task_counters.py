@@ -0,0 +1,48 @@
+# Generated by Django 5.0 on 2026-10-16 20:31
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by().values(field).annotate(total=Count('pk')).values('total')
+        ),
+        0,
+    )
+
+
+def fill_task_counters(apps, schema_editor):
+    db = schema_editor.connection.alias
+    RnD = apps.get_model('rnd', 'RnD')
+    RnDTask = apps.get_model('rnd', 'RnDTask')
+
+    tasks = RnDTask.objects.using(db)
+    RnD.objects.using(db).update(
+        tasks_total=count_subquery(tasks, 'rnd'),
+        tasks_done=count_subquery(tasks.filter(is_completed=True), 'rnd'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rnd', '0007_status_summaries'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rnd',
+            name='tasks_done',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Количество выполненных задач НИОКР (обновляется автоматически)', verbose_name='Выполнено задач'),
+        ),
+        migrations.AddField(
+            model_name='rnd',
+            name='tasks_total',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Количество задач НИОКР (обновляется автоматически)', verbose_name='Задач'),
+        ),
+        migrations.RunPython(fill_task_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.0 on 2026-10-16 20:52
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def keep_last_active(apps, schema_editor):
+    # Из нескольких актуальных версий ТЗ остается загруженная последней
+    TechnicalSpecification = apps.get_model('rnd', 'TechnicalSpecification')
+    active = TechnicalSpecification.objects.using(schema_editor.connection.alias).filter(is_active=True)
+    last = active.order_by().values('rnd').annotate(last=Max('pk')).values('last')
+    active.exclude(pk__in=last).update(is_active=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rnd', '0008_rnd_task_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(keep_last_active, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='technicalspecification',
+            constraint=models.UniqueConstraint(condition=models.Q(('is_active', True)), fields=('rnd',), name='rnd_ts_single_active'),
+        ),
+    ]
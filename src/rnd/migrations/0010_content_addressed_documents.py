@@ -0,0 +1,41 @@
+# Generated by Django 5.0 on 2026-10-16 20:56
+
+import rnd.models
+import rnd.storage
+import rnd.utils
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rnd', '0009_single_active_specification'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contract',
+            name='document',
+            field=models.FileField(blank=True, help_text='Отсканированная копия договора', max_length=500, null=True, storage=rnd.storage.document_storage, upload_to=rnd.utils.UploadPathFactory.for_contract_document, verbose_name='Скан договора'),
+        ),
+        migrations.AlterField(
+            model_name='technicalspecification',
+            name='document',
+            field=models.FileField(help_text='Отсканированное техническое задание в формате PDF', storage=rnd.storage.document_storage, upload_to=rnd.models.TechnicalSpecification.get_upload_path, verbose_name='Файл ТЗ'),
+        ),
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=500, unique=True, verbose_name='Имя в хранилище')),
+                ('size', models.BigIntegerField(default=0, verbose_name='Размер, байт')),
+                ('references', models.PositiveIntegerField(default=0, help_text='Число документов, ссылающихся на файл', verbose_name='Ссылок')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Файл хранилища',
+                'verbose_name_plural': 'Файлы хранилища',
+                'indexes': [models.Index(fields=['references'], name='rnd_storedf_referen_f6063f_idx')],
+            },
+        ),
+    ]
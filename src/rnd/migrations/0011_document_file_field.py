@@ -0,0 +1,24 @@
+# Generated by Django 5.0 on 2026-10-16 21:15
+
+import rnd.storage
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rnd', '0010_content_addressed_documents'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='contract',
+            name='document',
+            field=rnd.storage.DocumentFileField(blank=True, help_text='Отсканированная копия договора', max_length=500, null=True, storage=rnd.storage.document_storage, upload_to='', verbose_name='Скан договора'),
+        ),
+        migrations.AlterField(
+            model_name='technicalspecification',
+            name='document',
+            field=rnd.storage.DocumentFileField(help_text='Отсканированное техническое задание в формате PDF', storage=rnd.storage.document_storage, upload_to='', verbose_name='Файл ТЗ'),
+        ),
+    ]
@@ -0,0 +1,90 @@
+from django.db.models.fields.files import FieldFile
+
+
+class FieldTrackerMixin:
+    """
+    Отслеживание изменений полей модели.
+    Запоминает значения полей при загрузке из базы, сообщает об изменениях
+    через changed_fields и сужает save() до измененных полей.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._original_values = {
+            name: instance._tracked_value(name) for name in field_names
+        }
+        return instance
+
+    def _tracked_value(self, attname):
+        value = self.__dict__.get(attname)
+        if isinstance(value, FieldFile):
+            return value.name
+        return value
+
+    def _remember_values(self, attnames=None):
+        """Обновляет сохраненные значения указанных (или всех загруженных) полей."""
+        original = self.__dict__.setdefault('_original_values', {})
+        if attnames is None:
+            attnames = [f.attname for f in self._meta.concrete_fields]
+        for attname in attnames:
+            if attname in self.__dict__:
+                original[attname] = self._tracked_value(attname)
+
+    @property
+    def changed_fields(self):
+        """Имена полей, значения которых отличаются от загруженных из базы."""
+        original = self.__dict__.get('_original_values')
+        changed = set()
+        for field in self._meta.concrete_fields:
+            if field.primary_key or field.attname not in self.__dict__:
+                continue
+            if original is None or field.attname not in original:
+                changed.add(field.name)
+                continue
+            value = self.__dict__[field.attname]
+            if isinstance(value, FieldFile):
+                if not value._committed or value.name != original[field.attname]:
+                    changed.add(field.name)
+            elif value != original[field.attname]:
+                changed.add(field.name)
+        return changed
+
+    def has_changed(self, field_name):
+        """Изменилось ли поле с момента загрузки из базы."""
+        return field_name in self.changed_fields
+
+    def get_original_value(self, field_name):
+        """Значение поля на момент загрузки из базы."""
+        attname = self._meta.get_field(field_name).attname
+        return self.__dict__.get('_original_values', {}).get(attname)
+
+    def save(self, *args, **kwargs):
+        if (
+            not args
+            and not self._state.adding
+            and not kwargs.get('force_insert')
+            and kwargs.get('update_fields') is None
+            and '_original_values' in self.__dict__
+        ):
+            changed = self.changed_fields
+            if changed:
+                changed.update(
+                    f.name for f in self._meta.concrete_fields if getattr(f, 'auto_now', False)
+                )
+            kwargs['update_fields'] = changed
+
+        super().save(*args, **kwargs)
+
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            self._remember_values()
+        else:
+            self._remember_values([self._meta.get_field(name).attname for name in update_fields])
+
+    def refresh_from_db(self, using=None, fields=None, **kwargs):
+        super().refresh_from_db(using=using, fields=fields, **kwargs)
+        if fields is None:
+            self._remember_values()
+        else:
+            self._remember_values([self._meta.get_field(name).attname for name in fields])
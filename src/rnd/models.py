@@ -1,10 +1,25 @@
 """
 Модели приложения.
 """
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.core.exceptions import ValidationError
-from .utils import UploadPathFactory
+from .lookups import CachedForeignKey
+from .managers import ContractManager, RnDManager, RnDTaskManager, TechnicalSpecificationManager
+from .mixins import FieldTrackerMixin
+from .storage import DocumentFileField, document_storage
+from .utils import UploadPathFactory, normalize_identifier
+
+
+# Соответствие статуса договора статусу НИОКР
+RND_STATUS_BY_CONTRACT_STATUS = {
+    'active': 'in_progress',
+    'suspended': 'suspended',
+    'completed': 'completed',
+    'terminated': 'contract_terminated',
+}
 
 
 class ContractType(models.Model):
@@ -31,7 +46,7 @@ class ContractType(models.Model):
         help_text=_('Отметьте для типов, которые являются дополнительными соглашениями')
     )
     
-    parent_type = models.ForeignKey(
+    parent_type = CachedForeignKey(
         'self',
         on_delete=models.SET_NULL,
         null=True,
@@ -48,6 +63,13 @@ class ContractType(models.Model):
         help_text=_('Подробное описание типа договора')
     )
     
+    contracts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_('Документов'),
+        help_text=_('Количество договоров данного типа (обновляется автоматически)')
+    )
+    
     def __str__(self):
         return self.name
     
@@ -82,7 +104,7 @@ class ContractType(models.Model):
         ]
 
 
-class Contract(models.Model):
+class Contract(FieldTrackerMixin, models.Model):
     """
     Контракт или связанный договор.
     Может быть основным договором или дополнительным соглашением.
@@ -115,7 +137,7 @@ class Contract(models.Model):
         help_text=_('Основной договор, к которому относится данный договор')
     )
     
-    type = models.ForeignKey(
+    type = CachedForeignKey(
         ContractType,
         on_delete=models.PROTECT,
         related_name='contracts',
@@ -130,6 +152,15 @@ class Contract(models.Model):
         help_text=_('Уникальный номер договора')
     )
     
+    number_normalized = models.CharField(
+        max_length=255,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name=_('Номер для поиска'),
+        help_text=_('Номер без регистра, пробелов и знаков препинания (обновляется автоматически)')
+    )
+    
     name = models.CharField(
         max_length=500,
         verbose_name=_('Наименование договора'),
@@ -156,8 +187,8 @@ class Contract(models.Model):
         help_text=_('Текущий статус договора')
     )
     
-    document = models.FileField(
-        upload_to=UploadPathFactory.for_contract_document,
+    document = DocumentFileField(
+        storage=document_storage,
         blank=True,
         null=True,
         max_length=500,
@@ -172,9 +203,18 @@ class Contract(models.Model):
         help_text=_('Описание договора или внесенных изменений')
     )
     
+    supplementary_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_('Доп. соглашений'),
+        help_text=_('Количество дополнительных соглашений к договору (обновляется автоматически)')
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = ContractManager()
+    
     def __str__(self):
         if self.type.is_supplementary:
             return f"ДС {self.number} к {self.main_contract.number}"
@@ -204,7 +244,7 @@ class Contract(models.Model):
                     )
                 })
         else:
-            if self.main_contract and self.main_contract.id and self.main_contract.id != self.id:
+            if self.main_contract_id and self.main_contract_id != self.id:
                 raise ValidationError({
                     'main_contract': _('Основной договор не может ссылаться на другой договор')
                 })
@@ -216,16 +256,76 @@ class Contract(models.Model):
     
     def save(self, *args, **kwargs):
         self.full_clean()
-        is_new = self.pk is None
+        self.number_normalized = normalize_identifier(self.number)
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        # Счетчики обновляются сигналами в той же транзакции
+        with transaction.atomic(using=using, savepoint=False):
+            self._save_contract(using, args, kwargs)
+    
+    def _save_contract(self, using, args, kwargs):
+        if not self.type.is_supplementary and self.pk is not None:
+            # Основной договор всегда ссылается сам на себя
+            self.main_contract_id = self.pk
+        super().save(*args, **kwargs)
+    
+    def _save_table(self, raw=False, cls=None, force_insert=False, force_update=False, using=None,
+                    update_fields=None):
+        if raw or self.pk is not None or self.main_contract_id is not None or self.type.is_supplementary:
+            return super()._save_table(raw, cls, force_insert, force_update, using, update_fields)
         
-        if not self.type.is_supplementary and is_new:
-            main_contract = self.main_contract
-            self.main_contract = None
-            super().save(*args, **kwargs)
-            self.main_contract = self
-            super().save(update_fields=['main_contract'])
+        expressions = self._self_reference_expressions(using)
+        if expressions is None:
+            updated = super()._save_table(raw, cls, force_insert, force_update, using, update_fields)
+            # Ключ нового основного договора известен только после INSERT:
+            # ссылка на себя - одним UPDATE до отправки post_save
+            Contract._base_manager.using(using).filter(pk=self.pk).update(main_contract=self.pk)
         else:
-            super().save(*args, **kwargs)
+            # Ссылка на себя вычисляется в том же INSERT
+            pk_expression, self.main_contract_id = expressions
+            if pk_expression is not None:
+                self.pk = pk_expression
+            try:
+                updated = super()._save_table(raw, cls, True, force_update, using, update_fields)
+            except Exception:
+                self.pk = None
+                self.main_contract_id = None
+                raise
+        self.main_contract_id = self.pk
+        self._remember_values(['main_contract_id'])
+        return updated
+    
+    def _self_reference_expressions(self, using):
+        """
+        SQL-выражения (первичный ключ или None, ссылка на себя), которые
+        вычисляют ключ вставляемой строки в самом INSERT. Для других СУБД
+        возвращает None.
+        """
+        table = self._meta.db_table
+        pk_column = self._meta.pk.column
+        connection = connections[using]
+        quote = connection.ops.quote_name
+        
+        if connection.vendor == 'sqlite':
+            # AUTOINCREMENT: следующий ключ больше любого ранее выданного.
+            # Подзапрос выполняется внутри INSERT, а пишущая транзакция в
+            # SQLite одна, поэтому значение совпадает с ключом строки
+            return None, RawSQL(
+                f'SELECT MAX('
+                f'COALESCE((SELECT seq FROM sqlite_sequence WHERE name = %s), 0), '
+                f'COALESCE((SELECT MAX({quote(pk_column)}) FROM {quote(table)}), 0)'
+                f') + 1',
+                (table,),
+                output_field=models.BigIntegerField(),
+            )
+        if connection.vendor == 'postgresql':
+            # Ключ берется из последовательности явно, а не значением по
+            # умолчанию: currval в той же строке VALUES возвращает его же
+            sequence = (quote(table), pk_column)
+            return (
+                RawSQL('nextval(pg_get_serial_sequence(%s, %s))', sequence, output_field=models.BigIntegerField()),
+                RawSQL('currval(pg_get_serial_sequence(%s, %s))', sequence, output_field=models.BigIntegerField()),
+            )
+        return None
     
     @property
     def is_supplementary(self):
@@ -260,6 +360,9 @@ class Contract(models.Model):
             models.Index(fields=['type']),
             models.Index(fields=['status']),
             models.Index(fields=['main_contract']),
+            models.Index(fields=['supplementary_count']),
+            # Keyset-пагинация в порядке Meta.ordering
+            models.Index(fields=['-signed_date', 'number']),
         ]
 
 
@@ -287,6 +390,13 @@ class RnDType(models.Model):
         help_text=_('Подробное описание типа работ')
     )
     
+    rnd_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_('НИОКР'),
+        help_text=_('Количество НИОКР данного типа (обновляется автоматически)')
+    )
+    
     def __str__(self):
         return self.short_name
     
@@ -297,7 +407,7 @@ class RnDType(models.Model):
         indexes = [models.Index(fields=['name'])]
 
 
-class RnD(models.Model):
+class RnD(FieldTrackerMixin, models.Model):
     """
     Научно-исследовательская или опытно-конструкторская работа.
     Статус НИОКР автоматически синхронизируется со статусом договора.
@@ -318,7 +428,7 @@ class RnD(models.Model):
         help_text=_('Основной договор, по которому ведется НИОКР')
     )
     
-    type = models.ForeignKey(
+    type = CachedForeignKey(
         RnDType,
         on_delete=models.PROTECT,
         verbose_name=_('Тип работ'),
@@ -339,6 +449,24 @@ class RnD(models.Model):
         help_text=_('Уникальный шифр работы согласно контракту')
     )
     
+    uuid_normalized = models.CharField(
+        max_length=100,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name=_('UUID для поиска'),
+        help_text=_('UUID без регистра и разделителей (обновляется автоматически)')
+    )
+    
+    code_normalized = models.CharField(
+        max_length=100,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name=_('Шифр для поиска'),
+        help_text=_('Шифр без регистра, пробелов и знаков препинания (обновляется автоматически)')
+    )
+    
     title = models.CharField(
         max_length=500,
         verbose_name=_('Тема работы'),
@@ -370,9 +498,25 @@ class RnD(models.Model):
         help_text=_('Статус договора на момент последней синхронизации')
     )
     
+    tasks_total = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_('Задач'),
+        help_text=_('Количество задач НИОКР (обновляется автоматически)')
+    )
+    
+    tasks_done = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_('Выполнено задач'),
+        help_text=_('Количество выполненных задач НИОКР (обновляется автоматически)')
+    )
+    
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = RnDManager()
+    
     def __str__(self):
         return f"{self.code}: {self.title}"
     
@@ -399,14 +543,7 @@ class RnD(models.Model):
         if not force and self.last_contract_status == contract_status:
             return False
         
-        status_mapping = {
-            'active': 'in_progress',
-            'suspended': 'suspended',
-            'completed': 'completed',
-            'terminated': 'contract_terminated',
-        }
-        
-        new_status = status_mapping.get(contract_status, 'in_progress')
+        new_status = RND_STATUS_BY_CONTRACT_STATUS.get(contract_status, 'in_progress')
         
         if self.status != new_status or force:
             self.status = new_status
@@ -423,7 +560,11 @@ class RnD(models.Model):
         else:
             self.sync_status_with_contract(force=True)
         
-        super().save(*args, **kwargs)
+        self.uuid_normalized = normalize_identifier(self.uuid)
+        self.code_normalized = normalize_identifier(self.code)
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
     
     @property
     def contract_number(self):
@@ -453,13 +594,13 @@ class RnD(models.Model):
         ]
 
 
-class TechnicalSpecification(models.Model):
+class TechnicalSpecification(FieldTrackerMixin, models.Model):
     """
     Техническое задание (файл ТЗ) с привязкой к договору.
     """
     
     def get_upload_path(self, filename):
-        """Генерирует короткий путь для загрузки файла ТЗ."""
+        """Короткий путь файла ТЗ до хранилища по содержимому (нужен миграциям)."""
         return UploadPathFactory.for_technical_specification(self, filename)
     
     rnd = models.ForeignKey(
@@ -478,8 +619,8 @@ class TechnicalSpecification(models.Model):
         help_text=_('Договор, которым утверждено ТЗ (договор или доп. соглашение)')
     )
     
-    document = models.FileField(
-        upload_to=get_upload_path,
+    document = DocumentFileField(
+        storage=document_storage,
         verbose_name=_('Файл ТЗ'),
         help_text=_('Отсканированное техническое задание в формате PDF')
     )
@@ -506,6 +647,8 @@ class TechnicalSpecification(models.Model):
     
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
+    objects = TechnicalSpecificationManager()
+    
     def __str__(self):
         return f"ТЗ вер.{self.version} для {self.rnd.code}"
     
@@ -524,16 +667,42 @@ class TechnicalSpecification(models.Model):
                             'к тому же основному договору, что и НИОКР'
                         )
                     })
-        
-        if self.is_active and self.rnd:
-            TechnicalSpecification.objects.filter(
-                rnd=self.rnd,
-                is_active=True
-            ).exclude(id=self.id).update(is_active=False)
+    
+    def validate_constraints(self, exclude=None):
+        # Единственность актуальной версии не проверяется при валидации:
+        # save() снимает прежнюю актуальную версию в той же транзакции
+        super().validate_constraints(exclude={*(exclude or ()), 'is_active'})
     
     def save(self, *args, **kwargs):
         self.full_clean()
-        super().save(*args, **kwargs)
+        if not self.is_active or not (self._state.adding or self.has_changed('is_active')):
+            super().save(*args, **kwargs)
+            return
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            self._release_active(using)
+            super().save(*args, **kwargs)
+    
+    def activate(self, using=None):
+        """
+        Делает версию актуальной, прежняя актуальная версия НИОКР снимается
+        в той же транзакции.
+        """
+        using = using or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            self._release_active(using)
+            type(self)._base_manager.using(using).filter(pk=self.pk).update(is_active=True)
+        self.is_active = True
+        self._remember_values(['is_active'])
+    
+    def _release_active(self, using):
+        # Строка НИОКР блокируется, и параллельные переключения идут по
+        # очереди; в SQLite пишущие транзакции и так последовательны
+        if connections[using].features.has_select_for_update:
+            list(RnD._base_manager.using(using).select_for_update().filter(pk=self.rnd_id).values_list('pk'))
+        type(self)._base_manager.using(using).filter(
+            rnd_id=self.rnd_id, is_active=True
+        ).exclude(pk=self.pk).update(is_active=False)
     
     @property
     def display_name(self):
@@ -577,11 +746,19 @@ class TechnicalSpecification(models.Model):
         ordering = ['rnd', '-is_active', '-version']
         indexes = [
             models.Index(fields=['rnd', 'is_active']),
+            models.Index(fields=['rnd', '-is_active', '-version']),
             models.Index(fields=['contract_document']),
         ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['rnd'],
+                condition=models.Q(is_active=True),
+                name='rnd_ts_single_active',
+            ),
+        ]
 
 
-class RnDTask(models.Model):
+class RnDTask(FieldTrackerMixin, models.Model):
     """
     Задача в рамках НИОКР.
     """
@@ -624,6 +801,8 @@ class RnDTask(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = RnDTaskManager()
+    
     def __str__(self):
         return f"Задача {self.order}: {self.description[:50]}..."
     
@@ -646,29 +825,170 @@ class RnDTask(models.Model):
         indexes = [models.Index(fields=['rnd', 'is_completed'])]
 
 
-# Функция для обновления статусов НИОКР
-def update_all_rnd_statuses_for_contract(contract_id):
+class IdentifierTrigram(models.Model):
     """
-    Вспомогательная функция для принудительного обновления статусов НИОКР.
-    Может быть использована в админке или через команду.
+    Триграммы нормализованных идентификаторов для нечеткого поиска.
+    Заполняется автоматически, см. rnd.identifiers.
     """
-    try:
-        contract = Contract.objects.get(pk=contract_id, is_main_contract=True)
-        
-        status_mapping = {
-            'active': 'in_progress',
-            'suspended': 'suspended',
-            'completed': 'completed',
-            'terminated': 'contract_terminated',
-        }
-        
-        new_status = status_mapping.get(contract.status, 'in_progress')
-        
-        updated_count = RnD.objects.filter(contract=contract).update(
+    
+    kind = models.CharField(
+        max_length=30,
+        verbose_name=_('Идентификатор'),
+        help_text=_('Модель и поле, например contract.number')
+    )
+    
+    object_id = models.BigIntegerField(verbose_name=_('ID записи'))
+    
+    trigram = models.CharField(max_length=3, verbose_name=_('Триграмма'))
+    
+    def __str__(self):
+        return f"{self.kind}#{self.object_id}: {self.trigram}"
+    
+    class Meta:
+        verbose_name = _('Триграмма идентификатора')
+        verbose_name_plural = _('Триграммы идентификаторов')
+        indexes = [
+            models.Index(fields=['kind', 'trigram']),
+            models.Index(fields=['kind', 'object_id']),
+        ]
+
+
+class RnDStatusSummary(models.Model):
+    """
+    Число НИОКР по статусу, типу работ и статусу договора.
+    Обновляется автоматически, см. rnd.summaries.
+    """
+    
+    status = models.CharField(max_length=20, choices=RnD.STATUS_CHOICES, verbose_name=_('Статус НИОКР'))
+    
+    rnd_type = models.ForeignKey(
+        RnDType,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('Тип работ')
+    )
+    
+    contract_status = models.CharField(
+        max_length=20,
+        choices=Contract.CONTRACT_STATUS_CHOICES,
+        verbose_name=_('Статус договора')
+    )
+    
+    count = models.PositiveIntegerField(default=0, verbose_name=_('НИОКР'))
+    
+    def __str__(self):
+        return f"{self.status} / {self.rnd_type_id} / {self.contract_status}: {self.count}"
+    
+    class Meta:
+        verbose_name = _('Сводка НИОКР по статусам')
+        verbose_name_plural = _('Сводки НИОКР по статусам')
+        unique_together = [['status', 'rnd_type', 'contract_status']]
+
+
+class ContractStatusSummary(models.Model):
+    """
+    Число договоров по статусу, типу и месяцу подписания.
+    Обновляется автоматически, см. rnd.summaries.
+    """
+    
+    status = models.CharField(
+        max_length=20,
+        choices=Contract.CONTRACT_STATUS_CHOICES,
+        verbose_name=_('Статус договора')
+    )
+    
+    contract_type = models.ForeignKey(
+        ContractType,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name=_('Тип договора')
+    )
+    
+    signed_month = models.DateField(verbose_name=_('Месяц подписания'), help_text=_('Первое число месяца'))
+    
+    count = models.PositiveIntegerField(default=0, verbose_name=_('Договоров'))
+    
+    def __str__(self):
+        return f"{self.status} / {self.contract_type_id} / {self.signed_month:%m.%Y}: {self.count}"
+    
+    class Meta:
+        verbose_name = _('Сводка договоров по статусам')
+        verbose_name_plural = _('Сводки договоров по статусам')
+        unique_together = [['status', 'contract_type', 'signed_month']]
+
+
+class StoredFile(models.Model):
+    """
+    Файл хранилища документов и число ссылок на него.
+    Обновляется автоматически, см. rnd.media.
+    """
+    
+    name = models.CharField(max_length=500, unique=True, verbose_name=_('Имя в хранилище'))
+    
+    size = models.BigIntegerField(default=0, verbose_name=_('Размер, байт'))
+    
+    references = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('Ссылок'),
+        help_text=_('Число документов, ссылающихся на файл')
+    )
+    
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    def __str__(self):
+        return f"{self.name} ({self.references})"
+    
+    class Meta:
+        verbose_name = _('Файл хранилища')
+        verbose_name_plural = _('Файлы хранилища')
+        indexes = [models.Index(fields=['references'])]
+
+
+def propagate_contract_statuses(contracts=None, using=None):
+    """
+    Переносит статусы договоров на их НИОКР set-based запросами
+    вида UPDATE ... WHERE status <> новый_статус.
+    
+    contracts: договор, его pk, список договоров/pk, QuerySet договоров
+    или None (вся база). Возвращает словарь {статус договора: обновлено НИОКР}.
+    Сводка статусов НИОКР изменяется на число перенесенных строк.
+    """
+    using = using or router.db_for_write(RnD)
+    rnds = RnD._base_manager.using(using)
+    
+    if isinstance(contracts, Contract):
+        # Статус известен: один UPDATE без соединения с договорами
+        groups = [(contracts.status, rnds.filter(contract_id=contracts.pk))]
+    else:
+        if contracts is None:
+            base = rnds.all()
+        elif isinstance(contracts, models.QuerySet):
+            base = rnds.filter(contract__in=contracts.values('pk'))
+        elif isinstance(contracts, (int, str)):
+            base = rnds.filter(contract_id=contracts)
+        else:
+            base = rnds.filter(contract_id__in=[getattr(c, 'pk', c) for c in contracts])
+        groups = [
+            (contract_status, base.filter(contract__status=contract_status))
+            for contract_status in RND_STATUS_BY_CONTRACT_STATUS
+        ]
+    
+    from .summaries import rnd_status_groups, rnd_statuses_changed
+    
+    now = timezone.now()
+    result = {}
+    for contract_status, queryset in groups:
+        new_status = RND_STATUS_BY_CONTRACT_STATUS.get(contract_status, 'in_progress')
+        queryset = queryset.exclude(status=new_status)
+        # Сводка статусов обновляется по группам изменяемых строк
+        moved = rnd_status_groups(queryset)
+        if not moved:
+            result[contract_status] = 0
+            continue
+        result[contract_status] = queryset.update(
             status=new_status,
-            last_contract_status=contract.status
+            last_contract_status=contract_status,
+            updated_at=now,
         )
-        
-        return updated_count
-    except Contract.DoesNotExist:
-        return 0
\ No newline at end of file
+        rnd_statuses_changed(moved, new_status, contract_status, using)
+    return result
@@ -0,0 +1,230 @@
+"""
+Постраничный вывод больших списков.
+
+ApproximateCountPaginator ограничивает стоимость COUNT(*): точный подсчет
+до порога, выше - оценка СУБД или значение из кэша.
+
+KeysetPaginator выбирает страницу условием по ключам сортировки
+(WHERE (ключи) > (ключи последней строки)) вместо OFFSET, поэтому любая
+страница стоит столько же, сколько первая. Ключи берутся из Meta.ordering,
+внешние ключи сортируются по столбцу (rnd -> rnd_id), для однозначности
+при необходимости добавляется pk.
+"""
+import base64
+import binascii
+import datetime
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.core.paginator import InvalidPage, Paginator
+from django.db import DatabaseError, connections
+from django.db.models import Q, QuerySet
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(InvalidPage):
+    """Поврежденный или устаревший курсор страницы."""
+
+
+def estimate_count(queryset):
+    """
+    Оценка числа строк нефильтрованной таблицы по статистике СУБД
+    или None, если оценка недоступна.
+    """
+    query = queryset.query
+    if query.where or query.distinct or query.combinator or len(query.alias_map) > 1:
+        return None
+    connection = connections[queryset.db]
+    table = queryset.model._meta.db_table
+    try:
+        with connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [table])
+                row = cursor.fetchone()
+                return int(row[0]) if row and row[0] >= 0 else None
+            if connection.vendor == 'sqlite':
+                # Заполняется командой ANALYZE; первое число - строк в таблице
+                cursor.execute('SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1', [table])
+                row = cursor.fetchone()
+                return int(row[0].split()[0]) if row else None
+    except DatabaseError:
+        return None
+    return None
+
+
+def cached_count(queryset, timeout):
+    """Точный COUNT(*), сохраненный в кэше на timeout секунд."""
+    sql, params = queryset.query.get_compiler(queryset.db).as_sql()
+    digest = hashlib.md5(repr((queryset.db, sql, params)).encode()).hexdigest()
+    return cache.get_or_set(f'rnd:count:{digest}', queryset.count, timeout)
+
+
+class ApproximateCountPaginator(Paginator):
+    """
+    Paginator с ограниченной стоимостью подсчета строк.
+    До threshold строк считает точно (COUNT по подзапросу с LIMIT),
+    выше - берет оценку СУБД для нефильтрованной таблицы или точное
+    значение из кэша, которое пересчитывается не чаще cache_timeout.
+    """
+
+    threshold = 10000
+    cache_timeout = 300
+    is_approximate = False
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not isinstance(queryset, QuerySet):
+            return super().count
+        queryset = queryset.order_by()
+        bounded = queryset[:self.threshold + 1].count()
+        if bounded <= self.threshold:
+            return bounded
+        self.is_approximate = True
+        estimate = estimate_count(queryset)
+        if estimate is not None:
+            return max(estimate, bounded)
+        return cached_count(queryset, self.cache_timeout)
+
+
+def keyset_ordering(model, ordering=None):
+    """
+    Ключи сортировки [(attname, по убыванию)] для keyset-пагинации.
+    Обрываются на уникальном наборе полей, иначе дополняются pk.
+    """
+    opts = model._meta
+    unique_sets = [set(fields) for fields in opts.unique_together]
+    unique_sets += [
+        set(constraint.fields) for constraint in opts.total_unique_constraints
+    ]
+    keys = []
+    names = set()
+    for name in ordering or opts.ordering:
+        if not isinstance(name, str) or name.lstrip('-') in ('?', ''):
+            raise ImproperlyConfigured(f'Сортировка {name!r} не подходит для keyset-пагинации')
+        field = opts.get_field(name.lstrip('-'))
+        if field.null:
+            raise ImproperlyConfigured(
+                f'Поле {opts.label}.{field.name} допускает NULL и не может быть ключом keyset-пагинации'
+            )
+        keys.append((field.attname, name.startswith('-')))
+        names.add(field.name)
+        if field.primary_key or field.unique or any(fields <= names for fields in unique_sets):
+            return keys
+    # По возрастанию, как rowid в конце записей индекса
+    keys.append((opts.pk.attname, False))
+    return keys
+
+
+class KeysetPage:
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+class KeysetPaginator:
+    """
+    Постраничный вывод по курсору. Строки queryset могут быть объектами
+    или словарями values() - во втором случае ключи должны входить в values().
+    """
+
+    def __init__(self, queryset, per_page, ordering=None):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.keys = keyset_ordering(queryset.model, ordering)
+        self.fields = {f.attname: f for f in queryset.model._meta.concrete_fields}
+
+    def order_by(self, reverse=False):
+        return [
+            f'-{name}' if descending != reverse else name
+            for name, descending in self.keys
+        ]
+
+    def window(self, cursor=None):
+        """
+        Строки после курсора в порядке выдачи (без ограничения числа строк):
+        (queryset, назад ли по списку, задан ли курсор).
+        """
+        backwards, values = self.decode(cursor) if cursor else (False, None)
+        queryset = self.queryset
+        if values is not None:
+            queryset = queryset.filter(self._after(values, backwards))
+        return queryset.order_by(*self.order_by(backwards)), backwards, values is not None
+
+    def page(self, cursor=None):
+        queryset, backwards, has_cursor = self.window(cursor)
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+            has_next, has_previous = has_cursor, has_more
+        else:
+            has_next, has_previous = has_more, has_cursor
+        if not rows:
+            return KeysetPage(rows)
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode(rows[-1]) if has_next else None,
+            previous_cursor=self.encode(rows[0], backwards=True) if has_previous else None,
+        )
+
+    def _after(self, values, backwards):
+        """Условие "строка после курсора" в порядке сортировки."""
+        condition = Q()
+        equal = {}
+        for (name, descending), value in zip(self.keys, values):
+            lookup = 'lt' if descending != backwards else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        # Граница по первому ключу помогает СУБД использовать индекс
+        name, descending = self.keys[0]
+        bound = Q(**{f'{name}__{"lte" if descending != backwards else "gte"}': values[0]})
+        return bound & condition
+
+    def _row_values(self, row):
+        if isinstance(row, dict):
+            return [row[name] for name, _ in self.keys]
+        return [getattr(row, name) for name, _ in self.keys]
+
+    def encode(self, row, backwards=False):
+        values = []
+        for value in self._row_values(row):
+            if isinstance(value, (datetime.date, datetime.time)):
+                value = value.isoformat()
+            elif not isinstance(value, (str, int, float, bool)):
+                value = str(value)
+            values.append(value)
+        data = json.dumps({'b': backwards, 'v': values}, ensure_ascii=False, separators=(',', ':'))
+        return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+    def decode(self, cursor):
+        try:
+            data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+            values = data['v']
+            if len(values) != len(self.keys):
+                raise ValueError
+            return bool(data['b']), [
+                self.fields[name].to_python(value)
+                for (name, _), value in zip(self.keys, values)
+            ]
+        except (ValueError, TypeError, KeyError, binascii.Error, ValidationError):
+            raise InvalidCursor('Некорректный курсор страницы')
@@ -0,0 +1,195 @@
+"""
+Поиск повторяющихся запросов (N+1) и бюджеты запросов.
+
+QueryRecorder подключается ко всем соединениям (execute_wrapper) и
+группирует запросы по форме - SQL без параметров, списки IN (...) любой
+длины считаются одной формой. Форма, выполненная repeat_threshold раз
+и больше, - признак N+1: например, __str__ договора читает main_contract
+по одному запросу на строку. Для такой формы запоминается стек вызова
+из кода проекта (без Django и библиотек), где повтор был обнаружен.
+
+QueryInspectionMiddleware - для разработки: пишет повторы в журнал
+rnd.queries и добавляет к ответу заголовок X-Query-Count. Включается
+настройкой RND_QUERY_INSPECTION.
+
+QueryBudgetMixin - для тестов: assertQueryBudget() проверяет число
+запросов и отсутствие повторов в блоке кода, assertViewQueryBudget() -
+при запросе страницы.
+"""
+import logging
+import os
+import re
+import traceback
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+
+logger = logging.getLogger('rnd.queries')
+
+# Повторов одной формы запроса, начиная с которых она считается N+1
+REPEAT_THRESHOLD = 5
+
+# Кадров стека в отчете
+STACK_LIMIT = 8
+
+_IN_LIST = re.compile(r'\bIN \((?:%s, )*%s\)', re.IGNORECASE)
+_SPACES = re.compile(r'\s+')
+_OWN_FILE = os.path.splitext(os.path.abspath(__file__))[0]
+
+
+def query_shape(sql):
+    """Форма запроса: SQL без параметров со свернутыми списками IN."""
+    return _IN_LIST.sub('IN (...)', _SPACES.sub(' ', sql.strip()))
+
+
+def project_stack(limit=STACK_LIMIT):
+    """Кадры стека из кода проекта, от ближнего к вызову запроса."""
+    base = str(settings.BASE_DIR)
+    frames = []
+    for frame in reversed(traceback.extract_stack()):
+        filename = os.path.abspath(frame.filename)
+        if (
+            not filename.startswith(base)
+            or os.path.splitext(filename)[0] == _OWN_FILE
+            or 'site-packages' in filename
+        ):
+            continue
+        frames.append(f'{os.path.relpath(filename, base)}:{frame.lineno} in {frame.name}')
+        if len(frames) == limit:
+            break
+    return frames
+
+
+class RepeatedQuery:
+    """Форма запроса, выполненная много раз, и стек ее повтора."""
+
+    def __init__(self, shape, count, stack):
+        self.shape = shape
+        self.count = count
+        self.stack = stack
+
+    def __str__(self):
+        lines = [f'{self.count} x {self.shape}']
+        lines += [f'    {frame}' for frame in self.stack]
+        return '\n'.join(lines)
+
+
+class QueryRecorder:
+    """
+    Счетчик запросов по формам во всех соединениях:
+        with QueryRecorder() as recorder:
+            ...
+        recorder.total, recorder.repeated()
+    """
+
+    def __init__(self, repeat_threshold=REPEAT_THRESHOLD, using=None):
+        self.repeat_threshold = repeat_threshold
+        self.using = using
+        self.total = 0
+        self.shapes = Counter()
+        self.stacks = {}
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        aliases = [self.using] if self.using else list(connections)
+        for alias in aliases:
+            self._stack.enter_context(connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        shape = query_shape(sql)
+        self.total += 1
+        self.shapes[shape] += 1
+        if self.shapes[shape] == self.repeat_threshold:
+            self.stacks[shape] = project_stack()
+        return execute(sql, params, many, context)
+
+    def repeated(self):
+        """Формы, повторенные не меньше repeat_threshold раз, по убыванию числа."""
+        return [
+            RepeatedQuery(shape, count, self.stacks.get(shape, []))
+            for shape, count in self.shapes.most_common()
+            if count >= self.repeat_threshold
+        ]
+
+
+class QueryInspectionMiddleware:
+    """
+    Отчет о повторяющихся запросах каждого запроса к сайту (для разработки).
+    Настройки: RND_QUERY_INSPECTION - включить, RND_QUERY_REPEAT_THRESHOLD -
+    порог повторов (по умолчанию REPEAT_THRESHOLD).
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'RND_QUERY_INSPECTION', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.repeat_threshold = getattr(settings, 'RND_QUERY_REPEAT_THRESHOLD', REPEAT_THRESHOLD)
+
+    def __call__(self, request):
+        with QueryRecorder(self.repeat_threshold) as recorder:
+            response = self.get_response(request)
+        response['X-Query-Count'] = str(recorder.total)
+        for repeated in recorder.repeated():
+            logger.warning(
+                'N+1: %s %s\n%s', request.method, request.get_full_path(), repeated,
+                extra={'request': request},
+            )
+        return response
+
+
+class QueryBudgetMixin:
+    """
+    Бюджеты запросов для TestCase. Повтор формы запроса repeat_threshold
+    раз - ошибка даже в пределах бюджета: число таких запросов растет
+    с числом строк, а бюджет проверяется на небольших данных.
+    """
+
+    repeat_threshold = REPEAT_THRESHOLD
+
+    def assertQueryBudget(self, budget, repeat_threshold=None):
+        return _BudgetContext(self, budget, repeat_threshold or self.repeat_threshold)
+
+    def assertViewQueryBudget(self, url, budget, data=None, status_code=200):
+        """GET url с проверкой бюджета; возвращает ответ."""
+        with self.assertQueryBudget(budget):
+            response = self.client.get(url, data)
+        self.assertEqual(response.status_code, status_code, url)
+        return response
+
+
+class _BudgetContext:
+
+    def __init__(self, test_case, budget, repeat_threshold):
+        self.test_case = test_case
+        self.budget = budget
+        self.recorder = QueryRecorder(repeat_threshold)
+
+    def __enter__(self):
+        return self.recorder.__enter__()
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.recorder.__exit__(exc_type, exc_value, tb)
+        if exc_type is not None:
+            return
+        repeated = self.recorder.repeated()
+        if repeated:
+            self.test_case.fail(
+                'Повторяющиеся запросы (N+1):\n' + '\n'.join(str(item) for item in repeated)
+            )
+        if self.recorder.total > self.budget:
+            shapes = '\n'.join(
+                f'{count} x {shape}' for shape, count in self.recorder.shapes.most_common()
+            )
+            self.test_case.fail(
+                f'Выполнено {self.recorder.total} запросов при бюджете {self.budget}:\n{shapes}'
+            )
@@ -0,0 +1,186 @@
+"""
+Чтение с реплики базы данных.
+
+Реплика - копия основной базы: файл SQLite, который обновляет команда
+sync_replica, или второй экземпляр PostgreSQL с потоковой репликацией.
+Алиасы реплик перечисляются в RND_READ_REPLICAS; без них все запросы
+идут в основную базу.
+
+ReplicaRouter отправляет чтение на реплику только внутри запроса, для
+которого это разрешено: ReplicaRoutingMiddleware разрешает его для GET
+списков и сводки админки и для API, выгрузка - через replica_reads().
+Сессии, пользователи и права читаются из основной базы всегда
+(PRIMARY_APP_LABELS). Запись всегда идет в основную базу. После первой записи чтение до конца
+запроса тоже идет в основную базу, а после ответа на изменяющий запрос
+(POST и т.д.) cookie закрепляет основную базу еще на
+RND_REPLICA_STICKY_SECONDS секунд: страница после сохранения видит
+записанные данные, пока реплика отстает.
+"""
+import random
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+STICKY_COOKIE = 'rnd_primary_until'
+
+# Страницы, чтение которых можно отдать реплике (имена маршрутов)
+REPLICA_URL_NAMES = re.compile(r'_changelist$|^rnd_dashboard$|^api_')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+# Приложения, которые всегда читаются из основной базы: сессия и
+# пользователь загружаются уже внутри представления, а входа, сделанного
+# после последней синхронизации, на реплике еще нет
+PRIMARY_APP_LABELS = frozenset({'sessions', 'auth', 'contenttypes', 'admin'})
+
+_state = ContextVar('rnd_routing', default=None)
+
+
+def _database(alias):
+    settings_dict = connections[alias].settings_dict
+    return tuple(settings_dict.get(key) for key in ('ENGINE', 'HOST', 'PORT', 'NAME'))
+
+
+def replica_aliases():
+    """
+    Реплики из RND_READ_REPLICAS. Реплика, указывающая на основную базу
+    (TEST MIRROR в тестах), не считается: чтение с нее - чтение основной
+    базы, но через другое соединение, не видящее текущую транзакцию.
+    """
+    aliases = getattr(settings, 'RND_READ_REPLICAS', ())
+    if not aliases:
+        return []
+    primary = _database(DEFAULT_DB_ALIAS)
+    return [alias for alias in aliases if _database(alias) != primary]
+
+
+class RoutingState:
+    """Маршрутизация в пределах одного запроса."""
+
+    def __init__(self, pinned=False):
+        # Реплика, с которой читает запрос, или None - основная база
+        self.replica = None
+        # Чтение закреплено за основной базой
+        self.pinned = pinned
+        self.wrote = False
+
+    def use_replica(self):
+        replicas = replica_aliases()
+        if replicas and not self.pinned and self.replica is None:
+            self.replica = random.choice(replicas)
+
+    def pin(self):
+        self.pinned = True
+        self.replica = None
+
+
+def current_state():
+    return _state.get()
+
+
+@contextmanager
+def routing_scope(pinned=False):
+    """Новое состояние маршрутизации на время блока (запрос, задача)."""
+    state = RoutingState(pinned)
+    token = _state.set(state)
+    try:
+        yield state
+    finally:
+        _state.reset(token)
+
+
+@contextmanager
+def replica_reads():
+    """
+    Чтение с реплики на время блока, если запрос не закреплен за основной
+    базой. Запросы, выполняемые позже (потоковый ответ), должны получить
+    алиас заранее: queryset.using(router.db_for_read(model)).
+    """
+    state = current_state()
+    if state is None:
+        with routing_scope() as state:
+            state.use_replica()
+            yield state
+        return
+    previous = state.replica
+    state.use_replica()
+    try:
+        yield state
+    finally:
+        state.replica = None if state.pinned else previous
+
+
+class ReplicaRouter:
+    """Чтение - с реплики, если это разрешено запросу, запись - не на реплику."""
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_APP_LABELS:
+            return None
+        state = current_state()
+        if state is not None and not state.pinned:
+            return state.replica
+        return None
+
+    def db_for_write(self, model, **hints):
+        state = current_state()
+        if state is not None:
+            state.pin()
+            state.wrote = True
+        # Объект, прочитанный с реплики, сохраняется в основную базу
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in replica_aliases():
+            return DEFAULT_DB_ALIAS
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Схема реплики приходит вместе с данными из основной базы
+        if db in replica_aliases():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """Состояние маршрутизации на запрос и cookie закрепления за основной базой."""
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            pinned_until = float(request.COOKIES.get(STICKY_COOKIE, 0))
+        except ValueError:
+            pinned_until = 0
+        with routing_scope(pinned=pinned_until > time.time()) as state:
+            response = self.get_response(request)
+        if state.wrote and request.method not in SAFE_METHODS:
+            sticky = getattr(settings, 'RND_REPLICA_STICKY_SECONDS', 5)
+            response.set_cookie(
+                STICKY_COOKIE, f'{time.time() + sticky:.3f}', max_age=sticky,
+                httponly=True, samesite='Lax',
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        state = current_state()
+        match = request.resolver_match
+        if (
+            state is not None
+            and request.method in SAFE_METHODS
+            and match is not None
+            and REPLICA_URL_NAMES.search(match.url_name or '')
+        ):
+            state.use_replica()
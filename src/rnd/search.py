@@ -0,0 +1,257 @@
+"""
+Полнотекстовый поиск на SQLite FTS5.
+
+Для каждой модели создается FTS5-таблица с внешним содержимым
+(content=<таблица модели>), синхронизация выполняется триггерами,
+поэтому индекс актуален и после bulk_create и QuerySet.update().
+Токенизатор unicode61 не зависит от регистра, в том числе для кириллицы.
+"""
+import re
+
+from django.db import connections
+from django.db.models import Case, F, FloatField, Func, IntegerField, Value, When
+from django.db.models.expressions import RawSQL
+
+
+# Модель -> индексируемые текстовые поля
+SEARCH_FIELDS = {
+    'rnd.Contract': ('name', 'description'),
+    'rnd.RnD': ('title', 'purpose'),
+    'rnd.RnDTask': ('description',),
+    'rnd.TechnicalSpecification': ('description',),
+}
+
+TOKENIZER = 'unicode61 remove_diacritics 2'
+
+# Окончания русских слов, отбрасываемые перед префиксным поиском
+RUSSIAN_ENDINGS = sorted((
+    'иями', 'ями', 'ами', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ией',
+    'ых', 'их', 'ая', 'яя', 'ое', 'ее', 'ой', 'ей', 'ий', 'ый', 'ом', 'ем',
+    'ам', 'ям', 'ах', 'ях', 'ов', 'ев', 'ия', 'ие', 'ию', 'ии', 'ью', 'ть',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь', 'й',
+), key=len, reverse=True)
+
+MIN_STEM_LENGTH = 4
+
+_available = {}
+
+
+def _fts_table(model):
+    return f'{model._meta.db_table}_fts'
+
+
+def _columns(model):
+    return [model._meta.get_field(name).column for name in SEARCH_FIELDS[model._meta.label]]
+
+
+def search_models():
+    from django.apps import apps
+    return [apps.get_model(label) for label in SEARCH_FIELDS]
+
+
+def _index_sql(model, quote):
+    """DDL индекса и триггеров синхронизации одной модели."""
+    table = model._meta.db_table
+    fts = _fts_table(model)
+    pk = model._meta.pk.column
+    columns = _columns(model)
+    column_list = ', '.join(quote(c) for c in columns)
+    new_values = ', '.join(f'new.{quote(c)}' for c in columns)
+    old_values = ', '.join(f'old.{quote(c)}' for c in columns)
+    return [
+        f"CREATE VIRTUAL TABLE {quote(fts)} USING fts5("
+        f"{column_list}, content={quote(table)}, content_rowid={quote(pk)}, "
+        f"tokenize='{TOKENIZER}', prefix='2 3 4')",
+        f"CREATE TRIGGER {quote(fts + '_ai')} AFTER INSERT ON {quote(table)} BEGIN "
+        f"INSERT INTO {quote(fts)}(rowid, {column_list}) VALUES (new.{quote(pk)}, {new_values}); END",
+        f"CREATE TRIGGER {quote(fts + '_ad')} AFTER DELETE ON {quote(table)} BEGIN "
+        f"INSERT INTO {quote(fts)}({quote(fts)}, rowid, {column_list}) "
+        f"VALUES ('delete', old.{quote(pk)}, {old_values}); END",
+        f"CREATE TRIGGER {quote(fts + '_au')} AFTER UPDATE OF {column_list} ON {quote(table)} BEGIN "
+        f"INSERT INTO {quote(fts)}({quote(fts)}, rowid, {column_list}) "
+        f"VALUES ('delete', old.{quote(pk)}, {old_values}); "
+        f"INSERT INTO {quote(fts)}(rowid, {column_list}) VALUES (new.{quote(pk)}, {new_values}); END",
+        f"INSERT INTO {quote(fts)}({quote(fts)}) VALUES ('rebuild')",
+    ]
+
+
+def fts5_supported(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        options = {row[0] for row in cursor.fetchall()}
+    return 'ENABLE_FTS5' in options
+
+
+def install_search_indexes(connection, models=None):
+    """Создает FTS5-таблицы и триггеры (только для SQLite с FTS5)."""
+    if not fts5_supported(connection):
+        return
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for model in models or search_models():
+            for sql in _index_sql(model, quote):
+                cursor.execute(sql)
+    _available.clear()
+
+
+def uninstall_search_indexes(connection, models=None):
+    if connection.vendor != 'sqlite':
+        return
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for model in models or search_models():
+            fts = _fts_table(model)
+            for suffix in ('_ai', '_ad', '_au'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {quote(fts + suffix)}')
+            cursor.execute(f'DROP TABLE IF EXISTS {quote(fts)}')
+    _available.clear()
+
+
+def ensure_search_indexes(connection):
+    """
+    Восстанавливает недостающие индексы и триггеры. SQLite пересоздает
+    таблицу при изменении ее структуры в миграциях, и триггеры пропадают;
+    вызывается после migrate. Возвращает метки восстановленных моделей.
+    """
+    if not fts5_supported(connection):
+        return []
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type IN ('table', 'trigger')")
+        existing = {row[0] for row in cursor.fetchall()}
+    broken = []
+    for model in search_models():
+        fts = _fts_table(model)
+        if not {fts, fts + '_ai', fts + '_ad', fts + '_au'} <= existing:
+            broken.append(model)
+    if broken:
+        uninstall_search_indexes(connection, broken)
+        install_search_indexes(connection, broken)
+    return [model._meta.label for model in broken]
+
+
+def rebuild_search_indexes(using='default'):
+    """Полное перестроение индексов из таблиц моделей."""
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    rebuilt = []
+    with connection.cursor() as cursor:
+        for model in search_models():
+            if is_available(model, using):
+                fts = _fts_table(model)
+                cursor.execute(f"INSERT INTO {quote(fts)}({quote(fts)}) VALUES ('rebuild')")
+                rebuilt.append(model._meta.label)
+    return rebuilt
+
+
+def is_available(model, using='default'):
+    """Есть ли в базе FTS-индекс модели."""
+    if model._meta.label not in SEARCH_FIELDS:
+        return False
+    key = (using, model._meta.label)
+    if key not in _available:
+        connection = connections[using]
+        found = False
+        if connection.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+                    [_fts_table(model)]
+                )
+                found = cursor.fetchone() is not None
+        _available[key] = found
+    return _available[key]
+
+
+def stem(word):
+    """Грубая основа русского слова для префиксного поиска."""
+    for ending in RUSSIAN_ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= MIN_STEM_LENGTH:
+            return word[:-len(ending)]
+    return word
+
+
+def build_match_query(term):
+    """
+    Строка запроса MATCH: каждое слово ищется по префиксу своей основы,
+    все слова обязательны. Возвращает None, если слов нет.
+    """
+    words = re.findall(r'\w+', term.casefold())
+    if not words:
+        return None
+    return ' '.join(f'"{stem(word)}"*' for word in words)
+
+
+def search_ids(model, term, limit=1000, using='default'):
+    """Первичные ключи найденных записей, упорядоченные по релевантности (bm25)."""
+    query = build_match_query(term)
+    if query is None:
+        return []
+    connection = connections[using]
+    fts = connection.ops.quote_name(_fts_table(model))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s ORDER BY rank LIMIT %s',
+            [query, limit]
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def count_matches(model, term, limit, using='default'):
+    """Число найденных записей, но не больше limit."""
+    query = build_match_query(term)
+    if query is None:
+        return 0
+    connection = connections[using]
+    fts = connection.ops.quote_name(_fts_table(model))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT COUNT(*) FROM (SELECT rowid FROM {fts} WHERE {fts} MATCH %s LIMIT %s)',
+            [query, limit]
+        )
+        return cursor.fetchone()[0]
+
+
+def match_subquery(model, term, limit, using='default'):
+    """
+    Подзапрос первичных ключей limit лучших записей для pk__in или None.
+    Ключи не передаются в запрос параметрами: на тысячу найденных
+    записей их было бы больше SQLITE_MAX_VARIABLE_NUMBER старых сборок.
+    """
+    query = build_match_query(term)
+    if query is None:
+        return None
+    fts = connections[using].ops.quote_name(_fts_table(model))
+    return RawSQL(f'SELECT rowid FROM {fts} WHERE {fts} MATCH %s ORDER BY rank LIMIT %s', (query, limit))
+
+
+class MatchRank(Func):
+    """
+    Релевантность записи по FTS5 (bm25, меньше - лучше) коррелированным
+    подзапросом по rowid; для записи без совпадения - NULL.
+    """
+
+    output_field = FloatField()
+
+    def __init__(self, model, term):
+        super().__init__(F('pk'))
+        self.fts = _fts_table(model)
+        self.query = build_match_query(term)
+
+    def as_sql(self, compiler, connection, **extra_context):
+        pk_sql, params = compiler.compile(self.get_source_expressions()[0])
+        fts = connection.ops.quote_name(self.fts)
+        return (
+            f'(SELECT rank FROM {fts} WHERE {fts} MATCH %s AND rowid = {pk_sql})',
+            [self.query, *params],
+        )
+
+
+def rank_ordering(ids):
+    """Выражение сортировки в порядке списка ids."""
+    return Case(
+        *[When(pk=pk, then=Value(position)) for position, pk in enumerate(ids)],
+        default=Value(len(ids)),
+        output_field=IntegerField(),
+    )
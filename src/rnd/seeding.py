@@ -0,0 +1,311 @@
+"""
+Генератор синтетического реестра для нагрузочных проверок.
+
+Данные согласованы так же, как при работе через интерфейс: доп. соглашения
+привязаны к основному договору родительского типа и образуют цепочку
+версий, часть основных договоров - новые редакции предыдущих, у НИОКР
+несколько версий ТЗ (актуальна последняя) и упорядоченные задачи.
+Результат полностью определяется seed.
+
+Строки пишутся INSERT ... executemany пачками с заранее выделенными
+первичными ключами, без объектов моделей и сигналов. Теневые поля
+и триграммы идентификаторов заполняются сразу, полнотекстовые индексы
+на время загрузки отключаются и перестраиваются в конце, счетчики
+и сводки пересчитываются целиком.
+"""
+import datetime
+import random
+import uuid
+
+from django.core.management.color import no_style
+from django.db import connections, router, transaction
+from django.db.models import Max
+
+from .counters import rebuild_counters
+from .identifiers import trigrams
+from .models import (
+    Contract, ContractType, IdentifierTrigram, RnD, RnDTask, RnDType, TechnicalSpecification,
+    RND_STATUS_BY_CONTRACT_STATUS,
+)
+from .search import fts5_supported, install_search_indexes, uninstall_search_indexes
+from .summaries import rebuild_summaries
+from .utils import normalize_identifier
+
+
+class SeedError(Exception):
+    """Генерация невозможна при текущем состоянии базы."""
+
+
+DEFAULT_BATCH_SIZE = 5000
+
+# Доли статусов договоров
+CONTRACT_STATUS_WEIGHTS = {'active': 55, 'completed': 30, 'suspended': 8, 'terminated': 7}
+
+# Доля выполненных задач у НИОКР незавершенных договоров
+TASK_DONE_SHARE = 0.4
+
+DEFAULT_CONTRACT_TYPES = (
+    ('ГК', 'Государственный контракт'),
+    ('ДС', 'Дополнительное соглашение'),
+)
+DEFAULT_RND_TYPES = (
+    ('НИР', 'Научно-исследовательская работа'),
+    ('ОКР', 'Опытно-конструкторская работа'),
+    ('ОТР', 'Опытно-технологическая работа'),
+)
+
+SUBJECTS = (
+    'системы управления', 'бортового оборудования', 'средств связи', 'программного комплекса',
+    'измерительного стенда', 'технологии сварки', 'композитных материалов', 'энергоустановки',
+    'радиолокационной станции', 'навигационного модуля', 'системы охлаждения', 'датчиков давления',
+)
+ACTIONS = ('Разработка', 'Исследование', 'Модернизация', 'Испытания', 'Создание', 'Проектирование')
+STAGES = (
+    'Анализ требований', 'Разработка эскизного проекта', 'Изготовление макета',
+    'Предварительные испытания', 'Корректировка документации', 'Приемочные испытания',
+)
+
+UUID_NAMESPACE = uuid.UUID('6f1c2a4e-8d3b-4f5a-9c7e-2b1d0e3f4a5b')
+
+FIRST_DATE = datetime.date(2015, 1, 1)
+PERIOD_DAYS = 365 * 10
+
+
+class RegistrySeeder:
+    """
+    Генерация contracts основных договоров и зависящих от них записей:
+    supp_per_contract доп. соглашений, rnd_per_contract НИОКР, у каждой
+    specs_per_rnd версий ТЗ и tasks_per_rnd задач. version_share - доля
+    основных договоров, заменяющих предыдущий договор того же типа.
+    """
+
+    def __init__(self, using=None, seed=0, prefix=None, batch_size=DEFAULT_BATCH_SIZE,
+                 supp_per_contract=2, rnd_per_contract=2, specs_per_rnd=3, tasks_per_rnd=5,
+                 version_share=0.2):
+        self.using = using or router.db_for_write(Contract)
+        self.connection = connections[self.using]
+        self.random = random.Random(seed)
+        self.prefix = f'S{seed}-' if prefix is None else prefix
+        self.batch_size = batch_size
+        self.supp_per_contract = supp_per_contract
+        self.rnd_per_contract = rnd_per_contract
+        self.specs_per_rnd = specs_per_rnd
+        self.tasks_per_rnd = tasks_per_rnd
+        self.version_share = version_share
+        self.created = {model: 0 for model in (Contract, RnD, TechnicalSpecification, RnDTask, IdentifierTrigram)}
+        self._rows = {model: [] for model in self.created}
+        self._columns = {
+            model: [field.attname for field in model._meta.concrete_fields if not (
+                model is IdentifierTrigram and field.primary_key
+            )]
+            for model in self.created
+        }
+        self._last_main = {}
+
+    def run(self, contracts):
+        """Создает записи; возвращает {модель: число строк}."""
+        self.prepare()
+        fts = fts5_supported(self.connection)
+        if fts:
+            # Триггеры FTS5 замедляют вставку в разы, индекс строится один раз в конце
+            uninstall_search_indexes(self.connection)
+        try:
+            for index in range(contracts):
+                self.contract_group(index)
+                if sum(len(rows) for rows in self._rows.values()) >= self.batch_size:
+                    self.flush()
+            self.flush()
+            self.reset_sequences()
+            with transaction.atomic(using=self.using):
+                rebuild_counters(using=self.using)
+                rebuild_summaries(using=self.using)
+        finally:
+            if fts:
+                install_search_indexes(self.connection)
+        return dict(self.created)
+
+    # --- подготовка ---
+
+    def prepare(self):
+        if Contract._base_manager.using(self.using).filter(number__contains=f' {self.prefix}').exists():
+            raise SeedError(f'Договоры с префиксом {self.prefix} уже созданы, укажите другой seed или префикс')
+        self.contract_types = self.ensure_contract_types()
+        self.rnd_types = self.ensure_rnd_types()
+        self.next_ids = {
+            model: (model._base_manager.using(self.using).aggregate(last=Max('pk'))['last'] or 0) + 1
+            for model in (Contract, RnD, TechnicalSpecification, RnDTask)
+        }
+
+    def ensure_contract_types(self):
+        """[(основной тип, [типы доп. соглашений к нему])], при пустом справочнике - создает."""
+        types = list(ContractType._base_manager.using(self.using).order_by('pk'))
+        pairs = [
+            (main, [t for t in types if t.is_supplementary and t.parent_type_id == main.pk])
+            for main in types if not main.is_supplementary
+        ]
+        if self.supp_per_contract:
+            pairs = [(main, supps) for main, supps in pairs if supps]
+        if pairs:
+            return pairs
+        if types:
+            raise SeedError('Нет основного типа договора с типом доп. соглашения к нему')
+        (main_short, main_name), (supp_short, supp_name) = DEFAULT_CONTRACT_TYPES
+        main = ContractType.objects.using(self.using).create(short_name=main_short, name=main_name)
+        supp = ContractType.objects.using(self.using).create(
+            short_name=supp_short, name=supp_name, is_supplementary=True, parent_type=main,
+        )
+        return [(main, [supp])]
+
+    def ensure_rnd_types(self):
+        types = list(RnDType._base_manager.using(self.using).order_by('pk'))
+        if not types:
+            types = [
+                RnDType.objects.using(self.using).create(short_name=short_name, name=name)
+                for short_name, name in DEFAULT_RND_TYPES
+            ]
+        return types
+
+    # --- генерация ---
+
+    def allocate(self, model):
+        pk = self.next_ids[model]
+        self.next_ids[model] += 1
+        return pk
+
+    def moment(self, day):
+        return self.connection.ops.adapt_datetimefield_value(
+            datetime.datetime.combine(day, datetime.time(9), tzinfo=datetime.timezone.utc)
+        )
+
+    def date(self, day):
+        return self.connection.ops.adapt_datefield_value(day)
+
+    def add(self, model, **values):
+        self._rows[model].append(tuple(values[name] for name in self._columns[model]))
+
+    def add_trigrams(self, kind, object_id, normalized):
+        for trigram in sorted(trigrams(normalized)):
+            self.add(IdentifierTrigram, kind=kind, object_id=object_id, trigram=trigram)
+
+    def subject(self):
+        return f'{self.random.choice(ACTIONS)} {self.random.choice(SUBJECTS)}'
+
+    def contract(self, pk, contract_type, number, main_id, previous_id, signed, status, description=None):
+        normalized = normalize_identifier(number)
+        self.add(
+            Contract,
+            id=pk, previous_version_id=previous_id, main_contract_id=main_id, type_id=contract_type.pk,
+            number=number, number_normalized=normalized, name=self.subject(),
+            signed_date=self.date(signed), effective_date=self.date(signed), status=status,
+            document=None, description=description,
+            supplementary_count=self.supp_per_contract if main_id == pk else 0,
+            created_at=self.moment(signed), updated_at=self.moment(signed),
+        )
+        self.add_trigrams('contract.number', pk, normalized)
+
+    def contract_group(self, index):
+        """Основной договор со всеми зависимыми записями."""
+        rng = self.random
+        main_type, supp_types = rng.choice(self.contract_types)
+        signed = FIRST_DATE + datetime.timedelta(days=rng.randrange(PERIOD_DAYS))
+        status = rng.choices(list(CONTRACT_STATUS_WEIGHTS), list(CONTRACT_STATUS_WEIGHTS.values()))[0]
+
+        main_id = self.allocate(Contract)
+        number = f'{main_type.short_name} {self.prefix}{index + 1:07d}'
+        previous_id = self._last_main.get(main_type.pk) if rng.random() < self.version_share else None
+        self._last_main[main_type.pk] = main_id
+        self.contract(main_id, main_type, number, main_id, previous_id, signed, status)
+
+        documents = [(main_id, signed)]
+        previous_id = None
+        day = signed
+        for position in range(1, self.supp_per_contract + 1):
+            supp_id = self.allocate(Contract)
+            day += datetime.timedelta(days=rng.randint(20, 120))
+            self.contract(
+                supp_id, rng.choice(supp_types), f'{number}/ДС-{position}', main_id, previous_id, day, status,
+                description=f'Изменение сроков и объемов работ, редакция {position}',
+            )
+            documents.append((supp_id, day))
+            previous_id = supp_id
+
+        for position in range(1, self.rnd_per_contract + 1):
+            self.rnd(main_id, number, status, position, documents)
+
+    def rnd(self, contract_id, number, contract_status, position, documents):
+        rng = self.random
+        rnd_id = self.allocate(RnD)
+        rnd_type = rng.choice(self.rnd_types)
+        code = f'{rnd_type.short_name}-{number.split()[-1]}-{position}'
+        # Шифр включает префикс, поэтому UUID не повторяются между запусками
+        rnd_uuid = str(uuid.uuid5(UUID_NAMESPACE, code))
+
+        spec_ids = []
+        for version in range(1, self.specs_per_rnd + 1):
+            spec_id = self.allocate(TechnicalSpecification)
+            document_id, day = documents[0] if version == 1 else rng.choice(documents)
+            self.add(
+                TechnicalSpecification,
+                id=spec_id, rnd_id=rnd_id, contract_document_id=document_id,
+                document=f'{rnd_uuid}/tech_spec/v{version}.pdf', version=f'{version}.0',
+                is_active=version == self.specs_per_rnd,
+                description=None if version == 1 else f'Уточнение требований, версия {version}.0',
+                uploaded_at=self.moment(day),
+            )
+            spec_ids.append(spec_id)
+
+        done = 0
+        signed = documents[0][1]
+        for order in range(1, self.tasks_per_rnd + 1):
+            is_completed = contract_status == 'completed' or rng.random() < TASK_DONE_SHARE
+            done += is_completed
+            self.add(
+                RnDTask,
+                id=self.allocate(RnDTask), rnd_id=rnd_id,
+                source_specification_id=rng.choice(spec_ids) if spec_ids else None,
+                order=order, description=f'{STAGES[(order - 1) % len(STAGES)]} ({order})',
+                is_completed=is_completed, created_at=self.moment(signed), updated_at=self.moment(signed),
+            )
+
+        uuid_normalized = normalize_identifier(rnd_uuid)
+        code_normalized = normalize_identifier(code)
+        self.add(
+            RnD,
+            id=rnd_id, contract_id=contract_id, type_id=rnd_type.pk, uuid=rnd_uuid, code=code,
+            uuid_normalized=uuid_normalized, code_normalized=code_normalized,
+            title=self.subject(), purpose=f'Обеспечение {rng.choice(SUBJECTS)}',
+            status=RND_STATUS_BY_CONTRACT_STATUS[contract_status], last_contract_status=contract_status,
+            tasks_total=self.tasks_per_rnd, tasks_done=done,
+            created_at=self.moment(signed), updated_at=self.moment(signed),
+        )
+        self.add_trigrams('rnd.code', rnd_id, code_normalized)
+        self.add_trigrams('rnd.uuid', rnd_id, uuid_normalized)
+
+    # --- запись ---
+
+    def flush(self):
+        """Записывает накопленные строки одной транзакцией, в порядке зависимостей."""
+        quote = self.connection.ops.quote_name
+        with transaction.atomic(using=self.using), self.connection.cursor() as cursor:
+            for model, rows in self._rows.items():
+                if not rows:
+                    continue
+                opts = model._meta
+                columns = [opts.get_field(name).column for name in self._columns[model]]
+                cursor.executemany(
+                    f'INSERT INTO {quote(opts.db_table)} ({", ".join(quote(c) for c in columns)}) '
+                    f'VALUES ({", ".join(["%s"] * len(columns))})',
+                    rows,
+                )
+                self.created[model] += len(rows)
+                rows.clear()
+
+    def reset_sequences(self):
+        """Сдвигает последовательности ключей после вставки с явными pk (не SQLite)."""
+        statements = self.connection.ops.sequence_reset_sql(
+            no_style(), [Contract, RnD, TechnicalSpecification, RnDTask]
+        )
+        if statements:
+            with self.connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
@@ -0,0 +1,163 @@
+"""
+Отдача файлов документов с проверкой прав.
+
+Файлы договоров и ТЗ отдаются по адресу /documents/<вид>/<id>/ только
+пользователям админки с правом просмотра записи и внешним системам с
+токеном API (эти адреса возвращает API). Сам файл отдает:
+- веб-сервер, если задан RND_MEDIA_SENDFILE: 'x-accel-redirect' (nginx,
+  внутренний адрес RND_MEDIA_ACCEL_PREFIX) или 'x-sendfile' (Apache
+  mod_xsendfile, lighttpd - полный путь файла);
+- иначе Django: с поддержкой Range (просмотрщик PDF читает большой скан
+  частями, не скачивая его целиком), ETag, If-Modified-Since и If-Range.
+
+ETag файла хранилища по содержимому - его SHA-256 из имени.
+"""
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+from .models import Contract, TechnicalSpecification
+from .storage import is_content_name
+
+
+# Вид документа в адресе -> модель с полем document
+DOCUMENT_MODELS = {
+    'contract': Contract,
+    'specification': TechnicalSpecification,
+}
+
+# Байт, которые читаются из файла за раз при отдаче диапазона
+READ_SIZE = 64 * 1024
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def document_url(obj):
+    """Адрес файла документа договора или ТЗ."""
+    return document_url_for(type(obj), obj.pk)
+
+
+def document_url_for(model, pk):
+    kind = next(kind for kind, document_model in DOCUMENT_MODELS.items() if issubclass(model, document_model))
+    return reverse('document_file', args=[kind, pk])
+
+
+def file_etag(name, stat):
+    if is_content_name(name):
+        return '"%s"' % os.path.splitext(os.path.basename(name))[0]
+    return f'"{int(stat.st_mtime):x}-{stat.st_size:x}"'
+
+
+def parse_range(header, size):
+    """
+    Диапазон (первый, последний байт) из заголовка Range или None - отдать
+    файл целиком (несколько диапазонов, ошибка в заголовке). ValueError -
+    диапазон за пределами файла.
+    """
+    match = _RANGE.match(header.strip())
+    if not match:
+        return None
+    first, last = match.groups()
+    if not first:
+        # bytes=-N: последние N байт
+        if not last:
+            return None
+        length = int(last)
+        if not length or not size:
+            raise ValueError(header)
+        return max(size - length, 0), size - 1
+    start = int(first)
+    if start >= size:
+        raise ValueError(header)
+    end = min(int(last), size - 1) if last else size - 1
+    if end < start:
+        return None
+    return start, end
+
+
+def range_applies(request, etag, last_modified):
+    """If-Range: диапазон отдается, только если файл не изменился."""
+    if_range = request.headers.get('If-Range')
+    if not if_range:
+        return True
+    if if_range.startswith(('"', 'W/')):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def read_range(path, start, length):
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        while length > 0:
+            chunk = fh.read(min(READ_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def offload_response(backend, name, path):
+    """Пустой ответ, по которому файл отдает веб-сервер."""
+    response = HttpResponse()
+    if backend == 'x-accel-redirect':
+        response['X-Accel-Redirect'] = quote(settings.RND_MEDIA_ACCEL_PREFIX + name)
+    elif backend == 'x-sendfile':
+        response['X-Sendfile'] = path
+    else:
+        raise ImproperlyConfigured(f'Неизвестный RND_MEDIA_SENDFILE: {backend}')
+    return response
+
+
+def stream_response(request, path, size, etag, last_modified):
+    byte_range = None
+    if 'Range' in request.headers and range_applies(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.headers['Range'], size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    if byte_range is None:
+        # Весь файл: сервер WSGI может отдать его через sendfile()
+        response = FileResponse(open(path, 'rb'))
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(read_range(path, start, end - start + 1), status=206)
+        response['Content-Length'] = end - start + 1
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def serve_file(request, storage, name, filename):
+    """Ответ с файлом name из storage; filename - имя для браузера."""
+    try:
+        path = storage.path(name)
+        stat = os.stat(path)
+    except (NotImplementedError, OSError):
+        raise Http404('Файл не найден')
+    etag = file_etag(name, stat)
+    last_modified = int(stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        backend = getattr(settings, 'RND_MEDIA_SENDFILE', None)
+        if backend:
+            response = offload_response(backend, name, path)
+        else:
+            response = stream_response(request, path, stat.st_size, etag, last_modified)
+        if response.status_code != 416:
+            response['Content-Type'] = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+            response['Content-Disposition'] = content_disposition_header(False, filename)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    # Кэш браузера проверяет файл при каждом открытии: права могли отозвать
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
@@ -1,52 +1,156 @@
-from django.db.models.signals import pre_save, post_save
+from django.db import connections
+from django.db.models.signals import post_delete, post_migrate, post_save, pre_save
 from django.dispatch import receiver
-from django.db.models import F
-from .models import Contract, RnD
+from . import counters, identifiers, lookups, media, search, summaries
+from .models import (
+    Contract, ContractType, RnD, RnDTask, RnDType, TechnicalSpecification, propagate_contract_statuses,
+)
 
 
 @receiver(pre_save, sender=Contract)
-def track_contract_status_change(sender, instance, **kwargs):
-    """Отслеживаем изменение статуса договора."""
-    if instance.pk:
-        try:
-            old_instance = Contract.objects.get(pk=instance.pk)
-            instance._status_changed = (old_instance.status != instance.status)
-        except Contract.DoesNotExist:
-            instance._status_changed = False
-    else:
-        instance._status_changed = False
+def remember_contract_summary(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        summaries.remember_contract_origin(instance, using)
+
+
+# Объявлен до переноса статусов на НИОКР: сначала НИОКР договора
+# переносятся в сводке на новый статус договора
+@receiver(post_save, sender=Contract)
+def update_contract_summary(sender, instance, raw=False, using=None, **kwargs):
+    """Обновляем сводки статусов договоров и НИОКР."""
+    if not raw:
+        summaries.contract_saved(instance, using)
+
+
+@receiver(post_delete, sender=Contract)
+def decrement_contract_summary(sender, instance, using=None, **kwargs):
+    summaries.contract_deleted(instance, using)
+
+
+@receiver(pre_save, sender=RnD)
+def remember_rnd_summary(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        summaries.remember_rnd_origin(instance, using)
+
+
+@receiver(post_save, sender=RnD)
+def update_rnd_summary(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        summaries.rnd_saved(instance, using)
+
+
+@receiver(post_delete, sender=RnD)
+def decrement_rnd_summary(sender, instance, using=None, **kwargs):
+    summaries.rnd_deleted(instance, using)
 
 
 @receiver(post_save, sender=Contract)
 def update_rnd_status_on_contract_status_change(sender, instance, created, **kwargs):
     """Обновляем статусы НИОКР при изменении статуса договора."""
-    if instance.is_main_contract and hasattr(instance, '_status_changed') and instance._status_changed:
-        rnd_works = RnD.objects.filter(contract=instance)
-        status_mapping = {
-            'active': 'in_progress',
-            'suspended': 'suspended',
-            'completed': 'completed',
-            'terminated': 'contract_terminated',
-        }
-        new_status = status_mapping.get(instance.status, 'in_progress')
-        
-        rnds_to_update = []
-        for rnd in rnd_works:
-            if rnd.status != new_status:
-                rnd.status = new_status
-                rnd.last_contract_status = instance.status
-                rnds_to_update.append(rnd)
-        
-        if rnds_to_update:
-            RnD.objects.bulk_update(
-                rnds_to_update, 
-                ['status', 'last_contract_status', 'updated_at']
-            )
+    if not created and instance.is_main_contract and instance.has_changed('status'):
+        propagate_contract_statuses(instance, using=kwargs.get('using'))
+
+
+@receiver(pre_save, sender=Contract)
+def remember_contract_counters(sender, instance, raw=False, using=None, **kwargs):
+    """Запоминаем тип и основной договор до сохранения."""
+    if not raw:
+        counters.remember_contract_origin(instance, using)
+
+
+@receiver(post_save, sender=Contract)
+def update_contract_counters(sender, instance, raw=False, using=None, **kwargs):
+    """Обновляем счетчики договоров по типам и доп. соглашений."""
+    if not raw:
+        counters.contract_saved(instance, using)
+
+
+@receiver(post_delete, sender=Contract)
+def decrement_contract_counters(sender, instance, using=None, **kwargs):
+    counters.contract_deleted(instance, using)
+
+
+@receiver(pre_save, sender=RnD)
+def remember_rnd_counters(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        counters.remember_rnd_origin(instance, using)
+
+
+@receiver(post_save, sender=RnD)
+def update_rnd_counters(sender, instance, raw=False, using=None, **kwargs):
+    """Обновляем счетчики НИОКР по типам."""
+    if not raw:
+        counters.rnd_saved(instance, using)
+
+
+@receiver(post_delete, sender=RnD)
+def decrement_rnd_counters(sender, instance, using=None, **kwargs):
+    counters.rnd_deleted(instance, using)
+
+
+@receiver(pre_save, sender=RnDTask)
+def remember_task_counters(sender, instance, raw=False, using=None, **kwargs):
+    if not raw:
+        counters.remember_task_origin(instance, using)
+
+
+@receiver(post_save, sender=RnDTask)
+def update_task_counters(sender, instance, raw=False, using=None, **kwargs):
+    """Обновляем счетчики задач НИОКР."""
+    if not raw:
+        counters.task_saved(instance, using)
+
+
+@receiver(post_delete, sender=RnDTask)
+def decrement_task_counters(sender, instance, using=None, **kwargs):
+    counters.task_deleted(instance, using)
 
 
 @receiver(post_save, sender=Contract)
-def ensure_main_contract_integrity(sender, instance, created, **kwargs):
-    """Гарантируем целостность ссылок main_contract после сохранения."""
-    if not instance.type.is_supplementary and instance.main_contract != instance:
-        instance.main_contract = instance
-        instance.save(update_fields=['main_contract'])
\ No newline at end of file
+@receiver(post_save, sender=RnD)
+def update_identifier_index(sender, instance, created, raw=False, using=None, **kwargs):
+    """Обновляем триграммы номера договора, шифра и UUID НИОКР."""
+    if raw:
+        return
+    fields = [
+        field for field in identifiers.IDENTIFIER_FIELDS[sender._meta.label]
+        if created or instance.has_changed(field)
+    ]
+    if fields:
+        identifiers.index_objects([instance], fields, using)
+
+
+@receiver(post_delete, sender=Contract)
+@receiver(post_delete, sender=RnD)
+def remove_identifier_index(sender, instance, using=None, **kwargs):
+    identifiers.unindex_object(instance, using)
+
+
+@receiver(post_save, sender=Contract)
+@receiver(post_save, sender=TechnicalSpecification)
+def update_file_references(sender, instance, created, raw=False, using=None, **kwargs):
+    """Учитываем ссылки на файлы хранилища документов."""
+    if not raw:
+        media.document_saved(instance, created, using)
+
+
+@receiver(post_delete, sender=Contract)
+@receiver(post_delete, sender=TechnicalSpecification)
+def release_file_references(sender, instance, using=None, **kwargs):
+    media.document_deleted(instance, using)
+
+
+@receiver(post_migrate)
+def restore_search_indexes(sender, using='default', **kwargs):
+    """Миграции SQLite пересоздают таблицы вместе с триггерами FTS5."""
+    if sender.label == 'rnd':
+        search.ensure_search_indexes(connections[using])
+
+
+@receiver(post_save, sender=ContractType)
+@receiver(post_delete, sender=ContractType)
+@receiver(post_save, sender=RnDType)
+@receiver(post_delete, sender=RnDType)
+def invalidate_lookup_cache(sender, using=None, **kwargs):
+    """Сбрасываем процессный кэш справочника во всех процессах."""
+    lookups.invalidate(sender, using)
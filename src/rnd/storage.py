@@ -0,0 +1,120 @@
+"""
+Хранилище документов с адресацией по содержимому.
+
+Имя файла - SHA-256 содержимого с исходным расширением, в каталогах по
+первым символам хэша: cas/3f/a2/3fa2...e1.pdf. Одинаковые файлы (скан,
+загруженный к каждому доп. соглашению) хранятся один раз: повторная
+загрузка возвращает имя уже записанного файла. Новый файл пишется во
+временный файл рядом (загрузка, уже лежащая на диске, переносится туда)
+и переносится на место атомарно (os.replace), поэтому параллельные
+загрузки одного содержимого не мешают друг другу.
+
+Хранилище объявлено в STORAGES под именем documents; ссылки на файлы
+учитывает rnd.media. Поля документов - DocumentFileField: путь upload_to
+для них не строится, имя целиком определяет хранилище.
+"""
+import hashlib
+import os
+import secrets
+import stat
+
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.storage import FileSystemStorage, storages
+from django.db import models
+
+
+CAS_PREFIX = 'cas/'
+
+STORAGE_ALIAS = 'documents'
+
+def document_storage():
+    """Хранилище полей Contract.document и TechnicalSpecification.document."""
+    return storages[STORAGE_ALIAS]
+
+
+def content_digest(content):
+    """SHA-256 содержимого файла (hex)."""
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def content_name(digest, filename):
+    """Имя файла в хранилище по хэшу содержимого и исходному имени."""
+    extension = os.path.splitext(filename)[1].lower()
+    return f'{CAS_PREFIX}{digest[:2]}/{digest[2:4]}/{digest}{extension}'
+
+
+def is_content_name(name):
+    return bool(name) and name.startswith(CAS_PREFIX)
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище, в котором имя файла определяется его содержимым."""
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        # Обработчик загрузки (rnd.uploads) уже посчитал хэш
+        return self.store(content, name, getattr(content, 'sha256', None))
+
+    def store(self, content, filename, digest=None):
+        """Записывает содержимое, если его еще нет в хранилище; возвращает имя."""
+        name = content_name(digest or content_digest(content), filename)
+        if not self.exists(name):
+            self._write(name, content)
+        else:
+            # rnd.media импортирует модели с полями этого хранилища
+            from .media import touch
+            touch(name)
+        return name
+
+    def _write(self, name, content):
+        full_path = self.path(name)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = self._create_temp(directory)
+        try:
+            # Права нового файла: FILE_UPLOAD_PERMISSIONS или 0666 за вычетом
+            # umask, как их выставило ядро при создании временного файла
+            mode = self.file_permissions_mode
+            if mode is None:
+                mode = stat.S_IMODE(os.fstat(fd).st_mode)
+            if hasattr(content, 'temporary_file_path'):
+                # Загрузка уже на диске: файл переносится, а не копируется
+                os.close(fd)
+                file_move_safe(content.temporary_file_path(), temp_path, allow_overwrite=True)
+                # Временный файл загрузки уже перенесен: закрытие его не удаляет
+                content.close()
+            else:
+                with os.fdopen(fd, 'wb') as fh:
+                    for chunk in content.chunks():
+                        fh.write(chunk)
+            # Перенесенная загрузка сохраняет права 0600 своего временного файла
+            os.chmod(temp_path, mode)
+            os.replace(temp_path, full_path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+
+    def _create_temp(self, directory):
+        # Не mkstemp: он создает файл с правами 0600, веб-сервер не смог бы его отдать
+        while True:
+            temp_path = os.path.join(directory, f'.upload-{secrets.token_hex(8)}')
+            try:
+                fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0), 0o666)
+            except FileExistsError:
+                continue
+            return fd, temp_path
+
+
+class DocumentFileField(models.FileField):
+    """Файловое поле в хранилище по содержимому: от имени нужно только расширение."""
+
+    def generate_filename(self, instance, filename):
+        return self.storage.generate_filename(os.path.basename(filename))
@@ -0,0 +1,259 @@
+"""
+Сводные таблицы статусов для панели руководителя.
+
+RnDStatusSummary - число НИОКР по (статус, тип работ, статус договора),
+ContractStatusSummary - число договоров по (статус, тип, месяц подписания).
+
+Строки сводок изменяются приращениями: при сохранении и удалении договоров
+и НИОКР (сигналы) и при переносе статусов договоров на НИОКР
+(propagate_contract_statuses). Панель читает только сводки, без GROUP BY
+по основным таблицам. rebuild_summaries() пересчитывает сводки целиком -
+после массовой загрузки и командой rebuild_summaries.
+"""
+from collections import Counter
+
+from django.apps import apps as global_apps
+from django.db import IntegrityError, router, transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest, TruncMonth
+from django.utils.translation import gettext_lazy as _
+
+from . import lookups
+from .counters import original_values
+from .models import Contract, ContractStatusSummary, RnD, RnDStatusSummary
+
+
+# Поля ключа строки сводки
+RND_KEY = ('status', 'rnd_type_id', 'contract_status')
+CONTRACT_KEY = ('status', 'contract_type_id', 'signed_month')
+
+
+def signing_month(day):
+    return day.replace(day=1) if day else None
+
+
+def apply_deltas(model, key_fields, deltas, using):
+    """
+    Применяет приращения {ключ: delta} к строкам сводки.
+    Недостающие строки создаются; ключи обходятся в одном порядке,
+    чтобы параллельные транзакции не блокировали друг друга.
+    """
+    manager = model._base_manager.using(using)
+    for key in sorted(deltas, key=str):
+        delta = deltas[key]
+        if not delta or None in key:
+            continue
+        filters = dict(zip(key_fields, key))
+        if manager.filter(**filters).update(count=Greatest(F('count') + delta, Value(0))):
+            continue
+        if delta < 0:
+            continue
+        try:
+            with transaction.atomic(using=using):
+                manager.create(**filters, count=delta)
+        except IntegrityError:
+            # Строку успел создать параллельный процесс
+            manager.filter(**filters).update(count=F('count') + delta)
+
+
+def _move(deltas, old, new, count=1):
+    if old != new:
+        if old is not None:
+            deltas[old] -= count
+        if new is not None:
+            deltas[new] += count
+
+
+# --- договоры ---
+
+def contract_key(contract):
+    return (contract.status, contract.type_id, signing_month(contract.signed_date))
+
+
+def remember_contract_origin(contract, using):
+    """Запоминает ключ сводки договора перед сохранением."""
+    if contract._state.adding or contract.pk is None:
+        contract._summary_origin = None
+        return
+    status, type_id, signed_date = original_values(contract, ('status', 'type_id', 'signed_date'), using)
+    contract._summary_origin = (status, type_id, signing_month(signed_date)) if status else None
+
+
+def contract_saved(contract, using):
+    """
+    Переносит договор в сводке; при смене статуса переносит и его НИОКР
+    в сводке НИОКР (до переноса статусов на сами НИОКР).
+    """
+    origin = contract.__dict__.pop('_summary_origin', None)
+    deltas = Counter()
+    _move(deltas, origin, contract_key(contract))
+    apply_deltas(ContractStatusSummary, CONTRACT_KEY, deltas, using)
+    if origin is not None and origin[0] != contract.status:
+        move_contract_rnds(contract.pk, origin[0], contract.status, using)
+
+
+def contract_deleted(contract, using):
+    apply_deltas(ContractStatusSummary, CONTRACT_KEY, Counter({contract_key(contract): -1}), using)
+
+
+def move_contract_rnds(contract_id, old_status, new_status, using):
+    """Переносит НИОКР договора в сводке на новый статус договора."""
+    groups = (
+        RnD._base_manager.using(using).filter(contract_id=contract_id)
+        .order_by().values_list('status', 'type').annotate(total=Count('pk'))
+    )
+    deltas = Counter()
+    for status, type_id, total in groups:
+        _move(deltas, (status, type_id, old_status), (status, type_id, new_status), total)
+    apply_deltas(RnDStatusSummary, RND_KEY, deltas, using)
+
+
+# --- НИОКР ---
+
+def _contract_status(rnd, contract_id, using):
+    if contract_id == rnd.contract_id and RnD.contract.is_cached(rnd):
+        return rnd.contract.status
+    return (
+        Contract._base_manager.using(using).filter(pk=contract_id)
+        .values_list('status', flat=True).first()
+    )
+
+
+def rnd_key(rnd, using):
+    return (rnd.status, rnd.type_id, _contract_status(rnd, rnd.contract_id, using))
+
+
+def remember_rnd_origin(rnd, using):
+    if rnd._state.adding or rnd.pk is None:
+        rnd._summary_origin = None
+        return
+    status, type_id, contract_id = original_values(rnd, ('status', 'type_id', 'contract_id'), using)
+    if status is None:
+        rnd._summary_origin = None
+        return
+    rnd._summary_origin = (status, type_id, _contract_status(rnd, contract_id, using))
+
+
+def rnd_saved(rnd, using):
+    origin = rnd.__dict__.pop('_summary_origin', None)
+    deltas = Counter()
+    _move(deltas, origin, rnd_key(rnd, using))
+    apply_deltas(RnDStatusSummary, RND_KEY, deltas, using)
+
+
+def rnd_deleted(rnd, using):
+    apply_deltas(RnDStatusSummary, RND_KEY, Counter({rnd_key(rnd, using): -1}), using)
+
+
+def rnd_status_groups(queryset):
+    """Число НИОКР queryset по (статус, тип) - до массового изменения статуса."""
+    return list(queryset.order_by().values_list('status', 'type').annotate(total=Count('pk')))
+
+
+def rnd_statuses_changed(groups, new_status, contract_status, using):
+    """Переносит в сводке НИОКР из rnd_status_groups() на новый статус."""
+    deltas = Counter()
+    for status, type_id, total in groups:
+        _move(deltas, (status, type_id, contract_status), (new_status, type_id, contract_status), total)
+    apply_deltas(RnDStatusSummary, RND_KEY, deltas, using)
+
+
+# --- пересчет и чтение ---
+
+def rebuild_summaries(using=None, apps=global_apps):
+    """
+    Полный пересчет сводок GROUP BY по основным таблицам.
+    apps - реестр моделей (в миграциях - исторический).
+    Возвращает количество строк каждой сводки.
+    """
+    rnd_model = apps.get_model('rnd', 'RnD')
+    contract_model = apps.get_model('rnd', 'Contract')
+    rnd_summary = apps.get_model('rnd', 'RnDStatusSummary')
+    contract_summary = apps.get_model('rnd', 'ContractStatusSummary')
+    using = using or router.db_for_write(contract_summary)
+
+    rnd_rows = [
+        rnd_summary(status=status, rnd_type_id=type_id, contract_status=contract_status, count=total)
+        for status, type_id, contract_status, total in (
+            rnd_model._base_manager.using(using).order_by()
+            .values_list('status', 'type', 'contract__status').annotate(total=Count('pk'))
+        )
+    ]
+    contract_rows = [
+        contract_summary(status=status, contract_type_id=type_id, signed_month=month, count=total)
+        for status, type_id, month, total in (
+            contract_model._base_manager.using(using).order_by()
+            .annotate(month=TruncMonth('signed_date'))
+            .values_list('status', 'type', 'month').annotate(total=Count('pk'))
+        )
+    ]
+    rnd_summary._base_manager.using(using).all().delete()
+    rnd_summary._base_manager.using(using).bulk_create(rnd_rows)
+    contract_summary._base_manager.using(using).all().delete()
+    contract_summary._base_manager.using(using).bulk_create(contract_rows)
+    return {'rnd': len(rnd_rows), 'contracts': len(contract_rows)}
+
+
+def pivot(rows, columns, row_headers):
+    """
+    Таблица для панели: rows - [(подписи строки, столбец, число)],
+    columns - [(значение, подпись)] в порядке вывода,
+    row_headers - заголовки столбцов с подписями строк.
+    """
+    index = {value: position for position, (value, label) in enumerate(columns)}
+    table = {}
+    for labels, column, count in rows:
+        if column in index and count:
+            table.setdefault(labels, [0] * len(columns))[index[column]] += count
+    result = [
+        {'labels': labels, 'cells': cells, 'total': sum(cells)}
+        for labels, cells in table.items()
+    ]
+    totals = [sum(row['cells'][i] for row in result) for i in range(len(columns))]
+    return {
+        'row_headers': row_headers,
+        'columns': [str(label) for value, label in columns],
+        'rows': result,
+        'totals': totals,
+        'total': sum(totals),
+    }
+
+
+def rnd_dashboard(using=None):
+    """Сводка НИОКР: строки - тип работ и статус договора, столбцы - статус НИОКР."""
+    using = using or router.db_for_read(RnDStatusSummary)
+    types = {obj.pk: obj.short_name for obj in lookups.rnd_types.all(using)}
+    contract_statuses = dict(Contract.CONTRACT_STATUS_CHOICES)
+    order = {value: position for position, value in enumerate(contract_statuses)}
+    rows = sorted(
+        RnDStatusSummary._base_manager.using(using).filter(count__gt=0)
+        .values_list('rnd_type', 'contract_status', 'status', 'count'),
+        key=lambda row: (types.get(row[0], ''), order.get(row[1], len(order))),
+    )
+    return pivot(
+        [
+            ((types.get(type_id, type_id), contract_statuses.get(contract_status, contract_status)), status, count)
+            for type_id, contract_status, status, count in rows
+        ],
+        RnD.STATUS_CHOICES,
+        (_('Тип работ'), _('Статус договора')),
+    )
+
+
+def contract_dashboard(using=None):
+    """Сводка договоров: строки - месяц подписания и тип, столбцы - статус."""
+    using = using or router.db_for_read(ContractStatusSummary)
+    types = {obj.pk: obj.short_name for obj in lookups.contract_types.all(using)}
+    rows = sorted(
+        ContractStatusSummary._base_manager.using(using).filter(count__gt=0)
+        .values_list('signed_month', 'contract_type', 'status', 'count'),
+        key=lambda row: (-row[0].toordinal(), types.get(row[1], '')),
+    )
+    return pivot(
+        [
+            ((f'{month:%m.%Y}', types.get(type_id, type_id)), status, count)
+            for month, type_id, status, count in rows
+        ],
+        Contract.CONTRACT_STATUS_CHOICES,
+        (_('Месяц подписания'), _('Тип договора')),
+    )
@@ -0,0 +1,339 @@
+"""
+Потоковая загрузка файлов.
+
+HashingFileUploadHandler заменяет стандартные обработчики загрузки: файл
+пишется частями во временный файл на диске и не держится в памяти
+процесса, попутно считаются SHA-256 и размер, по первым байтам
+определяется тип содержимого. Хранилище документов (rnd.storage) берет
+готовый хэш и переносит временный файл на место, не читая его повторно.
+
+Тип содержимого сверяется с расширением файла (check_content_type): скан
+с расширением .pdf должен начинаться с сигнатуры PDF.
+
+Загрузка по частям с возобновлением - для больших сканов ТЗ:
+    POST  /uploads/       заголовки Upload-Length, Upload-Name -> 201, Location
+    HEAD  /uploads/<id>/  -> Upload-Offset: сколько байт уже принято
+    PATCH /uploads/<id>/  Upload-Offset и тело части -> Upload-Offset
+Хэш считается по мере приема частей: состояние SHA-256 хранится в памяти
+процесса между запросами, а если часть пришла в другой процесс, хэш уже
+принятых байт пересчитывается один раз. После последней части файл
+атомарно переносится в хранилище документов, ответ содержит его имя.
+Формы договора и ТЗ принимают идентификатор завершенной загрузки в поле
+document_upload.
+"""
+import hashlib
+import json
+import os
+import re
+import secrets
+import shutil
+import time
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.core.files.uploadhandler import FileUploadHandler
+
+from . import media
+from .storage import document_storage
+
+
+# Сигнатуры начала файла -> тип содержимого
+SIGNATURES = (
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'II*\x00', 'image/tiff'),
+    (b'MM\x00*', 'image/tiff'),
+    (b'PK\x03\x04', 'application/zip'),
+    (b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/x-ole-storage'),
+)
+
+# Расширение файла -> тип, который должен определиться по содержимому
+EXPECTED_TYPES = {
+    '.pdf': 'application/pdf',
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.tif': 'image/tiff',
+    '.tiff': 'image/tiff',
+    '.docx': 'application/zip',
+    '.xlsx': 'application/zip',
+    '.doc': 'application/x-ole-storage',
+    '.xls': 'application/x-ole-storage',
+}
+
+# Байт начала файла, по которым определяется тип содержимого
+SIGNATURE_SIZE = max(len(signature) for signature, _ in SIGNATURES)
+
+# Байт, которые читаются из тела запроса за раз
+READ_SIZE = 64 * 1024
+
+# Секунд, через которые блокировка прерванной части снимается
+LOCK_TIMEOUT = 600
+
+_UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+
+# Загрузки по частям этого процесса: id -> (принято байт, состояние SHA-256)
+_digests = {}
+
+
+def sniff_content_type(head):
+    """Тип содержимого по первым байтам файла или None."""
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    return None
+
+
+class UploadError(Exception):
+    """Ошибка загрузки по частям."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def check_content_type(filename, detected):
+    """UploadError, если содержимое не соответствует расширению файла."""
+    extension = os.path.splitext(filename)[1].lower()
+    expected = EXPECTED_TYPES.get(extension)
+    if expected is not None and detected != expected:
+        raise UploadError(f'Содержимое файла не соответствует расширению {extension}', 415)
+
+
+class HashedUploadedFile(TemporaryUploadedFile):
+    """Загруженный файл на диске с SHA-256 и типом, определенным по содержимому."""
+
+    sha256 = None
+    detected_content_type = None
+
+
+class HashingFileUploadHandler(FileUploadHandler):
+    """Пишет загружаемый файл на диск, считая SHA-256 по мере поступления частей."""
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.file = HashedUploadedFile(self.file_name, self.content_type, 0, self.charset, self.content_type_extra)
+        self.digest = hashlib.sha256()
+        self.head = b''
+
+    def receive_data_chunk(self, raw_data, start):
+        if len(self.head) < 16:
+            self.head += raw_data[:16]
+        self.digest.update(raw_data)
+        self.file.write(raw_data)
+
+    def file_complete(self, file_size):
+        self.file.seek(0)
+        self.file.size = file_size
+        self.file.sha256 = self.digest.hexdigest()
+        self.file.detected_content_type = sniff_content_type(self.head)
+        return self.file
+
+    def upload_interrupted(self):
+        if hasattr(self, 'file'):
+            temp_location = self.file.temporary_file_path()
+            try:
+                self.file.close()
+                os.remove(temp_location)
+            except FileNotFoundError:
+                pass
+
+
+def upload_dir():
+    return str(settings.RND_UPLOAD_DIR)
+
+
+class AssembledFile(File):
+    """Файл, собранный из частей: хранилище переносит его, не копируя."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+class ChunkedUpload:
+    """
+    Загрузка по частям: каталог RND_UPLOAD_DIR/<id> с файлом данных и
+    описанием meta.json. Части дописываются по порядку; смещение части
+    должно совпадать с числом уже принятых байт.
+    """
+
+    def __init__(self, upload_id):
+        if not _UPLOAD_ID.match(upload_id or ''):
+            raise UploadError('Загрузка не найдена', 404)
+        self.id = upload_id
+        self.directory = os.path.join(upload_dir(), upload_id)
+        self.data_path = os.path.join(self.directory, 'data')
+        self.lock_path = os.path.join(self.directory, 'lock')
+        self._load_meta()
+
+    def _load_meta(self):
+        try:
+            with open(os.path.join(self.directory, 'meta.json'), encoding='utf-8') as fh:
+                self.meta = json.load(fh)
+        except (OSError, ValueError):
+            raise UploadError('Загрузка не найдена', 404)
+
+    @classmethod
+    def create(cls, name, length, user_id):
+        max_size = settings.RND_UPLOAD_MAX_SIZE
+        if not 0 < length <= max_size:
+            raise UploadError(f'Upload-Length должен быть от 1 до {max_size} байт')
+        cleanup()
+        upload_id = secrets.token_hex(16)
+        directory = os.path.join(upload_dir(), upload_id)
+        os.makedirs(directory)
+        open(os.path.join(directory, 'data'), 'wb').close()
+        meta = {
+            'name': os.path.basename(name), 'length': length, 'user': user_id,
+            'content_type': None, 'stored': None,
+        }
+        _write_meta(directory, meta)
+        return cls(upload_id)
+
+    @property
+    def offset(self):
+        if not self.meta['stored']:
+            try:
+                return os.path.getsize(self.data_path)
+            except FileNotFoundError:
+                # Загрузку завершил другой процесс
+                self._load_meta()
+        return self.meta['length']
+
+    def check_owner(self, user_id):
+        if self.meta['user'] != user_id:
+            raise UploadError('Загрузка не найдена', 404)
+
+    def append(self, stream, offset, length):
+        """Дописывает часть из stream; возвращает новое смещение."""
+        lock = self._lock()
+        try:
+            # Пока блокировка не получена, загрузку мог дописать другой процесс
+            self._load_meta()
+            if self.meta['stored']:
+                raise UploadError('Загрузка уже завершена', 409)
+            if offset != self.offset:
+                raise UploadError(f'Ожидается Upload-Offset {self.offset}', 409)
+            if offset + length > self.meta['length']:
+                raise UploadError('Часть выходит за Upload-Length')
+            digest = self._digest(offset)
+            with open(self.data_path, 'ab') as fh:
+                position = offset
+                remaining = length
+                while remaining:
+                    chunk = stream.read(min(READ_SIZE, remaining))
+                    if not chunk:
+                        break
+                    fh.flush()
+                    self._check_head(position, chunk)
+                    digest.update(chunk)
+                    fh.write(chunk)
+                    position += len(chunk)
+                    remaining -= len(chunk)
+            received = self.offset
+            if received == self.meta['length']:
+                self.complete(digest)
+            else:
+                _digests[self.id] = (received, digest)
+            return received
+        finally:
+            os.close(lock)
+            os.remove(self.lock_path)
+
+    def _check_head(self, position, chunk):
+        """
+        Проверяет тип содержимого до записи части, с которой начало файла
+        набирает SIGNATURE_SIZE байт (или файл заканчивается).
+        """
+        if position >= SIGNATURE_SIZE or position + len(chunk) < min(SIGNATURE_SIZE, self.meta['length']):
+            return
+        with open(self.data_path, 'rb') as fh:
+            head = fh.read(position) + chunk
+        self.meta['content_type'] = sniff_content_type(head)
+        try:
+            check_content_type(self.meta['name'], self.meta['content_type'])
+        except UploadError:
+            # Уже принятые короткие части начинают файл неверной сигнатурой
+            os.truncate(self.data_path, 0)
+            raise
+        self._save_meta()
+
+    def _digest(self, offset):
+        """Состояние SHA-256 после offset принятых байт."""
+        received, digest = _digests.pop(self.id, (None, None))
+        if received == offset:
+            return digest
+        # Предыдущую часть принял другой процесс или часть была прервана
+        digest = hashlib.sha256()
+        with open(self.data_path, 'rb') as fh:
+            remaining = offset
+            while remaining:
+                chunk = fh.read(min(READ_SIZE, remaining))
+                if not chunk:
+                    break
+                digest.update(chunk)
+                remaining -= len(chunk)
+        return digest
+
+    def _lock(self):
+        # Блокировка - файл, созданный с O_EXCL; оставшийся после сбоя
+        # процесса файл снимается через LOCK_TIMEOUT секунд
+        for _ in range(2):
+            try:
+                return os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                try:
+                    if os.path.getmtime(self.lock_path) < time.time() - LOCK_TIMEOUT:
+                        os.remove(self.lock_path)
+                        continue
+                except FileNotFoundError:
+                    continue
+                break
+        raise UploadError('Часть этой загрузки уже принимается', 409)
+
+    def complete(self, digest):
+        """Переносит собранный файл в хранилище документов."""
+        with open(self.data_path, 'rb') as fh:
+            name = document_storage().store(AssembledFile(fh, self.meta['name']), self.meta['name'], digest.hexdigest())
+        media.register(name, self.meta['length'])
+        self.meta['stored'] = name
+        self._save_meta()
+        if os.path.exists(self.data_path):
+            os.remove(self.data_path)
+
+    def _save_meta(self):
+        _write_meta(self.directory, self.meta)
+
+    def stored_name(self):
+        if not self.meta['stored']:
+            raise UploadError('Загрузка не завершена', 409)
+        return self.meta['stored']
+
+
+def _write_meta(directory, meta):
+    # Запись через временный файл: HEAD и форма читают meta.json без
+    # блокировки и не должны увидеть его недописанным
+    temp_path = os.path.join(directory, f'meta.json.{secrets.token_hex(4)}')
+    with open(temp_path, 'w', encoding='utf-8') as fh:
+        json.dump(meta, fh)
+    os.replace(temp_path, os.path.join(directory, 'meta.json'))
+
+
+def cleanup(max_age=None):
+    """Удаляет загрузки старше RND_UPLOAD_EXPIRY секунд."""
+    max_age = settings.RND_UPLOAD_EXPIRY if max_age is None else max_age
+    root = upload_dir()
+    if not os.path.isdir(root):
+        return
+    deadline = time.time() - max_age
+    for entry in os.scandir(root):
+        if not entry.is_dir() or not _UPLOAD_ID.match(entry.name):
+            continue
+        # Дописывание части меняет время файла данных, а не каталога
+        data_path = os.path.join(entry.path, 'data')
+        modified = max(entry.stat().st_mtime, os.path.getmtime(data_path) if os.path.exists(data_path) else 0)
+        if modified < deadline:
+            shutil.rmtree(entry.path, ignore_errors=True)
+            _digests.pop(entry.name, None)
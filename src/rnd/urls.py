@@ -1,6 +1,18 @@
 from django.urls import path
+from . import api
 from .views import *
 
 urlpatterns = [
     # path('', IndexView.as_view(), name='index'),
+    # HTTP API (только чтение)
+    path('api/contracts/', ResourceView.as_view(resource=api.ContractResource), name='api_contracts'),
+    path('api/rnd/', ResourceView.as_view(resource=api.RnDResource), name='api_rnd'),
+    path('api/specifications/', ResourceView.as_view(resource=api.TechnicalSpecificationResource),
+         name='api_specifications'),
+    path('api/tasks/', ResourceView.as_view(resource=api.RnDTaskResource), name='api_tasks'),
+    # Файлы документов с проверкой прав
+    path('documents/<str:kind>/<int:pk>/', DocumentView.as_view(), name='document_file'),
+    # Загрузка больших файлов по частям
+    path('uploads/', ChunkedUploadView.as_view(), name='upload_create'),
+    path('uploads/<str:upload_id>/', ChunkedUploadView.as_view(), name='upload_part'),
 ]
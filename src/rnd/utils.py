@@ -1,4 +1,5 @@
 import os
+import re
 import uuid
 import hashlib
 from django.utils import timezone
@@ -57,4 +58,22 @@ class UploadPathFactory:
             hash_obj = hashlib.md5(instance.number.encode())
             return f"doc_{hash_obj.hexdigest()[:12]}"
         
-        return 'temp_' + uuid.uuid4().hex[:8]
\ No newline at end of file
+        return 'temp_' + uuid.uuid4().hex[:8]
+
+
+# Латинские буквы, совпадающие по начертанию с кириллическими (после casefold)
+LOOKALIKE_LETTERS = str.maketrans('abcehkmoptxy', 'авсенкмортху')
+
+IDENTIFIER_SEPARATORS = re.compile(r'[\W_]+')
+
+
+def normalize_identifier(value):
+    """
+    Нормализованный идентификатор для поиска: регистр не важен,
+    пробелы и знаки препинания отброшены, латинские двойники заменены
+    кириллицей. "дс-12", "ДС 12" и "ДC12" (латинская C) дают одно
+    значение; "DC12" - другое: у Д нет латинского двойника.
+    """
+    if not value:
+        return ''
+    return IDENTIFIER_SEPARATORS.sub('', str(value).casefold().translate(LOOKALIKE_LETTERS))
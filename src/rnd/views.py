@@ -1,3 +1,136 @@
-from django.shortcuts import render
+import os
 
-# Create your views here.
+from django.contrib.auth.views import redirect_to_login
+from django.core.exceptions import PermissionDenied
+from django.db import router
+from django.http import Http404, JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.views import View
+
+from . import api
+from .models import Contract, TechnicalSpecification
+from .serving import DOCUMENT_MODELS, serve_file
+from .uploads import ChunkedUpload, UploadError
+
+
+class ResourceView(View):
+    """Список записей ресурса API: потоковый JSON, только чтение."""
+
+    resource = None
+    http_method_names = ['get', 'head', 'options']
+
+    def get(self, request):
+        resource = self.resource
+        if not api.is_authorized(request, resource.model):
+            return self.error('Требуется токен API или вход с правом просмотра', 401)
+        
+        def next_url(cursor):
+            params = request.GET.copy()
+            params['cursor'] = cursor
+            return request.build_absolute_uri(f'{request.path}?{params.urlencode()}')
+        
+        try:
+            query = resource.parse(request.GET)
+            # Ответ пишется после выхода из middleware: алиас выбирается сейчас
+            queryset = resource.model._base_manager.using(router.db_for_read(resource.model))
+            content = resource.stream(queryset, query, next_url)
+        except api.ApiError as exc:
+            return self.error(str(exc), exc.status)
+        
+        return StreamingHttpResponse(content, content_type='application/json; charset=utf-8')
+
+    def error(self, message, status):
+        return JsonResponse({'error': message}, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+class ChunkedUploadView(View):
+    """Загрузка по частям (см. rnd.uploads): создание, состояние и прием частей."""
+
+    http_method_names = ['post', 'head', 'patch']
+    # Загружать могут те, кто может добавлять или изменять договоры или ТЗ
+    permissions = [
+        f'{model._meta.app_label}.{action}_{model._meta.model_name}'
+        for model in (Contract, TechnicalSpecification) for action in ('add', 'change')
+    ]
+
+    def dispatch(self, request, *args, **kwargs):
+        user = request.user
+        if not (user.is_active and user.is_staff and any(user.has_perm(perm) for perm in self.permissions)):
+            return self.error('Требуется вход с правом загрузки документов', 403)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        except UploadError as exc:
+            return self.error(str(exc), exc.status)
+
+    def post(self, request, upload_id=None):
+        if upload_id is not None:
+            return self.http_method_not_allowed(request)
+        upload = ChunkedUpload.create(
+            request.headers.get('Upload-Name', 'document'),
+            self.header_int(request, 'Upload-Length'),
+            request.user.pk,
+        )
+        response = self.state(upload, status=201)
+        response['Location'] = reverse('upload_part', args=[upload.id])
+        return response
+
+    def head(self, request, upload_id=None):
+        return self.state(self.upload(request, upload_id))
+
+    def patch(self, request, upload_id=None):
+        upload = self.upload(request, upload_id)
+        upload.append(request, self.header_int(request, 'Upload-Offset'), self.header_int(request, 'Content-Length'))
+        return self.state(upload)
+
+    def upload(self, request, upload_id):
+        upload = ChunkedUpload(upload_id)
+        upload.check_owner(request.user.pk)
+        return upload
+
+    def header_int(self, request, name):
+        try:
+            return int(request.headers[name])
+        except (KeyError, ValueError):
+            raise UploadError(f'Требуется целочисленный заголовок {name}')
+
+    def state(self, upload, status=200):
+        response = JsonResponse(
+            {'id': upload.id, 'offset': upload.offset, 'length': upload.meta['length'], 'name': upload.meta['stored']},
+            status=status, json_dumps_params={'ensure_ascii': False},
+        )
+        response['Upload-Offset'] = upload.offset
+        response['Upload-Length'] = upload.meta['length']
+        return response
+
+    def error(self, message, status):
+        return JsonResponse({'error': message}, status=status, json_dumps_params={'ensure_ascii': False})
+
+
+class DocumentView(View):
+    """
+    Файл документа договора или ТЗ (см. rnd.serving) для пользователей
+    админки с правом просмотра и для запросов с токеном API.
+    """
+
+    http_method_names = ['get', 'head']
+
+    def get(self, request, kind, pk):
+        model = DOCUMENT_MODELS.get(kind)
+        if model is None:
+            raise Http404('Неизвестный вид документа')
+        user = request.user
+        if request.headers.get('Authorization', '').startswith('Token '):
+            if not api.is_authorized(request, model):
+                return JsonResponse({'error': 'Неверный токен API'}, status=401)
+        elif not (user.is_active and user.is_staff):
+            return redirect_to_login(request.get_full_path(), reverse('admin:login'))
+        elif not any(
+            user.has_perm(f'{model._meta.app_label}.{action}_{model._meta.model_name}') for action in ('view', 'change')
+        ):
+            raise PermissionDenied
+        obj = get_object_or_404(model._base_manager.using(router.db_for_read(model)).only('pk', 'document'), pk=pk)
+        if not obj.document:
+            raise Http404('Файл не загружен')
+        filename = f'{kind}-{obj.pk}{os.path.splitext(obj.document.name)[1]}'
+        return serve_file(request, obj.document.storage, obj.document.name, filename)